@@ -0,0 +1,135 @@
+"""
+Agrégats pré-calculés des avis pour le tableau de bord.
+
+Nombre d'avis par jour × sentiment × note × version de l'application × sujet
+(somme des poids : un avis canonique compte pour ses quasi-doublons du même jour),
+stockés en Parquet partitionné par mois. Le tableau de bord ne lit que ces
+comptes (quelques milliers de lignes) au lieu de re-parcourir tous les avis.
+
+Mise à jour incrémentale : l'étape des sujets ajoute les comptes des nouveaux avis
+(fichiers delta), compactés quand ils deviennent trop nombreux.
+
+Reconstruction complète :
+    python src/analysis/aggregates.py
+"""
+
+import pandas as pd
+import os
+import sys
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import (AGGREGATES_DATASET, SENTIMENT_DATASET, TOPICS_DATASET,
+                                         dataset_columns, dataset_exists, iter_dataset,
+                                         read_dataset, read_partitions, write_dataset)
+
+# Configuration
+DIMENSIONS = ['day', 'sentiment', 'score', 'app_version', 'topic_id']
+SOURCE_COLUMNS = ['at', 'sentiment', 'score', 'reviewCreatedVersion']
+UNKNOWN_VERSION = "inconnue"
+NO_TOPIC = -1
+COMPACT_AFTER_DELTAS = 64  # Au-delà, les fichiers delta sont fusionnés (un fichier par mois)
+
+def compute_aggregates(df):
+    """
+    Comptes des avis de `df` par DIMENSIONS (colonne 'count') : somme de la colonne
+    'weight' si elle existe (négative pour retirer des avis), sinon une ligne = un avis.
+    """
+    if 'reviewCreatedVersion' in df.columns:
+        versions = df['reviewCreatedVersion'].astype('string').fillna(UNKNOWN_VERSION)
+    else:
+        versions = UNKNOWN_VERSION
+    keys = pd.DataFrame({
+        'day': df['at'].dt.normalize(),
+        'sentiment': df['sentiment'],
+        'score': df['score'],
+        'app_version': versions,
+        'topic_id': df['topic_id'].astype('int16') if 'topic_id' in df.columns else NO_TOPIC,
+        'count': df['weight'].astype('int64') if 'weight' in df.columns else 1,
+    })
+    return _sum_counts(keys)
+
+def _normalize(counts):
+    counts['app_version'] = counts['app_version'].astype('string')
+    counts['topic_id'] = counts['topic_id'].astype('int16')
+    counts['count'] = counts['count'].astype('int64')
+    return counts
+
+def _sum_counts(counts):
+    # Plusieurs fichiers delta peuvent contenir la même combinaison de dimensions
+    summed = counts.groupby(DIMENSIONS, dropna=False, observed=True)['count'].sum().reset_index()
+    return _normalize(summed[summed['count'] != 0].reset_index(drop=True))
+
+def write_aggregates(counts, path=AGGREGATES_DATASET, mode='overwrite'):
+    return write_dataset(counts, path, mode=mode, partition='month', date_column='day')
+
+def _delta_files(path):
+    # Fichiers en plus du fichier de base de chaque partition (mois)
+    files = partitions = 0
+    for _, _, names in os.walk(path):
+        count = sum(name.endswith('.parquet') for name in names)
+        files += count
+        partitions += bool(count)
+    return files - partitions
+
+def update_aggregates(df, path=AGGREGATES_DATASET):
+    """Ajoute les comptes des nouveaux avis `df` (sans relire les anciens)."""
+    if df is None or df.empty:
+        return 0
+    write_aggregates(compute_aggregates(df), path, mode='append')
+    if _delta_files(path) > COMPACT_AFTER_DELTAS:
+        compact_aggregates(path)
+    return len(df)
+
+def compact_aggregates(path=AGGREGATES_DATASET):
+    """Fusionne les fichiers delta : une ligne par combinaison de dimensions."""
+    counts = read_dataset(path)
+    if counts is not None:
+        write_aggregates(_sum_counts(counts), path)
+
+def source_dataset():
+    """Avis dont les agrégats sont tirés : sujets si disponibles, sinon sentiments."""
+    return TOPICS_DATASET if dataset_exists(TOPICS_DATASET) else SENTIMENT_DATASET
+
+def rebuild_aggregates(input_path=None, output_path=AGGREGATES_DATASET):
+    """Recalcule tous les comptes depuis les avis (sujets si disponibles, sinon sentiments)."""
+    if input_path is None:
+        input_path = source_dataset()
+    if not dataset_exists(input_path):
+        print(f"Erreur : Le fichier {input_path} n'existe pas.")
+        return 0
+
+    available = dataset_columns(input_path)
+    columns = [col for col in SOURCE_COLUMNS + ['topic_id', 'weight'] if col in available]
+    if input_path == TOPICS_DATASET:
+        # Les sujets sont ajoutés au fil de l'eau (nouveaux poids inclus) : dernier état de chaque avis
+        latest = read_partitions(input_path, key='reviewId', columns=columns + ['reviewId'])
+        parts = [compute_aggregates(latest)] if latest is not None else []
+    else:
+        parts = [compute_aggregates(chunk) for chunk in iter_dataset(input_path, columns=columns)]
+    if not parts:
+        return 0
+    counts = _sum_counts(pd.concat(parts, ignore_index=True))
+    write_aggregates(counts, output_path)
+    print(f"{int(counts['count'].sum())} avis agrégés en {len(counts)} lignes dans {output_path}.")
+    return len(counts)
+
+def read_aggregates(path=AGGREGATES_DATASET, start=None, end=None):
+    """Comptes des jours dans [start, end] (bornes optionnelles). Retourne None sans agrégats."""
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        # Filtre sur la partition (mois) : les fichiers des mois antérieurs ne sont pas ouverts
+        filters += [('month', '>=', start.strftime('%Y-%m')), ('day', '>=', start)]
+    if end is not None:
+        end = pd.Timestamp(end)
+        filters += [('month', '<=', end.strftime('%Y-%m')), ('day', '<=', end)]
+
+    counts = read_dataset(path, filters=filters or None)
+    if counts is None:
+        return None
+    return _sum_counts(counts)
+
+if __name__ == "__main__":
+    rebuild_aggregates()
@@ -1,18 +1,59 @@
-import pandas as pd
-from textblob import TextBlob
+from textblob import Blobber
 from textblob_fr import PatternTagger, PatternAnalyzer
 import os
+import sys
+import time
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import DEDUPED_DATASET, SENTIMENT_DATASET, iter_dataset, write_chunks, dataset_exists
+from src.analysis.sentiment_cache import SentimentCache, content_hash
 
 # Configuration
-INPUT_FILE = os.path.join("data", "processed", "reviews_cleaned.csv")
-OUTPUT_FILE = os.path.join("data", "processed", "reviews_with_sentiment.csv")
+INPUT_FILE = DEDUPED_DATASET  # Un avis par groupe de quasi-doublons (colonne weight), cf. near_dedup.py
+OUTPUT_FILE = SENTIMENT_DATASET
+CHUNK_SIZE = 50_000      # Lignes lues par morceau
+BATCH_SIZE = 2_000       # Textes envoyés à un worker à la fois
+WORKERS = os.cpu_count() or 1
+MIN_PARALLEL_TEXTS = 5_000  # En dessous, le pool de processus coûte plus qu'il ne rapporte
+
+# "textblob" (lexique français) ou "transformer" (modèle multilingue, voir transformer_sentiment.py)
+SENTIMENT_BACKEND = os.getenv("SENTIMENT_BACKEND", "textblob")
+
+# Un seul analyseur par processus (le tagger et le lexique ne sont chargés qu'une fois)
+_blobber = None
+
+def cache_key(backend=None):
+    """
+    Identité des scores dans le cache : pour le transformer, le modèle et la
+    quantification (changer SENTIMENT_MODEL ou SENTIMENT_QUANTIZE ne réutilise pas les anciens scores).
+    """
+    backend = backend or SENTIMENT_BACKEND
+    if backend == "transformer":
+        from src.analysis.transformer_sentiment import MODEL_NAME, QUANTIZE
+        return f"transformer:{MODEL_NAME}:{'int8' if QUANTIZE else 'fp32'}"
+    return backend
 
-def analyze_sentiment(text):
+def get_blobber():
+    global _blobber
+    if _blobber is None:
+        _blobber = Blobber(pos_tagger=PatternTagger(), analyzer=PatternAnalyzer())
+    return _blobber
+
+def analyze_sentiment(text, backend=None):
     if not isinstance(text, str):
         return 0, "Neutre"
+
+    if (backend or SENTIMENT_BACKEND) == "transformer":
+        from src.analysis.transformer_sentiment import get_model
+        return get_model().predict([text])[0]
     
     # Analyse spécifique pour le français
-    blob = TextBlob(text, pos_tagger=PatternTagger(), analyzer=PatternAnalyzer())
+    blob = get_blobber()(text)
     polarity = blob.sentiment[0] # La polarité est entre -1 (très négatif) et +1 (très positif)
     
     if polarity > 0.1:
@@ -24,27 +65,98 @@ def analyze_sentiment(text):
         
     return polarity, sentiment
 
-def run_analysis():
-    if not os.path.exists(INPUT_FILE):
-        print(f"Erreur : Le fichier {INPUT_FILE} n'existe pas.")
-        return
+def analyze_batch(texts):
+    """Exécuté dans un worker : score une liste de textes avec l'analyseur TextBlob du processus."""
+    return [analyze_sentiment(text, backend="textblob") for text in texts]
 
-    print("Chargement des données...")
-    df = pd.read_csv(INPUT_FILE)
-    
-    print("Analyse des sentiments en cours... (ça peut prendre un peu de temps)")
-    # Appliquer la fonction sur chaque ligne
-    df[['polarity', 'sentiment']] = df['cleaned_content'].apply(
-        lambda x: pd.Series(analyze_sentiment(x))
-    )
-    
-    print(f"Sauvegarde des résultats dans {OUTPUT_FILE}...")
-    df.to_csv(OUTPUT_FILE, index=False, encoding='utf-8')
+def score_texts(texts, pool=None, backend=None):
+    """Score des textes distincts, en parallèle si un pool est fourni et que le volume le justifie."""
+    if (backend or SENTIMENT_BACKEND) == "transformer":
+        # Le transformer parallélise lui-même (threads intra-op de torch)
+        from src.analysis.transformer_sentiment import get_model
+        return get_model().predict(texts)
+
+    if pool is None or len(texts) < MIN_PARALLEL_TEXTS:
+        return analyze_batch(texts)
+
+    batches = [texts[i:i + BATCH_SIZE] for i in range(0, len(texts), BATCH_SIZE)]
+    results = []
+    for batch_result in pool.map(analyze_batch, batches):
+        results.extend(batch_result)
+    return results
+
+def score_chunks(chunks, cache, pool=None, stats=None, backend=None):
+    """
+    Générateur : ajoute polarity/sentiment à chaque morceau.
+    Seuls les textes absents du cache sont envoyés aux workers.
+    """
+    stats = stats if stats is not None else Counter()
+    for chunk in chunks:
+        texts = chunk['cleaned_content'].astype(object).where(chunk['cleaned_content'].notna(), None)
+        hashes = [content_hash(t) if isinstance(t, str) else None for t in texts]
+
+        scores = cache.get_many([h for h in hashes if h is not None])
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h is not None and h not in scores:
+                missing.setdefault(h, text)
+
+        if missing:
+            new_scores = dict(zip(missing.keys(), score_texts(list(missing.values()), pool, backend)))
+            cache.put_many(new_scores)
+            scores.update(new_scores)
+
+        results = [scores[h] if h is not None else analyze_sentiment(None) for h in hashes]
+        chunk = chunk.assign(
+            polarity=[polarity for polarity, _ in results],
+            sentiment=[sentiment for _, sentiment in results],
+        )
+
+        stats['rows'] += len(chunk)
+        stats['scored'] += len(missing)
+        stats.update(chunk['sentiment'].value_counts().to_dict())
+        yield chunk
+
+def run_analysis(input_path=INPUT_FILE, output_path=OUTPUT_FILE, workers=WORKERS, backend=None, mp_context=None):
+    """
+    `mp_context` : contexte multiprocessing du pool (ex : "spawn" quand l'appelant
+    a d'autres threads actifs, un fork pourrait copier un verrou tenu et bloquer).
+    """
+    if not dataset_exists(input_path):
+        # Exception (pas un simple message) : le pipeline ne marque pas l'étape comme exécutée
+        raise FileNotFoundError(f"Le fichier {input_path} n'existe pas.")
+
+    backend = backend or SENTIMENT_BACKEND
+    print(f"Analyse des sentiments en cours (backend {backend}, {workers} processus)...")
+    start = time.perf_counter()
+    stats = Counter()
+    # Les scores de chaque backend (et de chaque modèle) sont cachés séparément
+    cache = SentimentCache(backend=cache_key(backend))
+
+    # Le pool est créé une fois pour tout le fichier ; chaque worker garde son analyseur
+    pool = None
+    if workers > 1 and backend == "textblob":
+        context = multiprocessing.get_context(mp_context) if mp_context else None
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    try:
+        chunks = score_chunks(iter_dataset(input_path, batch_size=CHUNK_SIZE), cache, pool, stats, backend)
+        write_chunks(chunks, output_path)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        cache.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Résultats sauvegardés dans {output_path}.")
+    print(f"{stats['rows']} avis en {elapsed:.1f}s ({stats['rows'] / max(elapsed, 1e-9):.0f} avis/s), "
+          f"{stats['scored']} textes calculés, {stats['rows'] - stats['scored']} depuis le cache.")
     
     # Petit résumé pour toi
     print("\n--- Résumé ---")
-    print(df['sentiment'].value_counts())
+    for label in ['Positif', 'Neutre', 'Négatif']:
+        print(f"{label} : {stats[label]}")
     print("Terminé.")
 
 if __name__ == "__main__":
-    run_analysis()
\ No newline at end of file
+    # Usage : python src/analysis/sentiment_analysis.py [textblob|transformer]
+    run_analysis(backend=sys.argv[1] if len(sys.argv) > 1 else None)
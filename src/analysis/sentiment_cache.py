@@ -0,0 +1,55 @@
+"""
+Cache persistant des scores de sentiment (SQLite).
+
+Clé : (backend, hash du texte nettoyé), où backend identifie aussi le modèle et sa
+quantification pour le transformer (sentiment_analysis.cache_key). Une relance de
+l'analyse ne recalcule que les avis nouveaux ou modifiés.
+"""
+
+import os
+import sqlite3
+import hashlib
+
+CACHE_FILE = os.path.join("data", "cache", "sentiment_cache.sqlite")
+
+# Limite SQLite du nombre de paramètres par requête
+MAX_VARIABLES = 900
+
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+class SentimentCache:
+    def __init__(self, path=CACHE_FILE, backend="textblob"):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.backend = backend
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sentiment ("
+            " backend TEXT NOT NULL, hash TEXT NOT NULL, polarity REAL, sentiment TEXT,"
+            " PRIMARY KEY (backend, hash))"
+        )
+
+    def get_many(self, hashes):
+        """Retourne {hash: (polarity, sentiment)} pour les hashes déjà calculés."""
+        found = {}
+        hashes = list(set(hashes))
+        for i in range(0, len(hashes), MAX_VARIABLES):
+            batch = hashes[i:i + MAX_VARIABLES]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT hash, polarity, sentiment FROM sentiment WHERE backend = ? AND hash IN ({placeholders})",
+                [self.backend] + batch,
+            )
+            found.update({h: (polarity, sentiment) for h, polarity, sentiment in rows})
+        return found
+
+    def put_many(self, scores):
+        """scores : {hash: (polarity, sentiment)}"""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO sentiment (backend, hash, polarity, sentiment) VALUES (?, ?, ?, ?)",
+            [(self.backend, h, float(polarity), sentiment) for h, (polarity, sentiment) in scores.items()],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
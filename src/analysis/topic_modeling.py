@@ -1,12 +1,28 @@
 import pandas as pd
+import numpy as np
+import joblib
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.decomposition import NMF
+from sklearn.decomposition import MiniBatchNMF
 import os
+import sys
+import time
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import SENTIMENT_DATASET, TOPICS_DATASET, read_dataset, read_partitions, write_dataset, dataset_exists
+from src.analysis.aggregates import rebuild_aggregates, update_aggregates
 
 # Configuration
-INPUT_FILE = os.path.join("data", "processed", "reviews_with_sentiment.csv")
-OUTPUT_FILE = os.path.join("data", "processed", "reviews_topics.csv")
+INPUT_FILE = SENTIMENT_DATASET
+OUTPUT_FILE = TOPICS_DATASET
 NUM_TOPICS = 5
+MIN_WORDS = 4  # On n'apprend les sujets que sur les reviews de plus de 3 mots
+MODEL_DIR = os.path.join("data", "models", "topics")
+VECTORIZER_FILE = os.path.join(MODEL_DIR, "vectorizer.joblib")
+MODEL_FILE = os.path.join(MODEL_DIR, "nmf.joblib")
+# Colonnes d'un avis déjà étiqueté dont le changement le fait ré-étiqueter et recompter dans les agrégats
+TRACKED_COLUMNS = ['at', 'score', 'reviewCreatedVersion', 'sentiment', 'polarity', 'cleaned_content']
 
 # Liste noire des mots vides (Stopwords)
 STOP_WORDS = [
@@ -24,33 +40,154 @@ STOP_WORDS = [
     'تطبيق', 'برنامج', 'orange', 'li', 'fi', '3la', 'dyal', 'ana', 'hada'
 ]
 
-def run_topic_modeling():
-    if not os.path.exists(INPUT_FILE):
-        print(f"Erreur : Le fichier {INPUT_FILE} n'existe pas.")
-        return
-
-    print("Chargement des données...")
-    df = pd.read_csv(INPUT_FILE)
-    
-    # On garde les reviews > 3 mots
-    reviews = df[df['cleaned_content'].str.split().str.len() > 3]['cleaned_content'].dropna().tolist()
+def long_reviews(texts):
+    texts = pd.Series(texts).dropna().astype(str)
+    return texts[texts.str.split().str.len() >= MIN_WORDS].tolist()
 
+def fit_topic_model(texts):
+    """Apprend le vocabulaire TF-IDF et le modèle NMF (mini-batch, donc mis à jour ensuite sans refit)."""
     print("Vectorisation (avec exclusion des mots vides)...")
     # On ajoute notre liste 'stop_words' pour ignorer les mots inutiles
-    tfidf_vectorizer = TfidfVectorizer(max_df=0.95, min_df=2, stop_words=STOP_WORDS)
-    tfidf = tfidf_vectorizer.fit_transform(reviews)
+    vectorizer = TfidfVectorizer(max_df=0.95, min_df=2, stop_words=STOP_WORDS)
+    tfidf = vectorizer.fit_transform(texts)
 
     print(f"Recherche de {NUM_TOPICS} sujets principaux...")
-    nmf_model = NMF(n_components=NUM_TOPICS, random_state=1, l1_ratio=.5, init='nndsvd')
-    nmf_model.fit(tfidf)
-    
+    model = MiniBatchNMF(n_components=NUM_TOPICS, random_state=1, l1_ratio=.5, init='nndsvd')
+    model.fit(tfidf)
+    return vectorizer, model
+
+def save_topic_model(vectorizer, model):
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(vectorizer, VECTORIZER_FILE)
+    joblib.dump(model, MODEL_FILE)
+
+def load_topic_model():
+    """Retourne (vectorizer, model) persistés, ou None si aucun modèle n'a encore été appris."""
+    if not (os.path.exists(VECTORIZER_FILE) and os.path.exists(MODEL_FILE)):
+        return None
+    return joblib.load(VECTORIZER_FILE), joblib.load(MODEL_FILE)
+
+def update_topic_model(vectorizer, model, texts):
+    """Mise à jour incrémentale (partial_fit) sur de nouveaux avis, vocabulaire inchangé."""
+    texts = long_reviews(texts)
+    if texts:
+        model.partial_fit(vectorizer.transform(texts))
+    return model
+
+def assign_topics(texts, vectorizer, model):
+    """Sujet dominant et son poids pour chaque texte (transform, sans réapprentissage)."""
+    texts = pd.Series(texts).fillna("").astype(str).tolist()
+    weights = model.transform(vectorizer.transform(texts))
+    topic_ids = weights.argmax(axis=1)
+    topic_weights = weights.max(axis=1)
+    # Aucun mot du vocabulaire : pas de sujet
+    topic_ids = np.where(topic_weights > 0, topic_ids, -1)
+    return topic_ids.astype('int16'), topic_weights.astype('float32')
+
+def print_topics(vectorizer, model):
     print("\n--- Les VRAIS Sujets ---")
-    feature_names = tfidf_vectorizer.get_feature_names_out()
+    feature_names = vectorizer.get_feature_names_out()
     
-    for topic_idx, topic in enumerate(nmf_model.components_):
+    for topic_idx, topic in enumerate(model.components_):
         print(f"\nSujet #{topic_idx + 1}:")
         # Top 10 des mots
         print(", ".join([feature_names[i] for i in topic.argsort()[:-11:-1]]))
 
+def _weights(df):
+    return df['weight'] if 'weight' in df.columns else pd.Series(1, index=df.index, dtype='int32')
+
+def _differs(before, after):
+    # Comparaison tolérante aux valeurs manquantes (NaN/NA égaux entre eux) et aux catégories
+    before, after = before.astype(object), after.astype(object)
+    same = (before == after) | (before.isna() & after.isna())
+    return ~same.to_numpy(dtype=bool)
+
+def changed_reviews(df, known):
+    """
+    Avis déjà étiquetés dont une valeur a changé depuis : sentiment recalculé (backend,
+    modèle ou cache différent), poids de quasi-doublons (cf. near_dedup.py), date, texte...
+    Retourne (ces avis dans leur nouvel état, à ré-étiqueter ; avis qui ne sont plus
+    canoniques, avec un poids 0 ; anciens états avec leur poids en négatif, pour les agrégats).
+    """
+    current = df.drop_duplicates('reviewId', keep='last').set_index('reviewId')
+    previous = known.set_index('reviewId')
+    old_weights = _weights(previous)
+    present = previous.index.isin(current.index)
+
+    ids = previous.index[present]
+    before, after = previous.loc[ids], current.loc[ids]
+    changed = _differs(_weights(before), _weights(after))
+    for col in TRACKED_COLUMNS:
+        if col in before.columns and col in after.columns:
+            changed |= _differs(before[col], after[col])
+
+    gone = ~present & (old_weights > 0).to_numpy()
+    updated = after[changed].reset_index()
+    dropped = previous[gone].assign(weight=0).reset_index()
+    retracted = previous.index.isin(ids[changed]) | gone
+    old_rows = previous[retracted].assign(weight=-old_weights[retracted]).reset_index()
+    return updated, dropped, old_rows
+
+def run_topic_modeling(input_path=INPUT_FILE, output_path=OUTPUT_FILE, refit=False):
+    if not dataset_exists(input_path):
+        raise FileNotFoundError(f"Le fichier {input_path} n'existe pas.")
+
+    topic_model = None if refit else load_topic_model()
+    known = None
+    if topic_model is not None and dataset_exists(output_path):
+        # Dernier état de chaque avis déjà étiqueté (les lignes ajoutées ensuite remplacent les anciennes)
+        known = read_partitions(output_path, key='reviewId')
+
+    print("Chargement des données...")
+    df = read_dataset(input_path)
+    new_reviews = df[~df['reviewId'].isin(known['reviewId'])] if known is not None else df
+    if known is not None:
+        updated, dropped, old_rows = changed_reviews(df, known)
+    else:
+        updated = dropped = old_rows = df.iloc[:0]
+
+    if topic_model is None:
+        texts = long_reviews(df['cleaned_content'])
+        if len(texts) < NUM_TOPICS:
+            print("Pas assez d'avis pour apprendre les sujets.")
+            return
+        vectorizer, model = fit_topic_model(texts)
+        mode = 'overwrite'
+    else:
+        vectorizer, model = topic_model
+        if new_reviews.empty and updated.empty and dropped.empty:
+            print("Aucun nouvel avis à étiqueter.")
+            print_topics(vectorizer, model)
+            return
+        if not new_reviews.empty:
+            print(f"Mise à jour du modèle avec {len(new_reviews)} nouveaux avis...")
+            update_topic_model(vectorizer, model, new_reviews['cleaned_content'])
+        if not (updated.empty and dropped.empty):
+            print(f"{len(updated)} avis déjà étiquetés ont changé (sentiment, poids...), "
+                  f"{len(dropped)} ne sont plus canoniques (quasi-doublons).")
+        mode = 'append'
+
+    save_topic_model(vectorizer, model)
+
+    # Nouveaux avis et avis modifiés (le texte a pu changer) : étiquetés avec le modèle à jour
+    to_label = labelled = pd.concat([new_reviews, updated], ignore_index=True)
+    if not to_label.empty:
+        start = time.perf_counter()
+        topic_ids, topic_weights = assign_topics(to_label['cleaned_content'], vectorizer, model)
+        print(f"{len(to_label)} avis étiquetés en {(time.perf_counter() - start) * 1000:.0f} ms.")
+        labelled = to_label.assign(topic_id=topic_ids, topic_weight=topic_weights)
+
+    write_dataset(pd.concat([labelled, dropped], ignore_index=True), output_path, mode=mode)
+    print(f"Sujets sauvegardés dans {output_path}.")
+
+    # Agrégats du tableau de bord : comptes des avis ajoutés ou modifiés, moins ceux de leur ancien état
+    if mode == 'append':
+        update_aggregates(pd.concat([labelled, old_rows], ignore_index=True))
+    else:
+        rebuild_aggregates(output_path)
+
+    print_topics(vectorizer, model)
+
 if __name__ == "__main__":
-    run_topic_modeling()
\ No newline at end of file
+    # --refit : réapprend vocabulaire et sujets depuis zéro
+    run_topic_modeling(refit="--refit" in sys.argv)
@@ -0,0 +1,136 @@
+"""
+Backend de sentiment à base de transformer multilingue (CPU).
+
+Contrairement à TextBlob (lexique français uniquement), le modèle comprend
+le français, l'arabe et la darija. L'inférence est optimisée pour le CPU :
+- lots regroupés par longueur (padding minimal dans chaque lot)
+- torch.inference_mode (pas de graphe d'autograd)
+- quantification dynamique int8 optionnelle des couches Linear
+- nombre de threads configurable
+
+Comparaison de débit avec TextBlob :
+    python src/analysis/transformer_sentiment.py --rows 2000
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+# Configuration (surchargeable par variables d'environnement)
+MODEL_NAME = os.getenv("SENTIMENT_MODEL", "cardiffnlp/twitter-xlm-roberta-base-sentiment")
+BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "32"))
+MAX_LENGTH = 128
+NUM_THREADS = int(os.getenv("SENTIMENT_THREADS", str(os.cpu_count() or 1)))
+QUANTIZE = os.getenv("SENTIMENT_QUANTIZE", "1") == "1"
+
+# Libellés du modèle -> libellés du projet
+LABEL_MAP = {
+    'negative': 'Négatif', 'neutral': 'Neutre', 'positive': 'Positif',
+    'label_0': 'Négatif', 'label_1': 'Neutre', 'label_2': 'Positif',
+}
+
+class TransformerSentiment:
+    def __init__(self, model_name=MODEL_NAME, num_threads=NUM_THREADS, quantize=QUANTIZE,
+                 batch_size=BATCH_SIZE, max_length=MAX_LENGTH):
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+        torch.set_num_threads(num_threads)
+        self.torch = torch
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+
+        self.labels = [LABEL_MAP[model.config.id2label[i].lower()] for i in range(len(model.config.id2label))]
+        self.negative_index = self.labels.index('Négatif')
+        self.positive_index = self.labels.index('Positif')
+
+    def predict(self, texts):
+        """Retourne [(polarity, sentiment), ...] dans l'ordre des textes."""
+        if not texts:
+            return []
+
+        encodings = self.tokenizer(list(texts), truncation=True, max_length=self.max_length)
+        input_ids = encodings['input_ids']
+        attention_mask = encodings['attention_mask']
+
+        # Tri par longueur : chaque lot n'est complété que jusqu'à son plus long texte
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+        results = [None] * len(texts)
+
+        with self.torch.inference_mode():
+            for start in range(0, len(order), self.batch_size):
+                indices = order[start:start + self.batch_size]
+                batch = self.tokenizer.pad(
+                    {'input_ids': [input_ids[i] for i in indices],
+                     'attention_mask': [attention_mask[i] for i in indices]},
+                    return_tensors='pt',
+                )
+                probs = self.torch.softmax(self.model(**batch).logits, dim=-1).tolist()
+                for i, p in zip(indices, probs):
+                    # Polarité dans [-1, 1], comme TextBlob
+                    polarity = p[self.positive_index] - p[self.negative_index]
+                    results[i] = (polarity, self.labels[max(range(len(p)), key=p.__getitem__)])
+
+        return results
+
+_model = None
+
+def get_model():
+    global _model
+    if _model is None:
+        _model = TransformerSentiment()
+    return _model
+
+def compare_backends(texts):
+    """Mesure le débit (avis/s) de TextBlob et du transformer sur les mêmes textes."""
+    from src.analysis.sentiment_analysis import analyze_batch
+
+    start = time.perf_counter()
+    textblob_results = analyze_batch(texts)
+    textblob_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    model = get_model()
+    load_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    transformer_results = model.predict(texts)
+    transformer_time = time.perf_counter() - start
+
+    agreement = sum(a[1] == b[1] for a, b in zip(textblob_results, transformer_results)) / len(texts)
+
+    print(f"\n--- Comparaison sur {len(texts)} avis ---")
+    print(f"TextBlob    : {textblob_time:.2f}s ({len(texts) / textblob_time:.0f} avis/s)")
+    print(f"Transformer : {transformer_time:.2f}s ({len(texts) / transformer_time:.0f} avis/s), "
+          f"chargement du modèle {load_time:.1f}s, {NUM_THREADS} threads, int8={QUANTIZE}")
+    print(f"Accord entre les deux backends : {agreement:.0%}")
+
+    return {
+        'rows': len(texts),
+        'textblob_rows_per_sec': len(texts) / textblob_time,
+        'transformer_rows_per_sec': len(texts) / transformer_time,
+        'agreement': agreement,
+    }
+
+if __name__ == "__main__":
+    from src.data_collection.storage import CLEANED_DATASET, read_dataset
+
+    parser = argparse.ArgumentParser(description="Comparaison de débit TextBlob / transformer")
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    df = read_dataset(CLEANED_DATASET, columns=['cleaned_content'])
+    if df is None:
+        print(f"Erreur : Le fichier {CLEANED_DATASET} n'existe pas.")
+    else:
+        compare_backends(df['cleaned_content'].dropna().astype(str).head(args.rows).tolist())
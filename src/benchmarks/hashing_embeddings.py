@@ -0,0 +1,48 @@
+"""
+Fonction d'embedding hors ligne pour les benchmarks : pas de modèle à télécharger.
+
+Chaque texte est projeté par hachage de ses mots et trigrammes de caractères sur un
+vecteur de dimension fixe (signe aléatoire par trait), puis normalisé. Ce n'est pas
+un modèle sémantique, mais deux textes qui partagent des mots restent proches : la
+recherche retrouve des morceaux plausibles et les coûts mesurés (index, cache,
+recherche) sont ceux du vrai chatbot, au calcul du modèle près.
+"""
+
+import re
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Configuration
+DIMENSIONS = 384  # Même dimension que paraphrase-multilingual-MiniLM-L12-v2
+CHAR_NGRAM = 3
+WORD_PATTERN = re.compile(r'\w+')
+
+def features(text):
+    words = WORD_PATTERN.findall(text.lower())
+    grams = [w[i:i + CHAR_NGRAM] for w in words if len(w) > CHAR_NGRAM
+             for i in range(len(w) - CHAR_NGRAM + 1)]
+    return words + grams
+
+class HashingEmbeddings(Embeddings):
+    def __init__(self, dimensions=DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features(text)), dtype=np.uint32)
+        if len(hashes):
+            # Bit de poids fort = signe : les collisions se compensent en moyenne
+            signs = np.where(hashes >> 31, -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, hashes % self.dimensions, signs)
+            norm = np.linalg.norm(vector)
+            if norm:
+                vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
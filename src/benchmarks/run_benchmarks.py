@@ -0,0 +1,351 @@
+"""
+Benchmarks du pipeline et du chatbot, entièrement hors ligne (CPU, sans Play Store ni Groq).
+
+- Débit (avis/s) de chaque étape sur des avis synthétiques (10k / 100k / 1M) :
+  clean_text, process_reviews, quasi-doublons, run_analysis, sujets, extract_keywords
+- Ingestion d'une FAQ synthétique (première ingestion puis ré-ingestion inchangée)
+- Latence p50/p95/p99 de la recherche (Chroma et hybride) et de get_llm_response
+  de bout en bout avec le LLM simulé (stub_llm.py) et un embedding par hachage
+
+Tout tourne dans un dossier temporaire (les scripts utilisent des chemins "data/...")
+et les résultats sont écrits en JSON dans data/benchmarks/, avec le commit mesuré :
+--compare affiche les écarts avec une exécution précédente.
+
+Usage :
+    python src/benchmarks/run_benchmarks.py
+    python src/benchmarks/run_benchmarks.py --scales 10k 100k 1M --repeat 3
+    python src/benchmarks/run_benchmarks.py --compare data/benchmarks/bench-<commit>-<date>.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+# Ajout du dossier racine au path pour les imports
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(ROOT)
+
+# Hors ligne : LLM simulé (sans latence ajoutée par défaut : on mesure le chatbot, pas le LLM)
+# et pas de télémétrie Chroma. À fixer avant l'import des modules du chatbot.
+os.environ["LLM_BACKEND"] = "stub"
+os.environ.setdefault("STUB_FIRST_TOKEN_MS", "0")
+os.environ.setdefault("STUB_TOKEN_MS", "0")
+os.environ["ANONYMIZED_TELEMETRY"] = "False"
+
+from src.benchmarks.synthetic_data import generate_reviews, generate_faq, generate_queries
+from src.benchmarks.hashing_embeddings import HashingEmbeddings
+from src.data_collection.storage import (RAW_PARTITIONS_DIR, CLEANED_DATASET, DEDUPED_DATASET,
+                                         SENTIMENT_DATASET, TOPICS_DATASET, append_partitions, read_dataset)
+
+# Configuration
+SCALES = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000}
+DEFAULT_SCALES = ["10k"]
+FAQ_SIZE = 500
+QUERY_COUNT = 200
+CLEAN_TEXT_SAMPLE = 100_000  # clean_text (ligne par ligne) : mesuré sur au plus ce nombre d'avis
+RESULTS_DIR = os.path.join("data", "benchmarks")
+REPEAT = 1                   # Exécutions par volume : la plus rapide de chaque étape est retenue (comme timeit)
+REGRESSION_THRESHOLD = 0.15  # Écart signalé au-delà de 15 % (bruit d'une machine partagée)
+
+# --- MESURES ---
+
+@contextlib.contextmanager
+def quiet(verbose=False):
+    """Les étapes impriment leur progression : masquée sauf en mode verbeux."""
+    if verbose:
+        yield
+        return
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def throughput(seconds, rows):
+    return {"seconds": round(seconds, 4), "rows": int(rows), "rows_per_s": round(rows / max(seconds, 1e-9), 1)}
+
+def latency_stats(samples):
+    """Percentiles (ms) d'une liste de durées en secondes."""
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(ms),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+def best_of(runs):
+    """Par étape, la mesure la plus rapide de plusieurs exécutions (les autres sont du bruit)."""
+    best = dict(runs[0])
+    for run in runs[1:]:
+        for stage, values in run.items():
+            if "seconds" in values and values["seconds"] < best[stage]["seconds"]:
+                best[stage] = values
+    return best
+
+def count_rows(path):
+    df = read_dataset(path, columns=['reviewId'])
+    return 0 if df is None else len(df)
+
+def reset_review_data():
+    """Repart d'un pipeline vide (et d'un cache de sentiments vide) pour chaque volume."""
+    from src.analysis.sentiment_cache import CACHE_FILE
+    for directory in [os.path.join("data", "raw"), os.path.join("data", "processed"), os.path.join("data", "models")]:
+        shutil.rmtree(directory, ignore_errors=True)
+    if os.path.exists(CACHE_FILE):
+        os.remove(CACHE_FILE)
+
+# --- ÉTAPES DU PIPELINE ---
+
+def bench_reviews(n, verbose=False):
+    """Débit de chaque étape du pipeline d'avis sur `n` avis synthétiques."""
+    from src.data_collection.cleaner import clean_text, clean_series, process_reviews
+    from src.data_collection.near_dedup import deduplicate_reviews
+    from src.analysis.sentiment_analysis import run_analysis
+    from src.analysis.topic_modeling import run_topic_modeling
+    from src.integration.feedback_loop import load_negative_reviews, extract_keywords
+
+    reset_review_data()
+    results = {}
+    df, seconds = timed(generate_reviews, n)
+    results["generate_reviews"] = throughput(seconds, n)
+    _, seconds = timed(append_partitions, df)
+    results["write_raw_partitions"] = throughput(seconds, n)
+
+    sample = df['content'].head(CLEAN_TEXT_SAMPLE).tolist()
+    _, seconds = timed(lambda: [clean_text(text) for text in sample])
+    results["clean_text"] = throughput(seconds, len(sample))
+    _, seconds = timed(clean_series, df['content'])
+    results["clean_series"] = throughput(seconds, n)
+    del df, sample
+
+    with quiet(verbose):
+        _, seconds = timed(process_reviews, RAW_PARTITIONS_DIR, CLEANED_DATASET)
+    results["process_reviews"] = throughput(seconds, n)
+    cleaned = count_rows(CLEANED_DATASET)
+
+    with quiet(verbose):
+        _, seconds = timed(deduplicate_reviews, CLEANED_DATASET, DEDUPED_DATASET)
+    results["near_dedup"] = throughput(seconds, cleaned)
+    unique = count_rows(DEDUPED_DATASET)
+
+    with quiet(verbose):
+        _, seconds = timed(run_analysis, DEDUPED_DATASET, SENTIMENT_DATASET)
+    results["run_analysis"] = throughput(seconds, unique)
+
+    with quiet(verbose):
+        _, seconds = timed(run_topic_modeling, SENTIMENT_DATASET, TOPICS_DATASET, refit=True)
+    results["topic_modeling"] = throughput(seconds, unique)
+
+    with quiet(verbose):
+        negative = load_negative_reviews()
+        _, seconds = timed(extract_keywords, negative)
+    results["extract_keywords"] = throughput(seconds, len(negative))
+
+    results["dataset"] = {"reviews": n, "cleaned": cleaned, "unique": unique, "negative_unique": len(negative)}
+    return results
+
+# --- CHATBOT ---
+
+def install_offline_embeddings():
+    """Le cache d'embeddings partagé calcule les vecteurs manquants par hachage (pas de modèle)."""
+    from src.chatbot.embedding_cache import get_embedding_function
+    embeddings = get_embedding_function()
+    embeddings._model = HashingEmbeddings()
+    return embeddings
+
+def query_latencies(fn, queries):
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    return latency_stats(samples)
+
+def bench_chatbot(faq_size=FAQ_SIZE, query_count=QUERY_COUNT, verbose=False):
+    """Ingestion de la FAQ, puis latences de recherche et de réponse complète."""
+    from langchain_community.vectorstores import Chroma
+    from src.chatbot.ingest_knowledge import FAQ_FILE, DB_DIR, ingest_data, build_chunks
+    from src.chatbot.hybrid_retriever import HybridRetriever
+    from src.chatbot.rag_chatbot import retrieve_documents, get_llm_response
+    from src.chatbot.response_cache import SemanticResponseCache
+
+    os.makedirs(os.path.dirname(FAQ_FILE), exist_ok=True)
+    with open(FAQ_FILE, 'w', encoding='utf-8') as f:
+        f.write(generate_faq(faq_size))
+    embeddings = install_offline_embeddings()
+
+    results = {}
+    with quiet(verbose):
+        chunks = len(build_chunks())
+        _, seconds = timed(ingest_data)
+        results["ingest_knowledge"] = throughput(seconds, chunks)
+        # Rien n'a changé : seul le calcul des différences est payé
+        _, seconds = timed(ingest_data)
+        results["ingest_knowledge_unchanged"] = throughput(seconds, chunks)
+
+    chroma = Chroma(persist_directory=DB_DIR, embedding_function=embeddings)
+    hybrid, seconds = timed(HybridRetriever.from_chroma, chroma)
+    results["hybrid_index"] = throughput(seconds, chunks)
+
+    queries = generate_queries(query_count)
+    latencies = {}
+    for name, db in [("chroma", chroma), ("hybrid", hybrid)]:
+        latencies[f"retrieval_{name}"] = query_latencies(
+            lambda q: retrieve_documents(db, q, embeddings.embed_query(q)), queries)
+        latencies[f"llm_response_{name}"] = query_latencies(
+            lambda q: get_llm_response(db, q, "", cache=None), queries)
+
+    # Questions répétées : le cache sémantique répond sans appeler le LLM
+    cache = SemanticResponseCache()
+    latencies["llm_response_cached"] = query_latencies(
+        lambda q: get_llm_response(chroma, q, "", cache=cache), queries)
+    latencies["llm_response_cached"]["hit_rate"] = round(cache.hits / max(cache.hits + cache.misses, 1), 3)
+
+    # Dates d'usage du cache écrites tant que l'espace de travail existe
+    embeddings.store.close()
+    results["dataset"] = {"faq_entries": faq_size, "chunks": chunks, "queries": query_count}
+    return results, latencies
+
+# --- RÉSULTATS ---
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+def environment():
+    commit, dirty = git_revision()
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "date": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "stub_first_token_ms": float(os.environ["STUB_FIRST_TOKEN_MS"]),
+        "stub_token_ms": float(os.environ["STUB_TOKEN_MS"]),
+    }
+
+def save_results(results, directory):
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+    path = os.path.join(directory, f"bench-{results['environment']['commit'] or 'nogit'}-{stamp}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return path
+
+def flatten(results):
+    """{mesure: (valeur, plus grand = meilleur)} : avis/s des étapes, p95 des latences."""
+    metrics = {}
+    for scale, stages in results.get("throughput", {}).items():
+        for stage, values in stages.items():
+            if "rows_per_s" in values:
+                metrics[f"{scale} {stage} (avis/s)"] = (values["rows_per_s"], True)
+    for stage, values in results.get("chatbot", {}).items():
+        if "rows_per_s" in values:
+            metrics[f"chatbot {stage} (morceaux/s)"] = (values["rows_per_s"], True)
+    for name, values in results.get("latency", {}).items():
+        metrics[f"{name} p95 (ms)"] = (values["p95_ms"], False)
+    return metrics
+
+def compare(old_results, new_results, threshold=REGRESSION_THRESHOLD):
+    old, new = flatten(old_results), flatten(new_results)
+    print(f"\nComparaison avec le commit {old_results['environment'].get('commit')} :")
+    print(f"{'Mesure':<48}{'Avant':>12}{'Après':>12}{'Écart':>9}")
+    for name, (value, higher_is_better) in new.items():
+        if name not in old:
+            continue
+        before = old[name][0]
+        change = (value - before) / before if before else 0.0
+        worse = -change if higher_is_better else change
+        flag = "  ⚠ régression" if worse > threshold else ("  ✓ amélioration" if -worse > threshold else "")
+        print(f"{name:<48}{before:>12.1f}{value:>12.1f}{change:>+8.0%}{flag}")
+
+def print_results(results):
+    for scale, stages in results.get("throughput", {}).items():
+        dataset = stages["dataset"]
+        print(f"\n=== {scale} avis ({dataset['unique']} uniques après quasi-doublons) ===")
+        for stage, values in stages.items():
+            if stage != "dataset":
+                print(f"  {stage:<24}{values['rows_per_s']:>14.0f} lignes/s  ({values['seconds']:.2f} s)")
+    if "chatbot" in results:
+        print(f"\n=== Chatbot ({results['chatbot']['dataset']['chunks']} morceaux de FAQ) ===")
+        for stage, values in results["chatbot"].items():
+            if stage != "dataset":
+                print(f"  {stage:<28}{values['seconds']:>8.2f} s")
+        for name, values in results["latency"].items():
+            print(f"  {name:<28}p50 {values['p50_ms']:>8.2f} ms  p95 {values['p95_ms']:>8.2f} ms  "
+                  f"p99 {values['p99_ms']:>8.2f} ms")
+
+def run_benchmarks(scales=DEFAULT_SCALES, faq_size=FAQ_SIZE, query_count=QUERY_COUNT,
+                   reviews=True, chatbot=True, repeat=REPEAT, verbose=False):
+    """Lance les benchmarks dans le dossier courant (qui doit être un espace de travail jetable)."""
+    results = {"environment": {**environment(), "repeat": repeat}, "throughput": {}}
+    if reviews:
+        for scale in scales:
+            print(f"Pipeline d'avis : {scale}...")
+            results["throughput"][scale] = best_of([bench_reviews(SCALES[scale], verbose) for _ in range(repeat)])
+    if chatbot:
+        print("Chatbot : ingestion et latences...")
+        results["chatbot"], results["latency"] = bench_chatbot(faq_size, query_count, verbose)
+    # Pic mémoire du processus (les workers de sentiment_analysis sont comptés à part)
+    results["environment"]["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne du pipeline et du chatbot")
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=DEFAULT_SCALES, help="Volumes d'avis mesurés")
+    parser.add_argument("--faq-size", type=int, default=FAQ_SIZE, help="Questions de la FAQ synthétique")
+    parser.add_argument("--queries", type=int, default=QUERY_COUNT, help="Questions posées pour les latences")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="Exécutions par volume (la plus rapide est retenue)")
+    parser.add_argument("--skip-reviews", action="store_true", help="Ne mesure pas le pipeline d'avis")
+    parser.add_argument("--skip-chatbot", action="store_true", help="Ne mesure pas le chatbot")
+    parser.add_argument("--output", default=RESULTS_DIR, help="Dossier des résultats JSON")
+    parser.add_argument("--compare", help="Résultats JSON d'une exécution précédente")
+    parser.add_argument("--keep-workspace", action="store_true", help="Garde le dossier temporaire")
+    parser.add_argument("--verbose", action="store_true", help="Affiche la sortie des étapes")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    previous = os.path.abspath(args.compare) if args.compare else None
+    workspace = tempfile.mkdtemp(prefix="bench-")
+    cwd = os.getcwd()
+    os.chdir(workspace)
+    try:
+        results = run_benchmarks(args.scales, args.faq_size, args.queries,
+                                 reviews=not args.skip_reviews, chatbot=not args.skip_chatbot,
+                                 repeat=args.repeat, verbose=args.verbose)
+    finally:
+        os.chdir(cwd)
+        if args.keep_workspace:
+            print(f"Espace de travail conservé : {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    print_results(results)
+    print(f"\nRésultats sauvegardés dans {save_results(results, output)}")
+    if previous:
+        with open(previous, 'r', encoding='utf-8') as f:
+            compare(json.load(f), results)
@@ -0,0 +1,215 @@
+"""
+Données synthétiques pour les benchmarks (hors ligne, déterministes).
+
+- Avis Play Store en français, darija latine ("3afak", "makhdamach") et darija en
+  graphie arabe, avec les mêmes colonnes que le scraper. La note fixe le ton du texte,
+  et une part d'avis très courts ("nul", "bien") se répète comme dans les vrais exports.
+- FAQ au format "Q: ... / R: ..." de data/faq_orange.txt, de taille quelconque.
+- Questions de clients (français et darija) sur les mêmes sujets.
+
+Les textes sont assemblés par fragments avec NumPy : un million d'avis en quelques secondes.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+SEED = 42
+START_DATE = "2025-01-01"
+DAYS = 365
+SCORE_PROBABILITIES = [0.45, 0.08, 0.07, 0.08, 0.32]  # Notes 1 à 5 (répartition des vrais avis)
+LANGUAGE_PROBABILITIES = {"fr": 0.6, "darija": 0.25, "arabe": 0.15}
+SHORT_REVIEW_SHARE = 0.15
+APP_VERSIONS = ["1.7", "1.8", "1.9", "2.0", None]
+
+TOPICS = {
+    "recharge": {
+        "fr": ["la recharge", "le code de recharge", "la recharge par carte", "le pass internet"],
+        "darija": ["recharge", "l code dial recharge", "pass internet", "tasbi9a"],
+        "arabe": ["التعبئة", "رمز التعبئة", "باس الانترنت"],
+    },
+    "facture": {
+        "fr": ["le paiement de la facture", "ma facture", "le paiement par carte bancaire"],
+        "darija": ["lkhalas dial facture", "facture dyali", "lkhlas b la carte"],
+        "arabe": ["أداء الفاتورة", "الفاتورة ديالي"],
+    },
+    "application": {
+        "fr": ["l'application", "la mise à jour", "la connexion au compte", "le code sms"],
+        "darija": ["l'application", "mise a jour", "compte dyali", "code sms"],
+        "arabe": ["التطبيق", "التحديث", "الحساب ديالي"],
+    },
+    "internet": {
+        "fr": ["le réseau", "la 4g", "internet", "le bonus de 1go"],
+        "darija": ["réseau", "internet", "la 4g", "l bonus dial 1go"],
+        "arabe": ["الشبكة", "الانترنت", "البونيس"],
+    },
+    "money": {
+        "fr": ["orange money", "le transfert d'argent", "le virement"],
+        "darija": ["orange money", "tahwil lflous", "lvirement"],
+        "arabe": ["اورنج موني", "تحويل الفلوس"],
+    },
+}
+
+PREDICATES = {
+    "negatif": {
+        "fr": ["ne marche pas", "est bloqué", "ne fonctionne plus", "est très lent", "plante tout le temps",
+               "ne passe jamais", "est une catastrophe"],
+        "darija": ["makhdamach", "m9awda", "ma khdamach mzyan", "ti9al bzaf", "ma bghatch tdouz"],
+        "arabe": ["ما خدامش", "مقودة", "بطيء بزاف", "ما بغاش يدوز"],
+    },
+    "neutre": {
+        "fr": ["est correct", "fonctionne parfois", "est moyen", "pourrait être amélioré"],
+        "darija": ["machi khayb", "3adi", "khasso ytsawb chwia"],
+        "arabe": ["عادي", "ماشي خايب"],
+    },
+    "positif": {
+        "fr": ["fonctionne très bien", "est rapide", "est pratique", "marche parfaitement", "est excellent"],
+        "darija": ["zwin bzaf", "khdam mzyan", "sahl w zwin", "top"],
+        "arabe": ["مزيان بزاف", "خدام مزيان", "ساهل"],
+    },
+}
+
+PREFIXES = {
+    "fr": ["", "", "Bonjour, ", "Franchement ", "Depuis hier ", "Encore une fois "],
+    "darija": ["", "", "salam, ", "wallah ", "3afak "],
+    "arabe": ["", "", "السلام عليكم ", "والله "],
+}
+
+SUFFIXES = {
+    "negatif": {
+        "fr": ["", "", " !!", ", très déçu.", ", réglez ça svp", ", je vais changer d'opérateur."],
+        "darija": ["", "", " 3afakom", " wach had lprobleme ghadi ytsawb", " !!"],
+        "arabe": ["", "", " عافاكم", " شنو هاد المشكل"],
+    },
+    "neutre": {
+        "fr": ["", "", ".", ", sans plus."],
+        "darija": ["", "", " mais 3adi"],
+        "arabe": ["", ""],
+    },
+    "positif": {
+        "fr": ["", "", " !", ", merci Orange.", ", je recommande."],
+        "darija": ["", "", " chokran", " merci"],
+        "arabe": ["", "", " شكرا"],
+    },
+}
+
+# Détails chiffrés (avant, après le nombre) : les avis longs ne se répètent pas tous à l'identique
+DETAILS = {
+    "fr": [(" depuis ", " jours"), (", j'ai payé ", " dh"), (", ça fait ", " fois que j'essaie"),
+           (" après ", " minutes d'attente"), (", numéro 06", "")],
+    "darija": [(" hadi ", " iyam"), (", khlst ", " dh"), (", jrbt ", " merrat"), (", ra9m 06", "")],
+    "arabe": [(" هادي ", " أيام"), (" خلصت ", " درهم"), (" جربت ", " مرات")],
+}
+DETAIL_SHARE = 0.7
+
+SHORT_REVIEWS = {
+    "negatif": ["Nul", "nul", "Très mauvais", "Nuul", "makhdamach", "خايب", "Very bad", "zero"],
+    "neutre": ["Moyen", "ça va", "3adi", "عادي"],
+    "positif": ["Bien", "Top", "très bon", "zwin", "مزيان", "Good", "Bon"],
+}
+
+USER_NAMES = ["Yassine", "Fatima", "Omar", "Salma", "Hamza", "Khadija", "Mehdi", "Sara", "Anas", "Imane"]
+
+QUERIES = {
+    "recharge": ["Comment recharger mon solde ?", "C'est quoi les codes de recharge rapide ?",
+                 "kifach n3mer solde dyali ?", "ach howa code dial pass internet ?",
+                 "كيفاش نعمر الرصيد ؟"],
+    "facture": ["Comment payer ma facture ?", "Je n'arrive pas à payer ma facture par carte",
+                "kifach nkhalas facture b la carte ?", "كيفاش نخلص الفاتورة ؟"],
+    "application": ["L'application ne s'ouvre pas après la mise à jour", "Je n'ai pas reçu le code SMS",
+                    "l'application makhdamach mn ba3d mise a jour", "التطبيق ما بغاش يتحل"],
+    "internet": ["Pourquoi je n'ai pas reçu mon bonus de 1Go ?", "Comment activer la 4G+ ?",
+                 "fin l bonus dial 1go ?", "الانترنت بطيء بزاف"],
+    "money": ["Comment faire un transfert Orange Money ?", "Je ne reçois pas l'argent d'un virement",
+              "kifach nsift lflous b orange money ?", "كيفاش نحول الفلوس ؟"],
+}
+
+FAQ_ACTIONS = {
+    "recharge": ["recharger mon solde", "acheter un pass internet", "utiliser un code de recharge"],
+    "facture": ["payer ma facture", "consulter mes factures", "obtenir un reçu de paiement"],
+    "application": ["réinstaller l'application", "recevoir le code SMS", "me connecter à mon compte"],
+    "internet": ["activer la 4G+", "récupérer mon bonus de 1Go", "suivre ma consommation internet"],
+    "money": ["envoyer de l'argent avec Orange Money", "retirer de l'argent", "ouvrir un compte Orange Money"],
+}
+FAQ_CHANNELS = ["depuis l'application", "par SMS", "en agence", "avec le code USSD", "sur le site web"]
+FAQ_ANSWERS = {
+    "recharge": "Rendez-vous dans la rubrique \"Recharge\" de l'application Orange et Moi, ou composez le 555 suivi du code.",
+    "facture": "Allez dans la section \"Factures\", sélectionnez la facture et payez par carte bancaire. Un reçu est envoyé par SMS.",
+    "application": "Désinstallez l'application, redémarrez le téléphone puis réinstallez la dernière version depuis le Play Store.",
+    "internet": "Vérifiez les paramètres réseau du mobile et suivez votre consommation en temps réel dans l'application.",
+    "money": "Ouvrez Orange Money dans l'application, choisissez l'opération et confirmez avec votre code secret.",
+}
+
+def _pick(rng, values, size):
+    return np.asarray(values, dtype=object)[rng.integers(0, len(values), size=size)]
+
+def _detail(rng, language, size):
+    before, after = zip(*DETAILS[language])
+    index = rng.integers(0, len(before), size=size)
+    numbers = rng.integers(1, 10**rng.integers(1, 9, size=size)).astype(str).astype(object)
+    details = np.asarray(before, dtype=object)[index] + numbers + np.asarray(after, dtype=object)[index]
+    return np.where(rng.random(size) < DETAIL_SHARE, details, "")
+
+def _fill(target, mask, values):
+    target[mask] = values
+    return target
+
+def generate_reviews(n, seed=SEED, start_date=START_DATE, days=DAYS):
+    """DataFrame de `n` avis synthétiques (colonnes du scraper, dates sur `days` jours)."""
+    rng = np.random.default_rng(seed)
+    scores = rng.choice(np.arange(1, 6), size=n, p=SCORE_PROBABILITIES)
+    tones = np.where(scores <= 2, "negatif", np.where(scores == 3, "neutre", "positif"))
+    languages = rng.choice(list(LANGUAGE_PROBABILITIES), size=n, p=list(LANGUAGE_PROBABILITIES.values()))
+    topics = rng.choice(list(TOPICS), size=n)
+
+    # Assemblage par groupe (ton x langue x sujet) : chaque fragment est tiré en une fois
+    content = np.empty(n, dtype=object)
+    for tone in PREDICATES:
+        for language in LANGUAGE_PROBABILITIES:
+            for topic, subjects in TOPICS.items():
+                mask = (tones == tone) & (languages == language) & (topics == topic)
+                size = int(mask.sum())
+                if not size:
+                    continue
+                content[mask] = (_pick(rng, PREFIXES[language], size) + _pick(rng, subjects[language], size)
+                                 + " " + _pick(rng, PREDICATES[tone][language], size)
+                                 + _detail(rng, language, size) + _pick(rng, SUFFIXES[tone][language], size))
+
+    # Avis très courts, répétés à l'identique ou presque (quasi-doublons)
+    short = rng.random(n) < SHORT_REVIEW_SHARE
+    for tone, texts in SHORT_REVIEWS.items():
+        mask = short & (tones == tone)
+        _fill(content, mask, _pick(rng, texts, int(mask.sum())))
+
+    seconds = rng.integers(0, days * 86_400, size=n)
+    at = pd.Timestamp(start_date) + pd.to_timedelta(np.sort(seconds), unit='s')
+    return pd.DataFrame({
+        'reviewId': [f"synthetic-{seed}-{i}" for i in range(n)],
+        'userName': _pick(rng, USER_NAMES, n),
+        'content': content,
+        'score': scores,
+        'thumbsUpCount': rng.poisson(0.5, size=n),
+        'reviewCreatedVersion': _pick(rng, APP_VERSIONS, n),
+        'at': at,
+        'replyContent': None,
+        'repliedAt': pd.NaT,
+    })
+
+def generate_faq(n, seed=SEED):
+    """Texte d'une FAQ de `n` questions/réponses, au format de data/faq_orange.txt."""
+    rng = np.random.default_rng(seed)
+    entries = []
+    for i in range(n):
+        topic = list(FAQ_ACTIONS)[i % len(FAQ_ACTIONS)]
+        action = FAQ_ACTIONS[topic][(i // len(FAQ_ACTIONS)) % len(FAQ_ACTIONS[topic])]
+        channel = FAQ_CHANNELS[int(rng.integers(0, len(FAQ_CHANNELS)))]
+        # Le numéro d'offre rend chaque question unique (pas de morceaux dédoublonnés)
+        question = f"Comment {action} {channel} (offre {i + 1}) ?"
+        entries.append(f"Q: {question}\nR: {FAQ_ANSWERS[topic]} Offre {i + 1} : disponible {channel}.")
+    return "\n\n".join(entries) + "\n"
+
+def generate_queries(n, seed=SEED):
+    """`n` questions de clients, tirées des variantes françaises et darija de chaque sujet."""
+    rng = np.random.default_rng(seed)
+    questions = [question for variants in QUERIES.values() for question in variants]
+    return list(_pick(rng, questions, n))
@@ -0,0 +1,220 @@
+"""
+Service HTTP asynchrone du chatbot (web / mobile).
+
+- La base vectorielle et le modèle d'embedding sont chargés une fois au démarrage
+- Le client LLM est réutilisé d'une requête à l'autre (rag_chatbot.get_llm)
+- Les embeddings des questions arrivant en même temps sont calculés en un seul
+  passage du modèle (micro-batching)
+- Recherche et appel au LLM tournent hors de la boucle d'événements (threads)
+- Au-delà de MAX_CONCURRENT requêtes actives et MAX_PENDING en attente : 429
+- Chaque requête est tracée (durée de chaque phase, cf. tracing.py) : percentiles
+  depuis le démarrage sur GET /metrics
+
+Lancement :
+    uvicorn src.chatbot.api:app --host 0.0.0.0 --port 8000
+Test de charge hors ligne (LLM simulé) :
+    LLM_BACKEND=stub uvicorn src.chatbot.api:app
+"""
+
+import os
+import sys
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import anyio
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool, iterate_in_threadpool
+from pydantic import BaseModel
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.chatbot.rag_chatbot import prewarm, get_llm_response, stream_llm_response, get_cache_stats, GROQ_API_KEY
+from src.chatbot.tracing import tracer
+
+# Configuration
+MAX_CONCURRENT = int(os.getenv("API_MAX_CONCURRENT", "64"))   # Requêtes traitées en parallèle
+MAX_PENDING = int(os.getenv("API_MAX_PENDING", "256"))        # Requêtes en attente avant de répondre 429
+BATCH_WINDOW_MS = float(os.getenv("API_BATCH_WINDOW_MS", "5"))
+MAX_BATCH = int(os.getenv("API_MAX_BATCH", "32"))
+
+class Message(BaseModel):
+    role: str  # "user" ou "assistant"
+    content: str
+
+class ChatRequest(BaseModel):
+    query: str
+    journey: Optional[str] = None  # Parcours courant du client (recharge, paiement, wallet...)
+    history: List[Message] = []    # Messages précédents de la conversation (résumés dans un budget fixe)
+    stream: bool = False
+
+class QueryBatcher:
+    """
+    Regroupe les questions reçues pendant BATCH_WINDOW_MS (au plus MAX_BATCH)
+    et calcule leurs embeddings en un seul appel au modèle.
+    """
+
+    def __init__(self, embedding_function, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH):
+        self.embedding_function = embedding_function
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    async def embed(self, text):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((text, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await run_in_threadpool(self.embedding_function.embed_documents, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+class ConcurrencyLimiter:
+    """Sémaphore avec file d'attente bornée : au-delà, la requête est refusée (backpressure)."""
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT, max_pending=MAX_PENDING):
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.max_total = max_concurrent + max_pending
+        self.in_flight = 0
+
+    async def acquire(self):
+        if self.in_flight >= self.max_total:
+            raise HTTPException(status_code=429, detail="Service saturé, réessayez dans un instant.",
+                                headers={"Retry-After": "1"})
+        self.in_flight += 1
+        try:
+            await self.semaphore.acquire()
+        except BaseException:
+            # Requête annulée pendant l'attente (client parti) : elle ne compte plus
+            self.in_flight -= 1
+            raise
+
+    def release(self):
+        self.semaphore.release()
+        self.in_flight -= 1
+
+class LimitedStreamingResponse(StreamingResponse):
+    """
+    Flux qui rend sa place au limiteur une fois envoyé, y compris si le client se
+    déconnecte avant que le générateur ne démarre (son `finally` ne s'exécuterait pas,
+    et Starlette ne lance pas les tâches d'arrière-plan après une déconnexion).
+    """
+
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+state = {}
+
+@asynccontextmanager
+async def lifespan(app):
+    # Assez de threads pour que chaque requête active ait le sien (recherche + LLM)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = MAX_CONCURRENT + 8
+
+    # Base, modèle d'embedding et client LLM chargés avant la première vraie question
+    db = await run_in_threadpool(prewarm)
+    if db is None:
+        raise RuntimeError("Base de connaissances introuvable. Lancez d'abord ingest_knowledge.py")
+
+    state["db"] = db
+    state["batcher"] = QueryBatcher(db.embeddings)
+    state["batcher"].start()
+    state["limiter"] = ConcurrencyLimiter()
+    yield
+    await state["batcher"].stop()
+
+app = FastAPI(title="Orange Maroc - Chatbot", lifespan=lifespan)
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "in_flight": state["limiter"].in_flight, "cache": get_cache_stats()}
+
+@app.get("/metrics")
+async def metrics():
+    # Latences par phase (p50/p95/p99) des requêtes traitées par ce processus
+    return {"in_flight": state["limiter"].in_flight, "cache": get_cache_stats(), "latency": tracer.snapshot()}
+
+@app.post("/chat")
+async def chat(request: ChatRequest):
+    # Attente dans la file comprise : c'est ce que voit le client
+    trace = tracer.start(source="api", stream=request.stream)
+    limiter = state["limiter"]
+    try:
+        with trace.span("queue"):
+            await limiter.acquire()
+    except HTTPException as e:
+        # Requête refusée (file pleine) : tracée quand même (histogrammes et fichier de traces)
+        trace.set(status=str(e.status_code))
+        tracer.finish(trace)
+        raise
+    try:
+        # Embedding par lots : attente de la fenêtre de regroupement comprise
+        with trace.span("embed_query"):
+            query_vector = await state["batcher"].embed(request.query)
+    except BaseException as e:
+        # Erreur ou annulation : la place est rendue dans tous les cas
+        limiter.release()
+        trace.set(status="erreur" if isinstance(e, Exception) else "interrompue", error=type(e).__name__)
+        tracer.finish(trace)
+        raise
+
+    history = [message.model_dump() for message in request.history]
+    if request.stream:
+        async def body():
+            parts = stream_llm_response(state["db"], request.query, GROQ_API_KEY,
+                                        query_vector=query_vector, journey=request.journey,
+                                        history=history, trace=trace)
+            async for part in iterate_in_threadpool(parts):
+                yield part
+        # La place n'est libérée qu'à la fin de l'envoi du flux (ou à la déconnexion du client)
+        return LimitedStreamingResponse(body(), limiter.release, media_type="text/plain; charset=utf-8")
+
+    try:
+        answer = await run_in_threadpool(get_llm_response, state["db"], request.query, GROQ_API_KEY,
+                                         query_vector=query_vector, journey=request.journey,
+                                         history=history, trace=trace)
+    finally:
+        limiter.release()
+    return {"answer": answer}
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=int(os.getenv("PORT", "8000")))
@@ -0,0 +1,301 @@
+"""
+Cache persistant des embeddings, partagé par l'ingestion, le chatbot et l'analyse des avis.
+
+Un même texte (morceau de FAQ, question fréquente, avis ré-analysé) ne passe
+qu'une seule fois par le modèle :
+- clé : (nom du modèle, hash du texte normalisé)
+- vecteurs dans une matrice float32 mappée en mémoire (vectors.f32)
+- index SQLite (clé -> ligne de la matrice, date de dernier usage)
+- bornes LRU en mémoire (max_memory_items) et sur disque (max_disk_items)
+
+Une lecture n'écrit rien sur disque : les dates de dernier usage sont gardées en
+mémoire et enregistrées au prochain ajout, à la fermeture, ou tous les
+TOUCH_FLUSH_ITEMS usages.
+
+Accès depuis plusieurs processus (API, tableau de bord, pipeline) : un seul écrivain
+à la fois, garanti par un verrou de fichier (fcntl, Unix ; sous Windows, ne lancer
+qu'un processus qui ajoute des vecteurs). Les lecteurs suivent l'agrandissement de
+la matrice par un autre processus. Une fois le disque plein (max_disk_items), une
+ligne évincée peut être réécrite pendant qu'un autre processus la lit : rare, et
+le vecteur lu est alors celui d'un autre texte jusqu'au prochain calcul.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import atexit
+import threading
+import unicodedata
+from contextlib import contextmanager
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou entre processus
+    fcntl = None
+
+# Configuration
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+CACHE_DIR = os.path.join("data", "cache", "embeddings")
+MAX_MEMORY_ITEMS = 10_000
+MAX_DISK_ITEMS = 500_000
+INITIAL_CAPACITY = 1_024
+MAX_VARIABLES = 900  # Limite SQLite du nombre de paramètres par requête
+TOUCH_FLUSH_ITEMS = 10_000  # Dates de dernier usage gardées en mémoire avant écriture
+SQLITE_TIMEOUT = 30         # Secondes d'attente si un autre processus écrit
+
+def normalize_text(text):
+    return re.sub(r'\s+', ' ', unicodedata.normalize('NFC', text)).strip()
+
+def text_key(text):
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+class EmbeddingStore:
+    def __init__(self, model_name=EMBEDDING_MODEL, directory=CACHE_DIR,
+                 max_memory_items=MAX_MEMORY_ITEMS, max_disk_items=MAX_DISK_ITEMS):
+        # Un dossier par modèle : la clé complète est (modèle, hash du texte)
+        # Chemin absolu : la fermeture (atexit) peut avoir lieu après un changement de dossier
+        self.directory = os.path.abspath(os.path.join(directory, re.sub(r'[^\w.-]', '_', model_name)))
+        os.makedirs(self.directory, exist_ok=True)
+        self.matrix_path = os.path.join(self.directory, "vectors.f32")
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+
+        self.lock_path = os.path.join(self.directory, "writer.lock")
+        self.writing = 0  # Profondeur du verrou d'écriture (ré-entrant dans le même thread)
+
+        self.lock = threading.RLock()
+        self.memory = OrderedDict()
+        self.touched = {}  # clé -> date de dernier usage pas encore écrite
+        self.conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"),
+                                    timeout=SQLITE_TIMEOUT, check_same_thread=False)
+        # WAL : les lecteurs des autres processus ne sont pas bloqués par l'écrivain
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER UNIQUE, last_used REAL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.commit()
+
+        self.dim = None
+        self.capacity = 0
+        self.matrix = None
+        self._refresh()
+
+    def _refresh(self):
+        """Relit les dimensions de la matrice (un autre processus a pu l'agrandir)."""
+        meta = dict(self.conn.execute("SELECT name, value FROM meta"))
+        capacity = meta.get("capacity", 0)
+        self.dim = self.dim or meta.get("dim")
+        if self.dim and capacity and (self.matrix is None or capacity != self.capacity) \
+                and os.path.exists(self.matrix_path):
+            self.capacity = capacity
+            self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    @contextmanager
+    def _writer(self):
+        """Un seul processus écrit à la fois (verrou de fichier exclusif, appelé sous self.lock)."""
+        if fcntl is None or self.writing:
+            # Déjà tenu (ex : get_many appelé par put_many) : un second flock bloquerait
+            self.writing += 1
+            try:
+                yield
+            finally:
+                self.writing -= 1
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.writing += 1
+            try:
+                yield
+            finally:
+                self.writing -= 1
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _flush_touches(self):
+        if self.touched:
+            self.conn.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                  [(used, key) for key, used in self.touched.items()])
+            self.conn.commit()
+            self.touched = {}
+
+    def flush(self):
+        """Écrit les dates de dernier usage en attente."""
+        with self.lock:
+            with self._writer():
+                self._flush_touches()
+
+    def close(self):
+        with self.lock:
+            if self.conn is None:
+                return
+            try:
+                self.flush()
+            except (OSError, sqlite3.Error) as e:
+                # Dates d'usage perdues : l'éviction sera un peu moins précise, rien de plus
+                print(f"Erreur d'écriture du cache d'embeddings : {e}")
+            if self.matrix is not None:
+                self.matrix.flush()
+            self.conn.close()
+            self.conn = None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def _resize(self, capacity):
+        """Agrandit le fichier de la matrice (les lignes existantes ne bougent pas)."""
+        if self.matrix is not None:
+            self.matrix.flush()
+            del self.matrix
+        with open(self.matrix_path, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+        self.capacity = capacity
+        self.matrix = np.memmap(self.matrix_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+        self.conn.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+                              [("dim", self.dim), ("capacity", capacity)])
+
+    def _remember(self, key, vector):
+        self.memory[key] = vector
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_memory_items:
+            self.memory.popitem(last=False)
+
+    def get_many(self, keys):
+        """Retourne {clé: vecteur} pour les clés présentes en mémoire ou sur disque."""
+        with self.lock:
+            found = {}
+            for key in keys:
+                if key in self.memory:
+                    self.memory.move_to_end(key)
+                    found[key] = self.memory[key]
+
+            remaining = list({key for key in keys if key not in found})
+            if remaining and self.dim is None:
+                self._refresh()  # Matrice créée entre-temps par un autre processus
+            if remaining and self.dim is not None:
+                for i in range(0, len(remaining), MAX_VARIABLES):
+                    batch = remaining[i:i + MAX_VARIABLES]
+                    rows = self.conn.execute(
+                        f"SELECT key, row FROM entries WHERE key IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall()
+                    if rows and max(row for _, row in rows) >= self.capacity:
+                        self._refresh()
+                    for key, row in rows:
+                        vector = np.array(self.matrix[row])
+                        found[key] = vector
+                        self._remember(key, vector)
+
+            # Pas d'écriture SQLite par lecture : l'usage est noté en mémoire
+            now = time.time()
+            self.touched.update((key, now) for key in found)
+            if len(self.touched) >= TOUCH_FLUSH_ITEMS:
+                self.flush()
+            return found
+
+    def _allocate_rows(self, n):
+        """Lignes libres pour n vecteurs ; au-delà de max_disk_items, les moins récemment utilisés sont évincés."""
+        count = len(self)
+        fresh = max(0, min(n, self.max_disk_items - count))
+        rows = list(range(count, count + fresh))
+        if fresh < n:
+            evicted = self.conn.execute(
+                "SELECT key, row FROM entries ORDER BY last_used LIMIT ?", (n - fresh,)
+            ).fetchall()
+            self.conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in evicted])
+            for key, _ in evicted:
+                self.memory.pop(key, None)
+            rows += [row for _, row in evicted]
+
+        needed = count + fresh
+        if needed > self.capacity:
+            capacity = max(INITIAL_CAPACITY, self.capacity)
+            while capacity < needed:
+                capacity *= 2
+            self._resize(min(capacity, self.max_disk_items))
+        return rows
+
+    def put_many(self, items):
+        """items : {clé: vecteur}"""
+        with self.lock:
+            items = {key: np.asarray(vector, dtype=np.float32) for key, vector in items.items()}
+            if not items:
+                return
+            if self.dim is None:
+                self.dim = len(next(iter(items.values())))
+
+            with self._writer():
+                # État de la matrice relu sous le verrou : un autre processus a pu ajouter des lignes
+                self._refresh()
+                existing = self.get_many(list(items))
+                items = {key: vector for key, vector in items.items() if key not in existing}
+                # Dates d'usage en attente écrites avant de choisir les lignes à évincer
+                self._flush_touches()
+                if not items:
+                    return
+                if len(items) > self.max_disk_items:
+                    # Lot plus grand que le cache : seuls les derniers vecteurs sont gardés
+                    items = dict(list(items.items())[-self.max_disk_items:])
+
+                rows = self._allocate_rows(len(items))
+                now = time.time()
+                for row, (key, vector) in zip(rows, items.items()):
+                    self.matrix[row] = vector
+                    self._remember(key, vector)
+                self.matrix.flush()
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                    [(key, row, now) for row, key in zip(rows, items)],
+                )
+                self.conn.commit()
+
+class CachedEmbeddings(Embeddings):
+    """Fonction d'embedding LangChain : consulte le cache avant d'appeler le modèle."""
+
+    def __init__(self, model_name=EMBEDDING_MODEL, store=None):
+        self.model_name = model_name
+        self.store = store if store is not None else EmbeddingStore(model_name)
+        self._model = None
+
+    @property
+    def model(self):
+        # Le modèle n'est chargé que si un texte n'est pas déjà en cache
+        if self._model is None:
+            from langchain_community.embeddings import SentenceTransformerEmbeddings
+            self._model = SentenceTransformerEmbeddings(model_name=self.model_name)
+        return self._model
+
+    def embed_documents(self, texts):
+        keys = [text_key(text) for text in texts]
+        found = self.store.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = self.model.embed_documents(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.store.put_many(computed)
+            found.update({key: np.asarray(vector, dtype=np.float32) for key, vector in computed.items()})
+
+        return [found[key].tolist() for key in keys]
+
+    def embed_query(self, text):
+        # Avec sentence-transformers, requête et document ont le même embedding
+        return self.embed_documents([text])[0]
+
+_embedding_functions = {}
+_lock = threading.Lock()
+
+def get_embedding_function(model_name=EMBEDDING_MODEL):
+    """Une seule fonction d'embedding (et un seul cache) par modèle et par processus."""
+    with _lock:
+        if model_name not in _embedding_functions:
+            embeddings = CachedEmbeddings(model_name)
+            # Dates de dernier usage en attente enregistrées à la sortie du processus
+            atexit.register(embeddings.store.close)
+            _embedding_functions[model_name] = embeddings
+        return _embedding_functions[model_name]
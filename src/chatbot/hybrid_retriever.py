@@ -0,0 +1,169 @@
+"""
+Recherche hybride en mémoire (BM25 + dense) pour les petites bases de connaissances.
+
+Pour une FAQ de quelques dizaines/centaines de morceaux, passer par SQLite + HNSW
+(Chroma) coûte plus cher qu'un simple produit matriciel. Ce moteur garde :
+- les embeddings des morceaux dans une matrice NumPy (cosinus exact, top-k vectorisé)
+- un index inversé BM25 pré-calculé, qui retrouve les mots-clés exacts ("*3", "555")
+  que la recherche dense rate
+et fusionne les deux classements par Reciprocal Rank Fusion (RRF).
+
+Même interface que Chroma pour le chatbot (embeddings, similarity_search,
+similarity_search_by_vector), sélectionné par RETRIEVER=hybrid dans rag_chatbot.py.
+"""
+
+import re
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Configuration
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60          # Constante de la fusion : 1 / (RRF_K + rang)
+CANDIDATES = 20     # Profondeur de chaque classement avant fusion
+
+# Garde les codes USSD et raccourcis (*3, #555#) comme mots-clés
+TOKEN_PATTERN = re.compile(r"[\w*#]+")
+WORD_PATTERN = re.compile(r"\w+")
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if not WORD_PATTERN.fullmatch(token):
+            # "#555#" est aussi trouvé par "555"
+            tokens.extend(WORD_PATTERN.findall(token))
+    return tokens
+
+class HybridRetriever:
+    def __init__(self, documents, vectors, embedding_function):
+        self.documents = documents
+        self.embedding_function = embedding_function
+
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.where(norms == 0, 1, norms)
+
+        self._build_bm25([doc.page_content for doc in documents])
+
+    @classmethod
+    def from_chroma(cls, db):
+        """Charge morceaux et embeddings déjà calculés depuis une collection Chroma (aucun recalcul)."""
+        stored = db.get(include=['documents', 'metadatas', 'embeddings'])
+        documents = [Document(page_content=text, metadata=metadata or {})
+                     for text, metadata in zip(stored['documents'], stored['metadatas'])]
+        return cls(documents, stored['embeddings'], db.embeddings)
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    def __len__(self):
+        return len(self.documents)
+
+    def _build_bm25(self, texts):
+        """Poids BM25 de chaque (terme, morceau) calculés une fois : une requête n'est plus que des additions."""
+        doc_tokens = [Counter(tokenize(text)) for text in texts]
+        lengths = np.array([sum(tokens.values()) for tokens in doc_tokens], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+        postings = defaultdict(list)
+        for i, tokens in enumerate(doc_tokens):
+            for term, tf in tokens.items():
+                postings[term].append((i, tf))
+
+        n = len(texts)
+        self.postings = {}
+        for term, entries in postings.items():
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            indices = np.array([i for i, _ in entries])
+            tf = np.array([tf for _, tf in entries], dtype=np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[indices] / (avg_length or 1))
+            self.postings[term] = (indices, idf * tf * (BM25_K1 + 1) / (tf + norm))
+
+    def _similarities(self, query_vector):
+        vector = np.asarray(query_vector, dtype=np.float32)
+        return self.matrix @ (vector / (np.linalg.norm(vector) or 1))
+
+    def _dense_ranking(self, query_vector, allowed):
+        scores = self._similarities(query_vector)
+        if allowed is not None:
+            scores = np.where(allowed, scores, -np.inf)
+        return self._top(scores, lambda s: s > -np.inf)
+
+    def _bm25_ranking(self, query, allowed):
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term in self.postings:
+                indices, weights = self.postings[term]
+                scores[indices] += weights
+        if allowed is not None:
+            scores = np.where(allowed, scores, 0)
+        return self._top(scores, lambda s: s > 0)
+
+    @staticmethod
+    def _top(scores, keep):
+        depth = min(CANDIDATES, len(scores))
+        if depth == 0:
+            return []
+        top = np.argpartition(-scores, depth - 1)[:depth]
+        top = top[np.argsort(-scores[top])]
+        return [int(i) for i in top if keep(scores[i])]
+
+    @staticmethod
+    def _matches(metadata, filter):
+        for key, condition in filter.items():
+            value = metadata.get(key)
+            if isinstance(condition, dict):
+                if "$in" in condition and value not in condition["$in"]:
+                    return False
+                if "$eq" in condition and value != condition["$eq"]:
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    def _allowed(self, filter):
+        """Masque des morceaux dont les métadonnées correspondent à `filter` (syntaxe Chroma : valeur, $eq, $in)."""
+        if not filter:
+            return None
+        return np.array([self._matches(doc.metadata, filter) for doc in self.documents])
+
+    def best_similarity(self, query_vector, filter=None):
+        """
+        Cosinus du morceau le plus proche parmi ceux de `filter` : pertinence absolue,
+        contrairement au score RRF qui ne dépend que des rangs (0 sans morceau).
+        """
+        scores = self._similarities(query_vector)
+        allowed = self._allowed(filter)
+        if allowed is not None:
+            scores = scores[allowed]
+        return float(scores.max()) if len(scores) else 0.0
+
+    def hybrid_search(self, query, k=3, query_vector=None, filter=None):
+        """Fusion RRF des classements dense et BM25 ; retourne les k meilleurs morceaux."""
+        return [doc for doc, _ in self.hybrid_search_with_scores(query, k, query_vector, filter)]
+
+    def hybrid_search_with_scores(self, query, k=3, query_vector=None, filter=None):
+        """Comme hybrid_search, avec le score RRF de chaque morceau : [(document, score)]."""
+        if query_vector is None:
+            query_vector = self.embedding_function.embed_query(query)
+        allowed = self._allowed(filter)
+
+        fused = defaultdict(float)
+        for ranking in (self._dense_ranking(query_vector, allowed), self._bm25_ranking(query, allowed)):
+            for rank, i in enumerate(ranking):
+                fused[i] += 1 / (RRF_K + rank + 1)
+
+        best = sorted(fused, key=fused.get, reverse=True)[:k]
+        return [(self.documents[i], fused[i]) for i in best]
+
+    def similarity_search(self, query, k=3, filter=None, **kwargs):
+        return self.hybrid_search(query, k=k, filter=filter)
+
+    def similarity_search_by_vector(self, embedding, k=3, filter=None, **kwargs):
+        ranking = self._dense_ranking(embedding, self._allowed(filter))
+        return [self.documents[i] for i in ranking[:k]]
@@ -1,34 +1,38 @@
 import os
+import sys
+import re
+import hashlib
 from langchain_community.document_loaders import TextLoader
 from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.chatbot.embedding_cache import get_embedding_function
+from src.chatbot.response_cache import KB_VERSION_FILE
+from src.chatbot.journeys import tag_journey
 
 # Gestion des versions de LangChain pour l'import
 try:
-    from langchain.text_splitter import CharacterTextSplitter
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 except ImportError:
-    from langchain_text_splitters import CharacterTextSplitter
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 # Configuration
 FAQ_FILE = os.path.join("data", "faq_orange.txt")
 DB_DIR = os.path.join("data", "chroma_db")
 
-def ingest_data():
-    if not os.path.exists(FAQ_FILE):
-        print(f"Erreur : Le fichier {FAQ_FILE} n'existe pas.")
-        return
+# Fichiers de connaissances ingérés, avec les métadonnées attachées à chacun de leurs morceaux.
+# Un "journey" dans les métadonnées fixe le parcours de toute la source (sinon : étiquette
+# "[parcours: x]" dans le morceau, sinon parcours général, cf. journeys.py)
+SOURCES = [
+    {"path": FAQ_FILE, "metadata": {"type": "faq", "lang": "fr"}},
+]
 
-    print("Lecture du fichier FAQ...")
-    loader = TextLoader(FAQ_FILE, encoding='utf-8')
+def split_source(path):
+    loader = TextLoader(path, encoding='utf-8')
     documents = loader.load()
 
-    print("Découpage du texte en morceaux...")
-    # On utilise RecursiveCharacterTextSplitter pour mieux couper
-    try:
-        from langchain.text_splitter import RecursiveCharacterTextSplitter
-    except ImportError:
-        from langchain_text_splitters import RecursiveCharacterTextSplitter
-    
     # Chunk size réduit pour avoir une question par morceau (environ)
     # On coupe strictement sur "Q: " pour avoir une question par morceau
     text_splitter = RecursiveCharacterTextSplitter(
@@ -37,18 +41,77 @@ def ingest_data():
         chunk_overlap=0,
         keep_separator=True
     )
-    texts = text_splitter.split_documents(documents)
-    print(f"{len(texts)} morceaux créés.")
-
-    print("Création de la base de données vectorielle (ChromaDB)...")
-    # On utilise un modèle multilingue gratuit
-    embedding_function = SentenceTransformerEmbeddings(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
-    
-    # Création et sauvegarde de la DB
-    db = Chroma.from_documents(texts, embedding_function, persist_directory=DB_DIR)
-    db.persist()
-    
-    print(f"Succès ! Base de données créée dans {DB_DIR}")
+    return text_splitter.split_documents(documents)
+
+def chunk_id(source, text, journey):
+    """
+    ID déterministe : hash du contenu Q/R (espaces normalisés), de sa source et de son
+    parcours (un morceau changé de parcours est ré-indexé avec ses nouvelles métadonnées).
+    """
+    normalized = re.sub(r'\s+', ' ', text).strip()
+    return hashlib.sha256(f"{source}\n{journey}\n{normalized}".encode('utf-8')).hexdigest()[:32]
+
+def build_chunks(sources=SOURCES):
+    """Retourne {id: (texte, métadonnées)} pour tous les morceaux de toutes les sources."""
+    chunks = {}
+    for source in sources:
+        path = source["path"]
+        if not os.path.exists(path):
+            # Pas de base partielle : les morceaux de la source absente seraient supprimés de la collection
+            raise FileNotFoundError(f"Le fichier {path} n'existe pas.")
+
+        base_metadata = source.get("metadata", {})
+        for doc in split_source(path):
+            text, journey = tag_journey(doc.page_content, base_metadata.get("journey"))
+            cid = chunk_id(path, text, journey)
+            metadata = {**base_metadata, "journey": journey, "source": path, "chunk_id": cid}
+            # Un morceau identique répété dans le fichier n'est stocké qu'une fois
+            chunks[cid] = (text, metadata)
+    return chunks
+
+def write_kb_version(chunks):
+    """Empreinte du contenu de la base : le cache de réponses du chatbot se vide quand elle change."""
+    version = hashlib.sha256("\n".join(sorted(chunks)).encode('utf-8')).hexdigest()[:16]
+    with open(KB_VERSION_FILE, 'w', encoding='utf-8') as f:
+        f.write(version)
+
+def ingest_data(sources=SOURCES):
+    print("Lecture et découpage des fichiers de connaissances...")
+    chunks = build_chunks(sources)
+    if not chunks:
+        return
+    print(f"{len(chunks)} morceaux créés.")
+
+    # On utilise un modèle multilingue gratuit (via le cache d'embeddings partagé)
+    embedding_function = get_embedding_function()
+    db = Chroma(persist_directory=DB_DIR, embedding_function=embedding_function)
+
+    # Différence avec ce qui est déjà stocké : seuls les morceaux nouveaux ou modifiés sont vectorisés.
+    # La collection appartient à l'ingestion : tout ID absent des sources (morceau supprimé,
+    # ancienne version d'un morceau modifié, doublon d'une ancienne ingestion) est retiré.
+    existing_ids = set(db.get(include=[])['ids'])
+    new_ids = [cid for cid in chunks if cid not in existing_ids]
+    removed_ids = [cid for cid in existing_ids if cid not in chunks]
+
+    # Ajout d'abord, suppression ensuite : si la vectorisation échoue (modèle absent...),
+    # l'exception remonte avant toute suppression et la base précédente reste intacte
+    if new_ids:
+        print(f"Vectorisation de {len(new_ids)} morceaux...")
+        db.add_texts(
+            texts=[chunks[cid][0] for cid in new_ids],
+            metadatas=[chunks[cid][1] for cid in new_ids],
+            ids=new_ids,
+        )
+    if removed_ids:
+        db.delete(ids=removed_ids)
+    if hasattr(db, "persist"):
+        db.persist()
+
+    if new_ids or removed_ids or not os.path.exists(KB_VERSION_FILE):
+        write_kb_version(chunks)
+
+    print(f"Succès ! {len(new_ids)} ajoutés, {len(removed_ids)} supprimés, "
+          f"{len(chunks) - len(new_ids)} inchangés dans {DB_DIR}")
 
 if __name__ == "__main__":
-    ingest_data()
\ No newline at end of file
+    ingest_data()
@@ -0,0 +1,45 @@
+"""
+Parcours digitaux (recharge, paiement, wallet...) de l'application.
+
+Chaque morceau de la base de connaissances est étiqueté avec son parcours à
+l'ingestion ("[parcours: x]" dans la FAQ, "general" par défaut) ; le chatbot
+reçoit le parcours où se trouve le client et cherche d'abord dans ces morceaux
+(et les morceaux généraux) : moins de candidats, un prompt plus court et plus
+pertinent.
+"""
+
+import re
+
+DEFAULT_JOURNEY = "general"
+
+# Parcours des morceaux : étiquette explicite dans la source (pas de détection par
+# mots-clés, trop d'erreurs sur la FAQ réelle : "reçu", "bonus", "club"...)
+JOURNEYS = ["recharge", "paiement", "wallet", "compte", "application", "internet", DEFAULT_JOURNEY]
+
+# Étiquette explicite dans les fichiers de connaissances : "[parcours: wallet]"
+JOURNEY_TAG = re.compile(r'\[parcours\s*:\s*([\w-]+)\]\s*', re.IGNORECASE)
+
+def strip_journey_tags(text):
+    """Texte sans ses étiquettes de parcours (ex : FAQ lue hors de l'ingestion)."""
+    return JOURNEY_TAG.sub('', text)
+
+def tag_journey(text, default=None):
+    """
+    Retourne (texte sans étiquette, parcours) : l'étiquette "[parcours: x]" du texte,
+    sinon `default` (parcours de la source), sinon DEFAULT_JOURNEY (morceau général,
+    proposé dans tous les parcours).
+    """
+    match = JOURNEY_TAG.search(text)
+    if match:
+        journey = match.group(1).lower()
+        if journey not in JOURNEYS:
+            print(f"Parcours inconnu '{journey}' (morceau rattaché à {DEFAULT_JOURNEY}), attendus : {', '.join(JOURNEYS)}")
+            journey = DEFAULT_JOURNEY
+        return strip_journey_tags(text).strip(), journey
+    return text, default or DEFAULT_JOURNEY
+
+def journey_filter(journey):
+    """Filtre de métadonnées (syntaxe Chroma) : morceaux du parcours et morceaux généraux."""
+    if not journey or journey == DEFAULT_JOURNEY:
+        return None
+    return {"journey": {"$in": [journey, DEFAULT_JOURNEY]}}
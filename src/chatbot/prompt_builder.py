@@ -0,0 +1,113 @@
+"""
+Construction du prompt du chatbot dans un budget de tokens fixe.
+
+- Contexte : morceaux retrouvés dédoublonnés (identiques ou quasi identiques),
+  ajoutés par score décroissant tant qu'ils tiennent dans CONTEXT_TOKEN_BUDGET.
+- Mémoire de conversation bornée : les RECENT_MESSAGES derniers messages sont gardés
+  tels quels, les plus anciens sont résumés (première phrase de chaque message),
+  le tout limité à HISTORY_TOKEN_BUDGET.
+
+La taille du prompt (et donc la latence et le coût du LLM) reste stable quelle
+que soit la longueur de la conversation.
+"""
+
+import math
+import re
+
+# Configuration
+CONTEXT_TOKEN_BUDGET = 700
+HISTORY_TOKEN_BUDGET = 350
+RECENT_MESSAGES = 4          # Derniers messages (question + réponse = 2) gardés mot pour mot
+SUMMARY_SENTENCE_TOKENS = 40 # Longueur max d'une phrase de résumé d'un ancien message
+DUPLICATE_THRESHOLD = 0.8    # Similarité de Jaccard au-delà de laquelle deux morceaux sont des doublons
+TOKENS_PER_WORD = 1.4        # Estimation pour Llama 3 (français / darija)
+
+SENTENCE_END = re.compile(r"(?<=[.!?؟])\s+")
+
+ROLE_LABELS = {"user": "Client", "assistant": "Assistant"}
+
+def estimate_tokens(text):
+    """Estimation rapide du nombre de tokens (pas besoin du tokenizer du modèle)."""
+    return math.ceil(len(text.split()) * TOKENS_PER_WORD)
+
+def truncate_to_tokens(text, budget):
+    words = text.split()
+    max_words = int(budget / TOKENS_PER_WORD)
+    return text if len(words) <= max_words else " ".join(words[:max_words]) + "…"
+
+def _word_set(text):
+    return set(w.lower() for w in re.findall(r"\w+", text))
+
+def dedupe_documents(scored_docs, threshold=DUPLICATE_THRESHOLD):
+    """Garde le meilleur morceau de chaque groupe de doublons. `scored_docs` : [(doc, score)] trié par score."""
+    kept, kept_words, seen_ids = [], [], set()
+    for doc, score in scored_docs:
+        cid = doc.metadata.get("chunk_id", doc.page_content)
+        if cid in seen_ids:
+            continue
+        words = _word_set(doc.page_content)
+        if any(len(words & other) / (len(words | other) or 1) >= threshold for other in kept_words):
+            continue
+        seen_ids.add(cid)
+        kept.append((doc, score))
+        kept_words.append(words)
+    return kept
+
+def pack_context(scored_docs, budget=CONTEXT_TOKEN_BUDGET):
+    """
+    Retourne les morceaux à mettre dans le prompt : dédoublonnés, par score décroissant,
+    tant qu'ils tiennent dans `budget` (un morceau trop long est sauté, les suivants sont essayés).
+    """
+    ordered = sorted(scored_docs, key=lambda pair: pair[1], reverse=True)
+    packed, used = [], 0
+    for doc, _ in dedupe_documents(ordered):
+        cost = estimate_tokens(doc.page_content)
+        if used + cost > budget:
+            continue
+        packed.append(doc)
+        used += cost
+    # Toujours au moins un morceau, tronqué si nécessaire
+    if not packed and ordered:
+        doc = ordered[0][0]
+        packed.append(doc.__class__(page_content=truncate_to_tokens(doc.page_content, budget), metadata=doc.metadata))
+    return packed
+
+def _summarize(message):
+    first_sentence = SENTENCE_END.split(message["content"].strip(), maxsplit=1)[0]
+    return f"- {ROLE_LABELS.get(message['role'], message['role'])} : {truncate_to_tokens(first_sentence, SUMMARY_SENTENCE_TOKENS)}"
+
+def format_history(messages, recent=RECENT_MESSAGES, budget=HISTORY_TOKEN_BUDGET):
+    """
+    Historique borné pour le prompt (messages : [{"role", "content"}], du plus ancien au plus récent).
+    Retourne "" s'il n'y a pas d'historique.
+    """
+    if not messages:
+        return ""
+
+    older, latest = messages[:-recent], messages[-recent:]
+    recent_lines = [f"{ROLE_LABELS.get(m['role'], m['role'])} : {m['content'].strip()}" for m in latest]
+
+    # Le plus récent d'abord : on remonte dans le temps tant que le budget le permet
+    kept, used = [], 0
+    for line in reversed(recent_lines):
+        if not kept:
+            # Le dernier message est toujours gardé (tronqué si nécessaire)
+            line = truncate_to_tokens(line, budget)
+        cost = estimate_tokens(line)
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    else:
+        summary = []
+        for message in reversed(older):
+            line = _summarize(message)
+            cost = estimate_tokens(line)
+            if used + cost > budget:
+                break
+            summary.append(line)
+            used += cost
+        if summary:
+            kept.append("Résumé des échanges précédents :\n" + "\n".join(reversed(summary)))
+
+    return "\n".join(reversed(kept))
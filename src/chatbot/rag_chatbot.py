@@ -1,8 +1,18 @@
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from dotenv import load_dotenv
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import SentenceTransformerEmbeddings
-from langchain_groq import ChatGroq
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.chatbot.embedding_cache import get_embedding_function
+from src.chatbot.response_cache import SemanticResponseCache
+from src.chatbot.journeys import journey_filter
+from src.chatbot.prompt_builder import pack_context, format_history, estimate_tokens
+from src.chatbot.tracing import tracer
 
 # Charge le fichier .env automatiquement
 load_dotenv()
@@ -13,38 +23,77 @@ DB_DIR = os.path.join("data", "chroma_db")
 # --- CLÉ API GROQ (lue depuis .env ou variable d'environnement) ---
 GROQ_API_KEY = os.getenv("GROQ_API_KEY", "gsk_...")
 
+# "groq" (Llama 3.3 via Groq) ou "stub" (LLM local simulé, pour les tests de charge hors ligne)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")
+
+# "chroma" (SQLite + HNSW) ou "hybrid" (BM25 + dense en mémoire, pour les petites bases)
+RETRIEVER = os.getenv("RETRIEVER", "chroma")
+HYBRID_MAX_CHUNKS = 5_000  # Au-delà, retour automatique à Chroma
+RETRIEVAL_K = 6            # Candidats retrouvés, puis triés et limités au budget de tokens (prompt_builder.py)
+JOURNEY_MIN_RELEVANCE = 0.5  # Pertinence du meilleur morceau du parcours en dessous de laquelle toute la base est ajoutée
+
+# Cache sémantique des réponses (partagé par toutes les sessions du processus)
+response_cache = SemanticResponseCache()
+
 def load_db():
     if not os.path.exists(DB_DIR):
         print(f"Erreur : La base de données {DB_DIR} n'existe pas. Lancez d'abord ingest_knowledge.py")
         return None
 
-    # On utilise toujours le même embedding pour la recherche
-    embedding_function = SentenceTransformerEmbeddings(model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+    # Import à la demande : Chroma (et ses dépendances) ne sont chargés que si le chatbot sert
+    from langchain_community.vectorstores import Chroma
+
+    # On utilise toujours le même embedding pour la recherche (questions déjà vues : pas de recalcul)
+    embedding_function = get_embedding_function()
     db = Chroma(persist_directory=DB_DIR, embedding_function=embedding_function)
+
+    if RETRIEVER == "hybrid":
+        count = db._collection.count()
+        if count <= HYBRID_MAX_CHUNKS:
+            from src.chatbot.hybrid_retriever import HybridRetriever
+            return HybridRetriever.from_chroma(db)
+        print(f"{count} morceaux : base trop grande pour la recherche en mémoire, utilisation de Chroma.")
     return db
 
-def get_llm_response(db, query, api_key):
-    if not api_key or api_key == "gsk_...":
-        return "Erreur : Clé API Groq manquante. Vérifiez votre fichier .env ou définissez la variable GROQ_API_KEY."
+def _search(db, query, query_vector, k, filter):
+    # Recherche hybride si disponible (mots-clés + sens), sinon recherche vectorielle Chroma
+    if hasattr(db, "hybrid_search_with_scores"):
+        return db.hybrid_search_with_scores(query, k=k, query_vector=query_vector, filter=filter)
+    # Chroma renvoie une distance : convertie en pertinence (plus grand = meilleur)
+    relevance = db._select_relevance_score_fn()
+    results = db.similarity_search_by_vector_with_relevance_scores(query_vector, k=k, filter=filter)
+    return [(doc, relevance(distance)) for doc, distance in results]
 
-    # 1. Recherche des documents pertinents
-    docs = db.similarity_search(query, k=3)
-    
-    if not docs:
-        return "Désolé, je n'ai pas trouvé d'information dans ma base de connaissances."
-    
-    # 2. Construction du contexte
-    context = "\n\n".join([doc.page_content for doc in docs])
-    
-    # 3. Configuration du LLM (Llama 3.3 via Groq)
-    llm = ChatGroq(
-        temperature=0, 
-        groq_api_key=api_key, 
-        model_name="llama-3.3-70b-versatile"
-    )
+def _best_relevance(db, docs, query_vector, filter):
+    # Le score RRF de la recherche hybride ne dépend que des rangs : sa pertinence absolue est le cosinus
+    if hasattr(db, "best_similarity"):
+        return db.best_similarity(query_vector, filter)
+    return docs[0][1] if docs else 0.0
+
+def retrieve_documents(db, query, query_vector, k=RETRIEVAL_K, journey=None):
+    """
+    Recherche d'abord dans les morceaux du parcours `journey` (et les morceaux généraux).
+    Si le parcours n'a aucun morceau ou que le meilleur est peu pertinent (question hors
+    parcours, morceau mal étiqueté), les résultats de toute la base sont ajoutés.
+    Retourne [(document, score)], meilleur score en premier.
+    """
+    filter = journey_filter(journey)
+    if not filter:
+        return _search(db, query, query_vector, k, None)
+    docs = _search(db, query, query_vector, k, filter)
+    if docs and _best_relevance(db, docs, query_vector, filter) >= JOURNEY_MIN_RELEVANCE:
+        return docs
 
-    # 4. Construction du prompt (bilingue Français / Darija)
-    prompt = f"""Tu es un assistant virtuel expert pour Orange Maroc. Tu peux parler en français et en darija (arabe marocain).
+    merged = {}
+    for doc, score in docs + _search(db, query, query_vector, k, None):
+        key = doc.metadata.get("chunk_id", doc.page_content)
+        merged[key] = max((doc, score), merged.get(key, (doc, score)), key=lambda item: item[1])
+    return sorted(merged.values(), key=lambda item: item[1], reverse=True)[:k]
+
+def build_prompt(context, query, history=""):
+    history_block = f"\nConversation précédente (pour comprendre la question) :\n{history}\n" if history else ""
+    # Construction du prompt (bilingue Français / Darija)
+    return f"""Tu es un assistant virtuel expert pour Orange Maroc. Tu peux parler en français et en darija (arabe marocain).
 
 RÈGLE IMPORTANTE : Détecte la langue de la question de l'utilisateur et réponds DANS LA MÊME LANGUE.
 - Si la question est en français → réponds en français, de manière polie et professionnelle.
@@ -54,40 +103,191 @@ Si tu ne connais pas la réponse, dis-le honnêtement sans inventer.
 
 Utilise le contexte suivant pour répondre :
 {context}
-
+{history_block}
 Question : {query}
 
 Réponse :"""
 
-    # 5. Appel au LLM
+@lru_cache(maxsize=8)
+def get_llm(api_key):
+    """
+    Client LLM réutilisé d'une requête à l'autre (un par clé) : le client HTTP et
+    son pool de connexions ne sont créés qu'une fois.
+    """
+    if LLM_BACKEND == "stub":
+        from src.chatbot.stub_llm import StubLLM
+        return StubLLM()
+
+    # Configuration du LLM (Llama 3.3 via Groq)
+    from langchain_groq import ChatGroq
+    return ChatGroq(
+        temperature=0, 
+        groq_api_key=api_key, 
+        model_name="llama-3.3-70b-versatile"
+    )
+
+def stream_llm_response(db, query, api_key, cache=response_cache, query_vector=None, journey=None, history=None,
+                        trace=None):
+    """
+    Générateur : renvoie la réponse morceau par morceau, au fur et à mesure que
+    le LLM la produit. Une erreur en cours de génération est renvoyée comme
+    dernier morceau (message lisible, jamais d'exception dans l'interface).
+    `query_vector` permet de fournir un embedding déjà calculé (ex : par lots dans l'API).
+    `journey` : parcours où se trouve le client (recharge, paiement...), limite la recherche.
+    `history` : messages précédents [{"role", "content"}], résumés dans un budget de tokens fixe.
+    `trace` : trace déjà commencée par l'appelant (ex : l'API y chronomètre l'embedding), cf. tracing.py.
+    """
+    # Durée de chaque phase, tokens et morceaux retrouvés : enregistrés à la fin du flux
+    with tracer.record(trace, retriever=type(db).__name__, journey=journey,
+                       history_messages=len(history or []), query_tokens=estimate_tokens(query)) as trace:
+        yield from _generate_response(db, query, api_key, cache, query_vector, journey, history, trace)
+
+def _generate_response(db, query, api_key, cache, query_vector, journey, history, trace):
+    if LLM_BACKEND != "stub" and (not api_key or api_key == "gsk_..."):
+        trace.set(status="clé manquante")
+        yield "Erreur : Clé API Groq manquante. Vérifiez votre fichier .env ou définissez la variable GROQ_API_KEY."
+        return
+
+    # 1. Recherche des documents pertinents (l'embedding de la question sert aussi de clé de cache)
+    if query_vector is None:
+        with trace.span("embed_query"):
+            query_vector = db.embeddings.embed_query(query)
+    with trace.span("retrieve"):
+        scored_docs = retrieve_documents(db, query, query_vector, journey=journey)
+    # Morceaux dédoublonnés, par score, dans le budget de tokens du contexte
+    with trace.span("pack_context"):
+        docs = pack_context(scored_docs)
+    
+    if not docs:
+        trace.set(status="aucun document", retrieved=len(scored_docs))
+        yield "Désolé, je n'ai pas trouvé d'information dans ma base de connaissances."
+        return
+
+    # Question quasi identique déjà posée, avec les mêmes morceaux retrouvés : pas d'appel au LLM.
+    # Une question de suivi dépend de la conversation : pas de cache.
+    chunk_ids = [doc.metadata.get("chunk_id", doc.page_content) for doc in docs]
+    trace.set(retrieved=len(scored_docs), chunk_ids=chunk_ids)
+    if history:
+        cache = None
+    if cache is not None:
+        with trace.span("cache_lookup"):
+            cached = cache.lookup(query_vector, chunk_ids)
+        if cached is not None:
+            trace.set(status="cache", completion_tokens=estimate_tokens(cached))
+            yield cached
+            return
+    
+    # 2. Construction du contexte
+    context = "\n\n".join([doc.page_content for doc in docs])
+    
+    # 3. Client LLM (réutilisé)
+    with trace.span("llm_client"):
+        llm = get_llm(api_key)
+
+    # 4. Construction du prompt
+    with trace.span("build_prompt"):
+        prompt = build_prompt(context, query, format_history(history))
+
+    # 5. Appel au LLM en streaming (seul le temps passé dans le LLM est compté, pas celui du lecteur du flux)
+    parts, usage = [], None
+    phase = "llm_first_token"
     try:
-        response = llm.invoke(prompt)
-        return response.content
+        stream = llm.stream(prompt)
+        while True:
+            start = time.perf_counter()
+            chunk = next(stream, None)
+            trace.add(phase, (time.perf_counter() - start) * 1000)
+            if chunk is None:
+                break
+            usage = getattr(chunk, "usage_metadata", None) or usage
+            if chunk.content:
+                phase = "llm_generation"
+                parts.append(chunk.content)
+                yield chunk.content
     except Exception as e:
-        return f"Erreur avec Groq : {str(e)}"
+        # Réponse partielle : l'erreur est ajoutée à la suite, et rien n'est mis en cache
+        trace.set(status="erreur LLM", error=type(e).__name__)
+        separator = "\n\n" if parts else ""
+        yield f"{separator}Erreur avec Groq : {str(e)}"
+        return
+    finally:
+        # Tokens comptés par le LLM s'il les renvoie, sinon estimés
+        answer = "".join(parts)
+        trace.set(prompt_tokens=usage["input_tokens"] if usage else estimate_tokens(prompt),
+                  completion_tokens=usage["output_tokens"] if usage else estimate_tokens(answer),
+                  tokens_counted_by="llm" if usage else "estimation")
+
+    if cache is not None:
+        cache.store(query_vector, chunk_ids, answer)
+
+def get_llm_response(db, query, api_key, cache=response_cache, query_vector=None, journey=None, history=None,
+                     trace=None):
+    return "".join(stream_llm_response(db, query, api_key, cache, query_vector, journey, history, trace))
+
+def prewarm():
+    """
+    Charge la base, le modèle d'embedding et le client LLM, puis fait une recherche
+    factice : le premier vrai message n'attend plus ces chargements. Retourne la base.
+    """
+    db = load_db()
+    if db is None:
+        return None
+
+    embeddings = db.embeddings
+    # "bonjour" est sûrement déjà dans le cache d'embeddings : on force le chargement du modèle
+    model = getattr(embeddings, "model", embeddings)
+    vector = model.embed_query("bonjour")
+    retrieve_documents(db, "bonjour", vector)
+    get_llm(GROQ_API_KEY)
+    return db
+
+def prewarm_in_background():
+    """Lance prewarm() dans un thread ; .result() renvoie la base une fois prête."""
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prewarm")
+    future = executor.submit(prewarm)
+    executor.shutdown(wait=False)
+    return future
+
+def get_cache_stats():
+    return response_cache.stats()
 
 # Fonction simplifiée pour Streamlit (rétro-compatibilité)
-def get_response(db, query):
+def get_response(db, query, journey=None, history=None):
+    global GROQ_API_KEY
+    return get_llm_response(db, query, GROQ_API_KEY, journey=journey, history=history)
+
+def stream_response(db, query, journey=None, history=None):
     global GROQ_API_KEY
-    return get_llm_response(db, query, GROQ_API_KEY)
+    return stream_llm_response(db, query, GROQ_API_KEY, journey=journey, history=history)
 
 def chat():
     global GROQ_API_KEY
-    db = load_db()
-    if db is None:
-        return
+    # Chargement pendant que l'utilisateur tape sa première question
+    warmup = prewarm_in_background()
 
     print("\n--- CHATBOT ORANGE (IA Llama 3.3) ---")
     print("Posez votre question (ou tapez 'quit' pour quitter)\n")
     
+    history = []
     while True:
         query = input("\nVous : ")
         if query.lower() in ['quit', 'exit', 'q']:
+            stats = get_cache_stats()
+            print(f"Cache de réponses : {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%})")
             break
         
-        print("🤖 Réflexion en cours...", end="\r")
-        response = get_llm_response(db, query, GROQ_API_KEY)
-        print(f"🤖 Bot : {response}\n")
+        db = warmup.result()
+        if db is None:
+            return
+
+        print("🤖 Bot : ", end="", flush=True)
+        # Affichage des morceaux dès leur arrivée
+        parts = []
+        for part in stream_llm_response(db, query, GROQ_API_KEY, history=history):
+            parts.append(part)
+            print(part, end="", flush=True)
+        print("\n")
+        history += [{"role": "user", "content": query}, {"role": "assistant", "content": "".join(parts)}]
 
 if __name__ == "__main__":
     chat()
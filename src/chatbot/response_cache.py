@@ -0,0 +1,110 @@
+"""
+Cache sémantique des réponses du chatbot.
+
+Une question proche d'une question déjà posée (similarité cosinus des embeddings
+au-dessus du seuil) ET qui retrouve exactement les mêmes morceaux de FAQ reçoit la
+réponse déjà générée, sans nouvel appel au LLM. Les entrées expirent (TTL), les
+plus anciennes sont évincées (LRU), et tout le cache est vidé dès que la base de
+connaissances est ré-ingérée (fichier de version écrit par ingest_knowledge.py).
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Configuration
+DB_DIR = os.path.join("data", "chroma_db")
+KB_VERSION_FILE = os.path.join(DB_DIR, "kb_version.txt")
+SIMILARITY_THRESHOLD = 0.92
+TTL_SECONDS = 3600
+MAX_ENTRIES = 1000
+
+def read_kb_version(path=KB_VERSION_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().strip()
+
+class SemanticResponseCache:
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES,
+                 version_file=KB_VERSION_FILE):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_file = version_file
+        self.kb_version = read_kb_version(version_file)
+        self.entries = OrderedDict()  # id -> (vecteur normalisé, morceaux, réponse, date)
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        version = read_kb_version(self.version_file)
+        if version != self.kb_version:
+            # Base de connaissances ré-ingérée : les réponses en cache peuvent être obsolètes
+            self.entries.clear()
+            self.kb_version = version
+            self.invalidations += 1
+
+    def _expire(self, now):
+        expired = [key for key, (_, _, _, created) in self.entries.items() if now - created > self.ttl]
+        for key in expired:
+            del self.entries[key]
+        self.evictions += len(expired)
+
+    def lookup(self, query_vector, chunk_ids):
+        """Retourne la réponse en cache pour une question similaire ayant les mêmes morceaux, sinon None."""
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1)
+        chunk_ids = frozenset(chunk_ids)
+
+        with self.lock:
+            self._check_version()
+            self._expire(time.time())
+
+            candidates = [key for key, entry in self.entries.items() if entry[1] == chunk_ids]
+            if candidates:
+                vectors = np.stack([self.entries[key][0] for key in candidates])
+                scores = vectors @ vector
+                best = int(scores.argmax())
+                if scores[best] >= self.threshold:
+                    key = candidates[best]
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return self.entries[key][2]
+
+            self.misses += 1
+            return None
+
+    def store(self, query_vector, chunk_ids, answer):
+        vector = np.asarray(query_vector, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1)
+
+        with self.lock:
+            self.entries[self.next_id] = (vector, frozenset(chunk_ids), answer, time.time())
+            self.next_id += 1
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "size": len(self.entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,41 @@
+"""
+LLM local simulé (sans réseau ni clé API) pour les tests de charge et les benchmarks.
+
+Même interface que ChatGroq pour ce qu'utilise le chatbot (invoke / stream),
+avec une latence configurable : délai avant le premier token puis délai par token.
+Activé avec la variable d'environnement LLM_BACKEND=stub.
+"""
+
+import os
+import time
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+# Configuration
+FIRST_TOKEN_MS = float(os.getenv("STUB_FIRST_TOKEN_MS", "200"))
+TOKEN_MS = float(os.getenv("STUB_TOKEN_MS", "10"))
+MAX_WORDS = 40
+
+class StubLLM:
+    def __init__(self, first_token_ms=FIRST_TOKEN_MS, token_ms=TOKEN_MS):
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+
+    def _answer(self, prompt):
+        # Réponse déterministe : reprend la première réponse "R:" du contexte
+        for line in prompt.splitlines():
+            if line.startswith("R:"):
+                return " ".join(line[2:].split()[:MAX_WORDS])
+        return "Réponse simulée."
+
+    def invoke(self, prompt):
+        answer = self._answer(prompt)
+        time.sleep((self.first_token_ms + self.token_ms * len(answer.split())) / 1000)
+        return AIMessage(content=answer)
+
+    def stream(self, prompt):
+        words = self._answer(prompt).split()
+        time.sleep(self.first_token_ms / 1000)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_ms / 1000)
+            yield AIMessageChunk(content=word if i == 0 else f" {word}")
@@ -0,0 +1,219 @@
+"""
+Traces des requêtes du chatbot : où passe le temps d'une réponse.
+
+Chaque requête est une trace composée de phases chronométrées (embedding de la
+question, recherche, cache, client LLM, prompt, premier token, génération) et
+d'attributs (tokens du prompt et de la réponse, morceaux retrouvés, cache...).
+
+- Histogrammes en mémoire par phase (seaux logarithmiques, ±12 % de précision) :
+  p50/p95/p99 à coût constant, sans garder les mesures (GET /metrics de l'API)
+- Journal JSONL (une ligne par requête), lu par la page Performance du tableau
+  de bord ; fichier renouvelé au-delà de MAX_TRACE_BYTES
+
+Désactivé avec CHATBOT_TRACING=0 (les phases restent mesurées, rien n'est enregistré).
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import bisect
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+# Configuration
+TRACING = os.getenv("CHATBOT_TRACING", "1") == "1"
+TRACE_FILE = os.path.join("data", "traces", "chatbot_traces.jsonl")
+MAX_TRACE_BYTES = 50 * 1024 * 1024  # Au-delà, le journal devient chatbot_traces.jsonl.1 (un seul ancien fichier)
+BUCKET_GROWTH = 1.25                 # Borne d'un seau = 1,25 x la précédente
+MIN_BUCKET_MS = 0.05
+MAX_BUCKET_MS = 300_000
+
+# Phases dans l'ordre d'une requête (affichage)
+PHASES = ["queue", "embed_query", "retrieve", "pack_context", "cache_lookup", "llm_client",
+          "build_prompt", "llm_first_token", "llm_generation"]
+
+def _bucket_bounds(minimum=MIN_BUCKET_MS, maximum=MAX_BUCKET_MS, growth=BUCKET_GROWTH):
+    bounds = [minimum]
+    while bounds[-1] < maximum:
+        bounds.append(bounds[-1] * growth)
+    return bounds
+
+BUCKET_BOUNDS = _bucket_bounds()
+
+class LatencyHistogram:
+    """Histogramme à seaux fixes : enregistrement en O(log seaux), mémoire constante."""
+
+    def __init__(self, bounds=BUCKET_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, ms):
+        index = bisect.bisect_left(self.bounds, ms)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += ms
+            self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        """Milieu (géométrique) du seau qui contient le q-ième centile (q entre 0 et 100)."""
+        with self.lock:
+            if not self.count:
+                return None
+            rank = q / 100 * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= rank and count:
+                    break
+            if index == len(self.bounds):
+                return self.max
+            estimate = math.sqrt(self.bounds[index - 1] * self.bounds[index]) if index else self.bounds[0]
+            return min(estimate, self.max)
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "mean_ms": self.total / self.count if self.count else None,
+            "max_ms": self.max,
+        }
+
+class Trace:
+    def __init__(self, **attributes):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.spans = {}
+        self.attributes = dict(attributes)
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - start) * 1000)
+
+    def add(self, name, ms):
+        # Une phase répétée (ex : recherche filtrée puis sans filtre) cumule ses durées
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "ts": datetime.fromtimestamp(self.started).isoformat(timespec='milliseconds'),
+            "trace_id": self.trace_id,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "spans": {name: round(ms, 3) for name, ms in self.spans.items()},
+            **self.attributes,
+        }
+
+class Tracer:
+    def __init__(self, path=TRACE_FILE, enabled=TRACING, max_bytes=MAX_TRACE_BYTES):
+        self.path = path
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.file = None
+
+    def start(self, **attributes):
+        return Trace(**attributes)
+
+    @contextmanager
+    def record(self, trace=None, **attributes):
+        """Trace d'une requête (nouvelle, ou commencée par l'appelant), enregistrée à la sortie."""
+        trace = trace or self.start()
+        trace.set(**attributes)
+        try:
+            yield trace
+        except GeneratorExit:
+            # Flux abandonné par le client avant la fin
+            trace.set(status="interrompue")
+            raise
+        except Exception as e:
+            trace.set(status="erreur", error=type(e).__name__)
+            raise
+        finally:
+            self.finish(trace)
+
+    def finish(self, trace):
+        if not self.enabled:
+            return
+        record = trace.to_dict()
+        record.setdefault("status", "ok")
+        self._histogram("total").record(record["total_ms"])
+        for name, ms in record["spans"].items():
+            self._histogram(name).record(ms)
+        try:
+            self._write(record)
+        except OSError as e:
+            print(f"Erreur d'écriture de la trace : {e}")
+
+    def _histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, LatencyHistogram())
+        return histogram
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self.file = open(self.path, 'a', encoding='utf-8')
+            self.file.write(line)
+            self.file.flush()
+            if self.file.tell() > self.max_bytes:
+                self.file.close()
+                os.replace(self.path, self.path + ".1")
+                self.file = None
+
+    def snapshot(self):
+        """Percentiles de chaque phase depuis le démarrage du processus."""
+        with self.lock:
+            histograms = dict(self.histograms)
+        return {name: histogram.snapshot() for name, histogram in histograms.items()}
+
+# Traceur partagé par toutes les requêtes du processus
+tracer = Tracer()
+
+def load_traces(path=TRACE_FILE, since=None):
+    """
+    Journal des traces en DataFrame (une colonne par phase, en ms), depuis `since`
+    (Timestamp optionnel). Retourne None s'il n'y a pas encore de trace.
+    """
+    import pandas as pd
+
+    files = [f for f in [path + ".1", path] if os.path.exists(f)]
+    records = []
+    for file in files:
+        with open(file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue  # Ligne tronquée (écriture en cours)
+    if not records:
+        return None
+
+    df = pd.DataFrame.from_records(records)
+    df['ts'] = pd.to_datetime(df['ts'])
+    spans = pd.DataFrame.from_records(df.pop('spans').tolist(), index=df.index)
+    df = df.join(spans)
+    if since is not None:
+        df = df[df['ts'] >= since]
+    return df.sort_values('ts').reset_index(drop=True)
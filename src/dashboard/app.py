@@ -2,55 +2,164 @@ import streamlit as st
 import pandas as pd
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 
 # Ajout du dossier racine au path pour les imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
 
-from src.chatbot.rag_chatbot import load_db, get_response
+# Le chatbot (LangChain, Chroma, Groq) n'est importé que par sa page : la page d'analyse s'affiche sans l'attendre
+from src.data_collection.storage import (AGGREGATES_DATASET, SENTIMENT_DATASET, dataset_columns, dataset_exists,
+                                         dataset_fingerprint, iter_dataset, read_partitions)
+from src.analysis.aggregates import read_aggregates, rebuild_aggregates, source_dataset
+from src.pipeline.watch import read_alerts
+
+# Périodes d'analyse (jours), None = tout l'historique
+TIME_WINDOWS = {"Tout": None, "7 derniers jours": 7, "30 derniers jours": 30,
+                "90 derniers jours": 90, "12 derniers mois": 365}
+
+# Périodes de la page Performance, et pas de temps des courbes correspondant
+PERF_WINDOWS = {"Dernière heure": (pd.Timedelta(hours=1), "1min"), "24 dernières heures": (pd.Timedelta(hours=24), "15min"),
+                "7 derniers jours": (pd.Timedelta(days=7), "1h"), "Tout": (None, "1D")}
+
+# Chargement du chatbot en arrière-plan dès l'ouverture du tableau de bord (0 pour désactiver)
+PREWARM_CHATBOT = os.getenv("PREWARM_CHATBOT", "1") == "1"
 
 # Configuration de la page
 st.set_page_config(page_title="Orange PFE - Assistant & Analyse", page_icon="🍊", layout="wide")
 
 # --- FONCTIONS ---
-@st.cache_data
-def load_data():
-    path = os.path.join("data", "processed", "reviews_with_sentiment.csv")
-    if os.path.exists(path):
-        return pd.read_csv(path)
-    return None
+# Les fonctions de chargement reçoivent l'empreinte des fichiers : le cache se renouvelle
+# dès que le pipeline écrit de nouvelles données (sans redémarrer le tableau de bord)
+@st.cache_data(max_entries=16)
+def load_aggregates(fingerprint, start):
+    return read_aggregates(start=start)
+
+@st.cache_data(max_entries=16)
+def load_negative_reviews(fingerprint, start, limit=10):
+    # Même source que les agrégats (indicateurs et courbes) : dernier état de chaque avis
+    path = source_dataset()
+    if not dataset_exists(path):
+        return None
+    filters = [('sentiment', '==', 'Négatif')]
+    if start is not None:
+        filters.append(('at', '>=', start))
+    weighted = 'weight' in dataset_columns(path)
+    if weighted:
+        # Poids 0 : avis qui n'est plus canonique (quasi-doublons regroupés autrement)
+        filters.append(('weight', '>', 0))
+
+    wanted = limit
+    while True:
+        # 1. Dates seules (pas le texte) : date du `wanted`-ième avis négatif le plus récent, morceau par morceau
+        latest = None
+        for chunk in iter_dataset(path, columns=['at'], filters=filters):
+            latest = chunk['at'] if latest is None else pd.concat([latest, chunk['at']], ignore_index=True)
+            latest = latest.nlargest(wanted)
+        if latest is None:
+            return pd.DataFrame(columns=['at', 'content', 'score'])
+
+        # 2. Texte des seuls avis depuis cette date, tous sentiments confondus : un état plus récent
+        # d'un avis (sentiment recalculé, poids changé) remplace l'ancien, comme dans les agrégats
+        columns = ['reviewId', 'at', 'content', 'score', 'sentiment'] + (['weight'] if weighted else [])
+        df = read_partitions(path, key='reviewId', columns=columns, filters=[('at', '>=', latest.min())])
+        df = df[df['sentiment'] == 'Négatif']
+        if weighted:
+            df = df[df['weight'] > 0]
+        # Moins de `limit` avis encore négatifs : la recherche remonte plus loin dans le temps
+        if len(df) >= limit or len(latest) < wanted:
+            return df.nlargest(limit, 'at')[['at', 'content', 'score']]
+        wanted *= 2
+
+@st.cache_data(max_entries=8)
+def load_chatbot_traces(fingerprint, since):
+    from src.chatbot.tracing import load_traces
+    return load_traces(since=since)
+
+def trace_fingerprint():
+    # Taille et date des journaux de traces : le cache se renouvelle à chaque nouvelle requête tracée
+    from src.chatbot.tracing import TRACE_FILE
+    files = [f for f in [TRACE_FILE, TRACE_FILE + ".1"] if os.path.exists(f)]
+    return tuple((os.path.getsize(f), os.path.getmtime(f)) for f in files)
+
+def window_start(days):
+    return None if days is None else pd.Timestamp.now().normalize() - pd.Timedelta(days=days)
 
 @st.cache_resource
+def start_chatbot_prewarm():
+    # Imports et chargement du modèle dans un thread, une seule fois par serveur
+    def warm():
+        from src.chatbot.rag_chatbot import prewarm
+        return prewarm()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="prewarm")
+    future = executor.submit(warm)
+    executor.shutdown(wait=False)
+    return future
+
 def get_chatbot_db():
-    return load_db()
+    # Attend la fin du pré-chargement s'il est encore en cours
+    try:
+        db = start_chatbot_prewarm().result()
+    except Exception as e:
+        print(f"Erreur de chargement du chatbot : {e}")
+        db = None
+    if db is None:
+        # Échec (ou base pas encore créée) : pas gardé en cache, le prochain message réessaie
+        start_chatbot_prewarm.clear()
+    return db
+
+if PREWARM_CHATBOT:
+    start_chatbot_prewarm()
 
 # --- INTERFACE ---
 st.title("🍊 Orange Maroc - Assistant & Analyse PFE")
 
 # Sidebar
-page = st.sidebar.selectbox("Navigation", ["📊 Analyse des Feedbacks", "🤖 Assistant Intelligent"])
+page = st.sidebar.selectbox("Navigation", ["📊 Analyse des Feedbacks", "🤖 Assistant Intelligent",
+                                           "⏱️ Performance du Chatbot"])
 
 # --- PAGE 1 : ANALYSE ---
 if page == "📊 Analyse des Feedbacks":
     st.header("Analyse des Avis Clients (Play Store)")
-    
-    df = load_data()
-    if df is None:
+
+    # Agrégats pas encore calculés (première ouverture) : construits une fois depuis les avis
+    if not dataset_exists(AGGREGATES_DATASET) and dataset_exists(SENTIMENT_DATASET):
+        with st.spinner("Calcul des agrégats..."):
+            rebuild_aggregates()
+
+    # Pics d'avis négatifs signalés par le mode veille (src/pipeline/watch.py) ces dernières 24 h
+    for alert in read_alerts(since=pd.Timestamp.now() - pd.Timedelta(hours=24))[:3]:
+        irritants = ", ".join(phrase for phrase, _ in alert["irritants"])
+        st.warning(f"⚠️ Pic d'avis négatifs ({alert['ts'].replace('T', ' ')}) : {alert['negatives']} en "
+                   f"{alert['window_minutes']} min, {alert['expected']:.1f} attendus. Irritants : {irritants}")
+
+    window = st.sidebar.selectbox("Période", list(TIME_WINDOWS))
+    start = window_start(TIME_WINDOWS[window])
+    counts = load_aggregates(dataset_fingerprint(AGGREGATES_DATASET), start)
+
+    if counts is None:
         st.error("Aucune donnée trouvée. Veuillez lancer le scraping d'abord.")
+    elif counts.empty:
+        st.info("Aucun avis sur cette période.")
     else:
+        by_sentiment = counts.groupby('sentiment', observed=True)['count'].sum()
+
         # KPIs
         col1, col2, col3 = st.columns(3)
-        col1.metric("Total Avis", len(df))
-        col2.metric("Avis Positifs", len(df[df['sentiment'] == 'Positif']))
-        col3.metric("Avis Négatifs", len(df[df['sentiment'] == 'Négatif']))
+        col1.metric("Total Avis", int(counts['count'].sum()))
+        col2.metric("Avis Positifs", int(by_sentiment.get('Positif', 0)))
+        col3.metric("Avis Négatifs", int(by_sentiment.get('Négatif', 0)))
         
         # Graphiques
         st.subheader("Répartition des Sentiments")
-        sentiment_counts = df['sentiment'].value_counts()
-        st.bar_chart(sentiment_counts)
+        st.bar_chart(by_sentiment)
+
+        st.subheader("Évolution quotidienne")
+        daily = counts.pivot_table(index='day', columns='sentiment', values='count', aggfunc='sum', observed=True)
+        st.line_chart(daily.fillna(0))
         
         # Derniers avis négatifs
         st.subheader("⚠️ Derniers avis négatifs (à traiter)")
-        neg_reviews = df[df['sentiment'] == 'Négatif'][['at', 'content', 'score']].head(10)
+        neg_reviews = load_negative_reviews(dataset_fingerprint(source_dataset()), start)
         st.dataframe(neg_reviews, use_container_width=True)
 
 # --- PAGE 2 : CHATBOT ---
@@ -58,6 +167,16 @@ elif page == "🤖 Assistant Intelligent":
     st.header("Chatbot Assistant Client")
     st.markdown("Posez une question sur les offres, les factures ou l'assistance technique.")
 
+    from src.chatbot.rag_chatbot import stream_response, get_cache_stats
+    from src.chatbot.journeys import JOURNEYS, DEFAULT_JOURNEY
+
+    # Parcours où se trouve le client : la recherche se limite à ses questions
+    journey = st.sidebar.selectbox("Parcours client", JOURNEYS, index=JOURNEYS.index(DEFAULT_JOURNEY))
+
+    cache_stats = get_cache_stats()
+    st.sidebar.caption(f"Cache de réponses : {cache_stats['hit_rate']:.0%} de hits "
+                       f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']}), {cache_stats['size']} entrées")
+
     # Initialisation de l'historique
     if "messages" not in st.session_state:
         st.session_state.messages = [{"role": "assistant", "content": "Bonjour ! Je suis l'assistant virtuel d'Orange. Comment puis-je vous aider ?"}]
@@ -74,14 +193,81 @@ elif page == "🤖 Assistant Intelligent":
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        # Réponse du bot
+        # Réponse du bot (avec la conversation, sans le message d'accueil ni la question en cours)
+        history = st.session_state.messages[1:-1]
         db = get_chatbot_db()
         with st.chat_message("assistant"):
-            with st.spinner("Je cherche dans la base de connaissances..."):
-                if db:
-                    response = get_response(db, prompt)
-                else:
-                    response = "Erreur : Base de données non chargée."
-                
+            if db:
+                # La réponse s'affiche au fil de la génération (st.write_stream renvoie le texte complet)
+                response = st.write_stream(stream_response(db, prompt, journey=journey, history=history))
+            else:
+                response = "Erreur : Base de données non chargée."
                 st.markdown(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+            st.session_state.messages.append({"role": "assistant", "content": response})
+
+# --- PAGE 3 : PERFORMANCE DU CHATBOT ---
+elif page == "⏱️ Performance du Chatbot":
+    st.header("Performance du Chatbot")
+    st.markdown("Durée de chaque phase des réponses (traces de l'API, du tableau de bord et de la CLI).")
+
+    from src.chatbot.tracing import PHASES, tracer
+
+    window = st.sidebar.selectbox("Période", list(PERF_WINDOWS))
+    duration, freq = PERF_WINDOWS[window]
+    since = None if duration is None else pd.Timestamp.now().floor('min') - duration
+    traces = load_chatbot_traces(trace_fingerprint(), since)
+
+    if traces is None:
+        st.info("Aucune trace pour l'instant : posez des questions au chatbot (page Assistant, API ou CLI).")
+    elif traces.empty:
+        st.info("Aucune requête sur cette période.")
+    else:
+        total = traces['total_ms']
+        col1, col2, col3, col4, col5 = st.columns(5)
+        col1.metric("Requêtes", len(traces))
+        col2.metric("p50", f"{total.quantile(0.5):.0f} ms")
+        col3.metric("p95", f"{total.quantile(0.95):.0f} ms")
+        col4.metric("p99", f"{total.quantile(0.99):.0f} ms")
+        col5.metric("Réponses du cache", f"{(traces['status'] == 'cache').mean():.0%}")
+
+        st.subheader("Latence totale dans le temps")
+        over_time = traces.set_index('ts')['total_ms'].resample(freq).quantile([0.5, 0.95, 0.99]).unstack()
+        st.line_chart(over_time.rename(columns={0.5: "p50", 0.95: "p95", 0.99: "p99"}).dropna(how='all'))
+
+        # Une phase absente d'une requête (ex : pas d'appel au LLM si réponse du cache) n'entre pas dans ses percentiles
+        phases = [phase for phase in PHASES if phase in traces.columns]
+        st.subheader("Détail par phase")
+        breakdown = pd.DataFrame({
+            "requêtes": traces[phases].count(),
+            "p50 (ms)": traces[phases].quantile(0.5),
+            "p95 (ms)": traces[phases].quantile(0.95),
+            "p99 (ms)": traces[phases].quantile(0.99),
+            "part du temps": traces[phases].sum() / total.sum(),
+        })
+        st.dataframe(breakdown.style.format({"p50 (ms)": "{:.1f}", "p95 (ms)": "{:.1f}", "p99 (ms)": "{:.1f}",
+                                             "part du temps": "{:.0%}"}), use_container_width=True)
+
+        st.subheader("Temps moyen par phase dans le temps")
+        st.area_chart(traces.set_index('ts')[phases].fillna(0).resample(freq).mean().dropna(how='all'))
+
+        tokens = [col for col in ['prompt_tokens', 'completion_tokens'] if col in traces.columns]
+        if tokens:
+            st.subheader("Tokens par requête")
+            st.dataframe(traces[tokens].describe(percentiles=[0.5, 0.95]).T, use_container_width=True)
+
+        st.subheader("Requêtes les plus lentes")
+        slowest = traces.nlargest(10, 'total_ms')
+        details = [col for col in ['ts', 'total_ms', 'status', 'retriever', 'journey', 'prompt_tokens',
+                                   'completion_tokens', 'chunk_ids'] if col in slowest.columns]
+        st.dataframe(slowest[details].assign(phase_principale=slowest[phases].idxmax(axis=1)), use_container_width=True)
+
+        st.subheader("Statut des requêtes")
+        st.bar_chart(traces['status'].value_counts())
+
+    # Histogrammes en mémoire : requêtes servies par ce processus (page Assistant) depuis son démarrage
+    with st.expander("Histogrammes du processus du tableau de bord"):
+        snapshot = tracer.snapshot()
+        if snapshot:
+            st.dataframe(pd.DataFrame(snapshot).T, use_container_width=True)
+        else:
+            st.caption("Aucune requête servie par ce processus.")
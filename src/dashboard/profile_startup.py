@@ -0,0 +1,124 @@
+"""
+Profil du démarrage du tableau de bord et du chatbot.
+
+- Temps d'import de chaque point d'entrée (python -X importtime), détaillé par
+  paquet racine et par module le plus lent
+- Avec --first-answer : temps jusqu'à la première réponse du chatbot, avec et
+  sans pré-chargement (LLM_BACKEND=stub pour rester hors ligne)
+
+Usage :
+    python src/dashboard/profile_startup.py
+    LLM_BACKEND=stub python src/dashboard/profile_startup.py --first-answer
+"""
+
+import os
+import sys
+import ast
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+APP_FILE = os.path.join(ROOT, "src", "dashboard", "app.py")
+PREWARM_CHATBOT = os.getenv("PREWARM_CHATBOT", "1") == "1"
+
+# Pré-chargement du chatbot lancé par app.py à son chargement : ses imports tournent pendant ceux de la page
+PREWARM_IMPORTS = """
+import threading
+threading.Thread(target=__import__, args=("src.chatbot.rag_chatbot",)).start()
+"""
+
+def app_imports(path=APP_FILE):
+    """Imports de premier niveau de app.py : faits à chaque ouverture, quelle que soit la page."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+# Imports réellement faits par chaque point d'entrée au démarrage
+TARGETS = {
+    "dashboard : page d'analyse": app_imports() + (PREWARM_IMPORTS if PREWARM_CHATBOT else ""),
+    "dashboard : page chatbot": "import src.chatbot.rag_chatbot, src.chatbot.journeys",
+    "chatbot : chargement de la base": "from src.chatbot.rag_chatbot import load_db; load_db()",
+}
+TOP_N = 12
+
+FIRST_ANSWER_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+from src.chatbot.rag_chatbot import load_db, prewarm, get_response
+imported = time.perf_counter()
+db = prewarm() if {prewarm} else load_db()
+ready = time.perf_counter()
+get_response(db, "Comment recharger mon solde ?")
+done = time.perf_counter()
+print(json.dumps({{"import": imported - t0, "load": ready - imported, "first_answer": done - ready}}))
+"""
+
+def _run(code, *flags):
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=os.getcwd(), env=env,
+                          capture_output=True, text=True)
+
+def import_profile(code):
+    """Retourne [(self_us, cumulative_us, profondeur, module)] pour le code donné."""
+    result = _run(code, "-X", "importtime")
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((int(self_us), int(cumulative_us), depth, name.strip()))
+    return entries
+
+def print_report(label, entries, top_n=TOP_N):
+    # Les imports de premier niveau contiennent (cumulé) tout le reste
+    total = sum(cumulative for _, cumulative, depth, _ in entries if depth == 0)
+    print(f"\n=== {label} : {total / 1e6:.2f} s d'imports ===")
+
+    by_package = defaultdict(int)
+    for self_us, _, _, name in entries:
+        by_package[name.split('.')[0]] += self_us
+    print("Par paquet (temps propre) :")
+    for package, us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top_n]:
+        print(f"  {us / 1e3:8.1f} ms  {package}")
+
+    print("Modules les plus lents (cumulé) :")
+    for _, cumulative, depth, name in sorted(entries, key=lambda e: e[1], reverse=True)[:top_n]:
+        print(f"  {cumulative / 1e3:8.1f} ms  {'  ' * depth}{name}")
+
+def first_answer_profile(use_prewarm):
+    result = _run(FIRST_ANSWER_SCRIPT.format(prewarm=use_prewarm))
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main(first_answer=False):
+    for label, code in TARGETS.items():
+        try:
+            print_report(label, import_profile(code))
+        except Exception as e:
+            print(f"\n=== {label} : échec ({e}) ===")
+
+    if first_answer:
+        print("\n=== Première réponse du chatbot ===")
+        for use_prewarm in (False, True):
+            try:
+                timings = first_answer_profile(use_prewarm)
+            except Exception as e:
+                print(f"  échec : {e}")
+                continue
+            mode = "avec pré-chargement" if use_prewarm else "sans pré-chargement"
+            print(f"  {mode} : import {timings['import']:.2f} s, chargement {timings['load']:.2f} s, "
+                  f"première réponse {timings['first_answer']:.2f} s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profil du démarrage (imports, première réponse)")
+    parser.add_argument("--first-answer", action="store_true", help="Mesure aussi le temps jusqu'à la première réponse")
+    args = parser.parse_args()
+    main(first_answer=args.first_answer)
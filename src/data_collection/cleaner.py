@@ -1,11 +1,43 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import os
+import sys
 import re
+from collections import deque
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import RAW_PARTITIONS_DIR, CLEANED_DATASET, iter_dataset, write_chunks, dataset_exists
 
 # Configuration
-INPUT_FILE = os.path.join("data", "raw", "reviews.csv")
+INPUT_FILE = RAW_PARTITIONS_DIR  # Parquet partitions (or legacy data/raw/reviews.csv)
 OUTPUT_DIR = os.path.join("data", "processed")
-OUTPUT_FILE = os.path.join(OUTPUT_DIR, "reviews_cleaned.csv")
+OUTPUT_FILE = CLEANED_DATASET
+CHUNK_SIZE = 50_000  # Rows per chunk: memory stays bounded whatever the export size
+
+# Patterns compiled once, used by clean_text (row by row)
+URL_PATTERN = re.compile(r'http\S+')
+# This regex keeps alphanumeric, spaces, and common punctuation (with French accents).
+SPECIAL_CHARS_PATTERN = re.compile(r'[^\w\s\.,!?\'àâéèêëîïôùûüçÀÂÉÈÊËÎÏÔÙÛÜÇ]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Same patterns for the Arrow kernels of clean_series (RE2): there \w and \s are
+# ASCII-only, so Python's Unicode classes are spelled out
+ARROW_SPACE = r'\s\x0b\x1c-\x1f\x85\p{Z}'
+ARROW_URL_PATTERN = rf'http[^{ARROW_SPACE}]+'
+# Whitespace other than ' ' is replaced along with the special characters (it ends up
+# as a single space either way), so the last pass only collapses runs of spaces:
+# matching every single space between words made it the slowest step
+ARROW_SPECIAL_CHARS_PATTERN = r"[^\p{L}\p{N}_ \.,!?'àâéèêëîïôùûüçÀÂÉÈÊËÎÏÔÙÛÜÇ]"
+ARROW_WHITESPACE_PATTERN = r' {2,}'
+# Python's str.lower() is context-dependent for these (final sigma, dotted I):
+# rows containing them go through clean_text
+PYTHON_LOWER_PATTERN = 'İ|Σ'
+
+# Columns identifying an exact duplicate (same review fetched twice)
+DEDUP_COLUMNS = ['reviewId', 'content']
 
 def ensure_directory_exists(path):
     if not os.path.exists(path):
@@ -22,34 +54,95 @@ def clean_text(text):
     # text = text.encode('ascii', 'ignore').decode('ascii') # simplistic way, removes accents too. Better to keep accents for French.
     
     # 3. Remove URLs
-    text = re.sub(r'http\S+', '', text)
+    text = URL_PATTERN.sub('', text)
     
     # 4. Remove special characters but keep French accents
-    # This regex keeps alphanumeric, spaces, and common punctuation.
     # Adjust based on needs.
-    text = re.sub(r'[^\w\s\.,!?\'àâéèêëîïôùûüçÀÂÉÈÊËÎÏÔÙÛÜÇ]', ' ', text)
+    text = SPECIAL_CHARS_PATTERN.sub(' ', text)
     
     # 5. Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = WHITESPACE_PATTERN.sub(' ', text).strip()
     
     return text
 
-def process_reviews(input_path, output_path):
-    if not os.path.exists(input_path):
-        print(f"Input file not found: {input_path}")
-        return
+def _to_arrow_strings(series):
+    try:
+        values = pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Mixed object column: non-strings are cleaned to "" like in clean_text
+        values = pa.array(series.where(series.map(lambda v: isinstance(v, str)), None), type=pa.string(), from_pandas=True)
+    if isinstance(values, pa.ChunkedArray):
+        # Arrow-backed column read from partitions: one chunk per file, and each kernel
+        # compiles its regex once per chunk. A single chunk compiles each pattern once.
+        values = values.combine_chunks()
+    return pc.fill_null(values, "")
 
-    print("Loading raw data...")
-    df = pd.read_csv(input_path)
-    
-    print("Cleaning content...")
-    df['cleaned_content'] = df['content'].apply(clean_text)
-    
-    # Filter out empty reviews after cleaning
-    df = df[df['cleaned_content'].str.len() > 2]
-    
-    print(f"Saving processed data to {output_path}...")
-    df.to_csv(output_path, index=False, encoding='utf-8')
+def clean_series(series):
+    """
+    Vectorized clean_text over a whole column: each step is one Arrow kernel over
+    all rows (no Python call per row). Same output as clean_text, row for row, for
+    every character of Python's Unicode database; letters added in later Unicode
+    versions are kept here where clean_text would drop them.
+    """
+    values = _to_arrow_strings(series)
+    cleaned = pc.utf8_lower(values)
+    cleaned = pc.replace_substring_regex(cleaned, ARROW_URL_PATTERN, '')
+    cleaned = pc.replace_substring_regex(cleaned, ARROW_SPECIAL_CHARS_PATTERN, ' ')
+    cleaned = pc.replace_substring_regex(cleaned, ARROW_WHITESPACE_PATTERN, ' ')
+    cleaned = pc.utf8_trim(cleaned, ' ')
+    result = pd.Series(cleaned.to_numpy(zero_copy_only=False), index=series.index, dtype=object)
+
+    special = pc.match_substring_regex(values, PYTHON_LOWER_PATTERN).to_numpy(zero_copy_only=False)
+    if special.any():
+        result[special] = series[special].map(clean_text)
+    return result
+
+class RecentHashes(set):
+    """Set of the last `max_size` distinct hashes added (oldest evicted first)."""
+
+    def __init__(self, max_size):
+        super().__init__()
+        self.max_size = max_size
+        self.order = deque()
+
+    def update(self, values):
+        values = [value for value in values if value not in self]
+        super().update(values)
+        self.order.extend(values)
+        while len(self.order) > self.max_size:
+            self.discard(self.order.popleft())
+
+def drop_seen_duplicates(chunk, seen_hashes):
+    """Drop rows whose content hash was already seen (in this chunk or a previous one)."""
+    columns = [col for col in DEDUP_COLUMNS if col in chunk.columns]
+    hashes = pd.util.hash_pandas_object(chunk[columns], index=False)
+    keep = ~(hashes.duplicated() | hashes.isin(seen_hashes))
+    seen_hashes.update(hashes[keep].tolist())
+    return chunk[keep.to_numpy()]
+
+def clean_chunks(chunks, max_seen=None):
+    """
+    Generator pipeline: raw chunks in, deduplicated cleaned chunks out.
+    `max_seen` bounds the duplicate memory to the last N distinct reviews
+    (long-running streams); None keeps every hash (one pass over a dataset).
+    """
+    seen_hashes = set() if max_seen is None else RecentHashes(max_seen)
+    for chunk in chunks:
+        chunk = drop_seen_duplicates(chunk, seen_hashes)
+        chunk = chunk.assign(cleaned_content=clean_series(chunk['content']))
+        # Filter out empty reviews after cleaning
+        yield chunk[chunk['cleaned_content'].str.len() > 2]
+
+def process_reviews(input_path, output_path, chunk_size=CHUNK_SIZE):
+    if not dataset_exists(input_path):
+        # Raised (not just printed): the pipeline must not record the stage as done
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    print(f"Cleaning content (chunks of {chunk_size} rows)...")
+    chunks = clean_chunks(iter_dataset(input_path, batch_size=chunk_size))
+    count = write_chunks(chunks, output_path)
+
+    print(f"{count} reviews saved to {output_path}.")
     print("Done.")
 
 if __name__ == "__main__":
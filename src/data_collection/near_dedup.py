@@ -0,0 +1,157 @@
+"""
+Near-duplicate review collapsing (MinHash + LSH), run after cleaner.py.
+
+Play Store exports contain many near-identical reviews ("nul", "ne marche pas",
+copy-pasted rants). Each cleaned review gets a MinHash signature over its word
+shingles; LSH banding only compares reviews that share a band (no all-pairs
+comparison), and a candidate joins a cluster when the estimated Jaccard
+similarity with the cluster's first review reaches SIMILARITY_THRESHOLD.
+
+One canonical review per cluster and day (the oldest of that day) is written,
+with a `weight` column = number of reviews of the cluster posted that day:
+sentiment, topics and the feedback loop only process unique content, and
+weighted counts stay exact, per day too (a complaint repeated today is counted
+today, not on the date of its first occurrence years ago).
+"""
+
+import pandas as pd
+import numpy as np
+import os
+import sys
+import zlib
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import CLEANED_DATASET, DEDUPED_DATASET, iter_dataset, write_chunks, dataset_exists
+
+# Configuration
+INPUT_FILE = CLEANED_DATASET
+OUTPUT_FILE = DEDUPED_DATASET
+CHUNK_SIZE = 50_000
+NUM_PERM = 64               # MinHash functions per signature
+BANDS = 8                   # 8 bands x 8 rows: pairs above ~0.77 Jaccard almost always share a band
+SIMILARITY_THRESHOLD = 0.8  # Estimated Jaccard similarity to join a cluster
+SHINGLE_SIZE = 2            # Word n-grams (shorter reviews use their whole text)
+SIGNATURE_BATCH = 5_000     # Reviews hashed at once (bounds the shingles x NUM_PERM matrix)
+SEED = 1
+
+def shingles(text):
+    words = text.split()
+    if len(words) <= SHINGLE_SIZE:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+
+class MinHasher:
+    """MinHash signatures with multiply-shift hash functions, vectorized with NumPy."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=SEED):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, texts):
+        """uint32 signature matrix, one row per text."""
+        signatures = np.empty((len(texts), len(self.a)), dtype=np.uint32)
+        for start in range(0, len(texts), SIGNATURE_BATCH):
+            batch = texts[start:start + SIGNATURE_BATCH]
+            doc_shingles = [shingles(text) for text in batch]
+            lengths = np.array([len(s) for s in doc_shingles])
+            # crc32: fast and stable across runs (unlike hash(), salted per process)
+            hashes = np.fromiter((zlib.crc32(s.encode('utf-8')) for doc in doc_shingles for s in doc),
+                                 dtype=np.uint64, count=int(lengths.sum()))
+            # (a*x + b) mod 2^64, top 32 bits: uint64 arithmetic wraps around
+            values = ((hashes[:, None] * self.a + self.b) >> np.uint64(32)).astype(np.uint32)
+            offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+            signatures[start:start + len(batch)] = np.minimum.reduceat(values, offsets, axis=0)
+        return signatures
+
+class NearDuplicateIndex:
+    """
+    Streaming LSH clustering: a review joins the first cluster that shares one of
+    its bands and whose first review is similar enough, otherwise it starts a new one.
+    Only the first review of each cluster is indexed and kept in memory.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, bands=BANDS, threshold=SIMILARITY_THRESHOLD, seed=SEED):
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.buckets = [{} for _ in range(bands)]
+        self.representatives = []
+        # Random multipliers combining the rows of a band into one 64-bit key
+        self.mix = np.random.default_rng(seed + 1).integers(1, 2**63, size=self.rows, dtype=np.uint64)
+
+    def band_keys(self, signatures):
+        bands = signatures.reshape(len(signatures), -1, self.rows).astype(np.uint64)
+        return (bands * self.mix).sum(axis=2)
+
+    def add(self, signatures):
+        """Returns the cluster id of each signature."""
+        keys = self.band_keys(signatures)
+        clusters = np.empty(len(signatures), dtype=np.int64)
+        for i, signature in enumerate(signatures):
+            cluster, tried = -1, set()
+            for band, key in enumerate(keys[i]):
+                candidate = self.buckets[band].get(key)
+                if candidate is None or candidate in tried:
+                    continue
+                tried.add(candidate)
+                if np.mean(self.representatives[candidate] == signature) >= self.threshold:
+                    cluster = candidate
+                    break
+
+            if cluster == -1:
+                cluster = len(self.representatives)
+                self.representatives.append(signature)
+                for band, key in enumerate(keys[i]):
+                    self.buckets[band].setdefault(key, cluster)
+            clusters[i] = cluster
+        return clusters
+
+def assign_clusters(input_path, chunk_size=CHUNK_SIZE):
+    """
+    Pass 1 (text and date only): cluster of every row, in read order.
+    Returns (keep mask = canonical rows, weight of each row's cluster on its day).
+    """
+    hasher, index = MinHasher(), NearDuplicateIndex()
+    clusters, dates = [], []
+    for chunk in iter_dataset(input_path, columns=['at', 'cleaned_content'], batch_size=chunk_size):
+        texts = chunk['cleaned_content'].astype(object).where(chunk['cleaned_content'].notna(), "").tolist()
+        clusters.append(index.add(hasher.signatures(texts)))
+        dates.append(chunk['at'].reset_index(drop=True))
+
+    if not clusters:
+        return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.int32)
+
+    rows = pd.DataFrame({'cluster': np.concatenate(clusters), 'at': pd.concat(dates, ignore_index=True)})
+    # Daily counts need the day of every member: one group per cluster and day
+    rows['day'] = rows['at'].dt.normalize()
+    groups = ['cluster', 'day']
+    # Canonical review: the oldest of its group (stable whatever the read order)
+    canonical = rows.sort_values('at', kind='stable', na_position='last').drop_duplicates(groups).index
+    keep = np.zeros(len(rows), dtype=bool)
+    keep[canonical] = True
+    weights = rows.groupby(groups, dropna=False)['cluster'].transform('size').to_numpy(dtype=np.int32)
+    return keep, weights
+
+def collapse_chunks(chunks, keep, weights):
+    """Pass 2: canonical rows only, with the size of their group (cluster, day) as `weight`."""
+    offset = 0
+    for chunk in chunks:
+        mask = keep[offset:offset + len(chunk)]
+        chunk_weights = weights[offset:offset + len(chunk)]
+        offset += len(chunk)
+        yield chunk[mask].assign(weight=chunk_weights[mask])
+
+def deduplicate_reviews(input_path=INPUT_FILE, output_path=OUTPUT_FILE, chunk_size=CHUNK_SIZE):
+    if not dataset_exists(input_path):
+        raise FileNotFoundError(f"Input file not found: {input_path}")
+
+    print("Computing MinHash signatures and LSH clusters...")
+    keep, weights = assign_clusters(input_path, chunk_size)
+    count = write_chunks(collapse_chunks(iter_dataset(input_path, batch_size=chunk_size), keep, weights), output_path)
+
+    print(f"{len(keep)} reviews -> {count} unique per day ({len(keep) - count} near-duplicates collapsed), saved to {output_path}.")
+
+if __name__ == "__main__":
+    deduplicate_reviews()
@@ -1,24 +1,37 @@
 import pandas as pd
-from google_play_scraper import Sort, reviews_all, app
+from google_play_scraper import Sort, reviews_all, reviews
 import os
+import sys
+import json
+import argparse
+import random
+import time
 from datetime import datetime
 
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import RAW_PARTITIONS_DIR, append_partitions, write_dataset, ensure_directory_exists
+
 # Configuration
 APP_ID = 'com.orange.orangemoney'  # ID for 'Max it - Maroc' (formerly Orange et moi)
 LANG = 'fr'
 COUNTRY = 'ma'
 OUTPUT_DIR = os.path.join("data", "raw")
-OUTPUT_FILE = os.path.join(OUTPUT_DIR, "reviews.csv")
 
-def ensure_directory_exists(path):
-    if not os.path.exists(path):
-        os.makedirs(path)
+# Incremental mode: checkpoints (high-water mark + continuation token) per app/locale
+STATE_DIR = os.path.join(OUTPUT_DIR, "_state")
+PAGE_SIZE = 200
+RETRIES = 3
+BACKOFF_SECONDS = 1.0
+
+COLUMNS_TO_KEEP = ['reviewId', 'userName', 'content', 'score', 'thumbsUpCount', 'reviewCreatedVersion', 'at', 'replyContent', 'repliedAt']
 
 def scrape_reviews(app_id, lang, country):
     print(f"Fetching reviews for {app_id} ({lang}-{country})...")
     
     # Fetch all reviews (careful with large apps, might want to limit count)
-    # Using reviews_all for simplicity, but for very large apps use 'reviews' with pagination
+    # Full history download: use scrape_reviews_incremental for regular refreshes
     try:
         result = reviews_all(
             app_id,
@@ -33,23 +46,203 @@ def scrape_reviews(app_id, lang, country):
         print(f"Error fetching reviews: {e}")
         return []
 
-def save_to_csv(data, filepath):
-    if not data:
-        print("No data to save.")
-        return
-
+def to_dataframe(data):
     df = pd.DataFrame(data)
     
     # Keep relevant columns
-    columns_to_keep = ['reviewId', 'userName', 'content', 'score', 'thumbsUpCount', 'reviewCreatedVersion', 'at', 'replyContent', 'repliedAt']
     # Filter columns that exist in the dataframe
-    columns_to_keep = [col for col in columns_to_keep if col in df.columns]
-    df = df[columns_to_keep]
+    columns_to_keep = [col for col in COLUMNS_TO_KEEP if col in df.columns]
+    return df[columns_to_keep]
+
+def save_reviews(data, path=RAW_PARTITIONS_DIR):
+    if not data:
+        print("No data to save.")
+        return
+
+    # Replaces the whole raw dataset (typed Parquet, partitioned by day)
+    write_dataset(to_dataframe(data), path, mode='overwrite', partition='date')
+    print(f"Reviews saved to {path}")
+
+# --- INCREMENTAL MODE ---
+
+def get_state_path(app_id, lang, country, state_dir=STATE_DIR):
+    return os.path.join(state_dir, f"{app_id}_{lang}_{country}.json")
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(path, state):
+    # Write to a temp file then rename, so a crash never leaves a half-written checkpoint
+    ensure_directory_exists(os.path.dirname(path))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def token_value(token):
+    """Opaque pagination string of a continuation token (None at the end of the history)."""
+    return getattr(token, "token", None)
 
-    df.to_csv(filepath, index=False, encoding='utf-8')
-    print(f"Reviews saved to {filepath}")
+def make_token(value, lang, country, page_size):
+    """
+    Continuation token resuming from a saved pagination string. The token class is
+    private to google_play_scraper: returns None if its constructor changed, and the
+    caller falls back to a fresh top-down crawl.
+    """
+    try:
+        from google_play_scraper.features.reviews import _ContinuationToken
+        return _ContinuationToken(value, lang, country, Sort.NEWEST.value, page_size, None, None)
+    except (ImportError, TypeError) as e:
+        print(f"Warning: cannot rebuild the continuation token ({e}), restarting from the newest reviews.")
+        return None
+
+def fetch_page(app_id, lang, country, page_size, token, rate_limiter=None, retries=RETRIES, backoff=BACKOFF_SECONDS):
+    """
+    Fetch one page of reviews, retrying with exponential backoff.
+
+    reviews() swallows errors and returns an empty page without token, both for a
+    network failure and at the real end of the history (or for an expired token),
+    so an empty page is retried before being reported.
+    Returns (reviews, next token, ok): ok is False when every attempt came back empty.
+    """
+    result, next_token = [], None
+    ok = False
+    for attempt in range(retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            result, next_token = reviews(
+                app_id,
+                lang=lang,
+                country=country,
+                sort=Sort.NEWEST,
+                count=page_size,
+                continuation_token=token,
+            )
+        except Exception as e:
+            print(f"Error fetching page for {app_id} ({lang}-{country}): {e}")
+            result, next_token = [], None
+
+        if result or token_value(next_token) is not None:
+            ok = True
+            break
+        if attempt < retries:
+            time.sleep(backoff * (2 ** attempt) + random.uniform(0, backoff))
+
+    return result, next_token, ok
+
+def scrape_reviews_incremental(app_id, lang, country, state_dir=STATE_DIR, output_dir=RAW_PARTITIONS_DIR,
+                               page_size=PAGE_SIZE, max_pages=None, rate_limiter=None, tags=None):
+    """
+    Fetch only the reviews newer than the last run (high-water mark), page by page.
+
+    Each page is appended to the date-partitioned raw storage and the continuation
+    token is checkpointed, so an interrupted run resumes where it stopped.
+    `rate_limiter` (any object with acquire()) is shared between concurrent targets,
+    `tags` are extra columns written with every row (e.g. the app/locale target).
+    Returns the number of new reviews written.
+    """
+    state_path = get_state_path(app_id, lang, country, state_dir)
+    state = load_state(state_path)
+
+    stop_id = state.get("last_review_id")
+    stop_at = datetime.fromisoformat(state["last_at"]) if state.get("last_at") else None
+
+    # "pending" describes a run that has not reached the high-water mark yet
+    fresh = {"newest_id": None, "newest_at": None, "token": None}
+    pending = state.get("pending")
+    token = None
+    if pending:
+        saved = pending.get("token")
+        # Older checkpoints stored every slot of the token
+        saved = saved.get("token") if isinstance(saved, dict) else saved
+        token = make_token(saved, lang, country, page_size) if saved else None
+    if token is not None:
+        print(f"Resuming interrupted run for {app_id} ({lang}-{country})...")
+    else:
+        print(f"Fetching new reviews for {app_id} ({lang}-{country})...")
+        pending = dict(fresh)
+
+    total = 0
+    pages = 0
+    resumed = token is not None
+    fetched = False  # A page of this run returned reviews
+    while True:
+        result, next_token, ok = fetch_page(app_id, lang, country, page_size, token, rate_limiter)
+        pages += 1
+
+        if not ok and resumed and not fetched:
+            # A resumed token that yields nothing has expired (or pointed past the end):
+            # drop it and crawl again from the newest reviews down to the mark
+            print("Warning: saved continuation token returned nothing, restarting from the newest reviews.")
+            pending, token, resumed = dict(fresh), None, False
+            state.pop("pending", None)
+            save_state(state_path, state)
+            continue
+        fetched = fetched or bool(result)
+
+        new_rows = []
+        reached_mark = False
+        for review in result:
+            # Same id, or strictly older than the mark: everything below was already collected
+            if review['reviewId'] == stop_id or (stop_at is not None and review['at'] < stop_at):
+                reached_mark = True
+                break
+            new_rows.append(review)
+
+        if new_rows:
+            if pending["newest_id"] is None:
+                pending["newest_id"] = new_rows[0]['reviewId']
+                pending["newest_at"] = new_rows[0]['at'].isoformat()
+            df = to_dataframe(new_rows)
+            for column, value in (tags or {}).items():
+                df[column] = value
+            total += append_partitions(df, output_dir)
+
+        # End of the history: a page of reviews without a next token, or an empty page
+        # (after retries) once this run already got reviews, the end and a network
+        # failure look the same. A first page that fails is not the end.
+        end_of_history = fetched and token_value(next_token) is None
+        if reached_mark or end_of_history:
+            # Run complete: the newest review of this run becomes the new high-water mark
+            new_state = {
+                "last_review_id": pending["newest_id"] or stop_id,
+                "last_at": pending["newest_at"] or state.get("last_at"),
+                "updated_at": datetime.now().isoformat(),
+            }
+            save_state(state_path, new_state)
+            break
+
+        if token_value(next_token) is None:
+            # No review at all this run: Play Store unreachable, keep the last good
+            # checkpoint so the next run retries from there
+            print("Warning: could not fetch any review, run will resume next time.")
+            break
+
+        token = next_token
+        pending["token"] = token_value(token)
+        state["pending"] = pending
+        save_state(state_path, state)
+
+        if max_pages is not None and pages >= max_pages:
+            print(f"Stopping after {pages} pages (checkpoint saved).")
+            break
+
+    print(f"Successfully fetched {total} new reviews in {pages} page(s).")
+    return total
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play Store reviews scraper")
+    parser.add_argument("--full", action="store_true", help="Download the whole history and overwrite the raw dataset")
+    parser.add_argument("--max-pages", type=int, default=None, help="Stop (and checkpoint) after N pages")
+    args = parser.parse_args()
+
     ensure_directory_exists(OUTPUT_DIR)
-    reviews_data = scrape_reviews(APP_ID, LANG, COUNTRY)
-    save_to_csv(reviews_data, OUTPUT_FILE)
+    if args.full:
+        reviews_data = scrape_reviews(APP_ID, LANG, COUNTRY)
+        save_reviews(reviews_data)
+    else:
+        scrape_reviews_incremental(APP_ID, LANG, COUNTRY, max_pages=args.max_pages)
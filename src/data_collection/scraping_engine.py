@@ -0,0 +1,101 @@
+"""
+Moteur de scraping multi-applications / multi-langues.
+
+Lance en parallèle (thread pool) le scraping incrémental de plusieurs cibles
+(app_id, lang, country). Toutes les cibles partagent un même limiteur de débit
+(token bucket) et écrivent dans le même stockage brut partitionné, chaque ligne
+étant étiquetée avec sa cible.
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.playstore_scraper import APP_ID, COUNTRY, scrape_reviews_incremental
+
+# Configuration
+APP_IDS = [
+    APP_ID,  # Max it - Maroc (ex Orange et moi)
+    # Ajouter ici les autres applications Orange à suivre
+]
+LOCALES = [('fr', COUNTRY), ('ar', COUNTRY), ('en', COUNTRY)]
+TARGETS = [(app_id, lang, country) for app_id in APP_IDS for lang, country in LOCALES]
+
+REQUESTS_PER_SECOND = 4  # Débit global partagé par toutes les cibles
+BURST = 8
+
+class TokenBucket:
+    """Limiteur de débit thread-safe : `rate` jetons par seconde, au plus `capacity` en réserve."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def scrape_target(target, rate_limiter, max_pages=None):
+    app_id, lang, country = target
+    start = time.perf_counter()
+    count = scrape_reviews_incremental(
+        app_id, lang, country,
+        max_pages=max_pages,
+        rate_limiter=rate_limiter,
+        tags={'app_id': app_id, 'lang': lang, 'country': country},
+    )
+    return count, time.perf_counter() - start
+
+def run_targets(targets=TARGETS, max_workers=None, rate=REQUESTS_PER_SECOND, burst=BURST, max_pages=None):
+    """Scrape toutes les cibles en parallèle. Retourne {cible: nombre de nouveaux avis}."""
+    rate_limiter = TokenBucket(rate, burst)
+    results = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(targets)) as pool:
+        futures = {pool.submit(scrape_target, target, rate_limiter, max_pages): target for target in targets}
+        for future in as_completed(futures):
+            target = futures[future]
+            try:
+                count, elapsed = future.result()
+                results[target] = count
+                print(f"✓ {'/'.join(target)} : {count} nouveaux avis ({elapsed:.1f}s)")
+            except Exception as e:
+                # Une cible en échec n'arrête pas les autres, son checkpoint reste en place
+                results[target] = 0
+                print(f"✗ {'/'.join(target)} : erreur {e}")
+
+    print(f"\nTotal : {sum(results.values())} nouveaux avis, {len(targets)} cibles en {time.perf_counter() - start:.1f}s")
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scraping concurrent multi-applications / multi-langues")
+    parser.add_argument("--app", action="append", help="App ID à suivre (répétable, défaut : APP_IDS)")
+    parser.add_argument("--lang", action="append", help="Langue (répétable, défaut : fr, ar, en)")
+    parser.add_argument("--country", default=COUNTRY)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND, help="Requêtes par seconde (toutes cibles)")
+    parser.add_argument("--max-pages", type=int, default=None)
+    args = parser.parse_args()
+
+    apps = args.app or APP_IDS
+    langs = args.lang or [lang for lang, _ in LOCALES]
+    targets = [(app_id, lang, args.country) for app_id in apps for lang in langs]
+    run_targets(targets, max_workers=args.workers, rate=args.rate, max_pages=args.max_pages)
@@ -0,0 +1,278 @@
+"""
+Couche de stockage commune du pipeline d'avis.
+
+Les tables d'avis sont stockées en Parquet partitionné (format Hive) au lieu de
+CSV réécrits et re-parsés à chaque étape :
+- types fixés à l'écriture (`at` en datetime, `score` entier, `sentiment` catégoriel)
+- lecture par colonnes (projection) et filtres poussés jusqu'aux fichiers
+  (partitions et statistiques des row groups), pour ne charger que l'utile.
+
+Les anciens exports CSV (`<dataset>.csv`) restent lisibles en repli, et sont convertis
+en partitions au premier ajout (`<dataset>.csv` est alors renommé en `.csv.migrated`) :
+les avis historiques ne disparaissent pas derrière les premiers fichiers Parquet.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+import os
+import shutil
+import uuid
+import threading
+from datetime import datetime
+
+# Jeux de données (dossiers Parquet)
+RAW_PARTITIONS_DIR = os.path.join("data", "raw", "reviews")
+CLEANED_DATASET = os.path.join("data", "processed", "reviews_cleaned")
+DEDUPED_DATASET = os.path.join("data", "processed", "reviews_deduped")
+SENTIMENT_DATASET = os.path.join("data", "processed", "reviews_with_sentiment")
+TOPICS_DATASET = os.path.join("data", "processed", "reviews_topics")
+AGGREGATES_DATASET = os.path.join("data", "processed", "reviews_daily_counts")
+
+SENTIMENT_LABELS = ['Négatif', 'Neutre', 'Positif']
+
+STRING_COLUMNS = ['reviewId', 'userName', 'content', 'reviewCreatedVersion', 'replyContent',
+                  'cleaned_content', 'app_id', 'lang', 'country']
+DATETIME_COLUMNS = ['at', 'repliedAt']
+PARTITION_FORMATS = {'date': '%Y-%m-%d', 'month': '%Y-%m'}
+MIGRATION_CHUNK_SIZE = 100_000
+
+# Une seule migration à la fois (plusieurs threads de collecte ajoutent au même jeu)
+_migration_lock = threading.Lock()
+
+def ensure_directory_exists(path):
+    # exist_ok: safe when several threads create the same partition
+    os.makedirs(path, exist_ok=True)
+
+def normalize_types(df):
+    """Applique le schéma typé des tables d'avis (en place) et retourne le DataFrame."""
+    for col in DATETIME_COLUMNS:
+        if col in df.columns and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce', format='mixed')
+    for col in STRING_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('string')
+    if 'score' in df.columns:
+        df['score'] = pd.to_numeric(df['score'], errors='coerce').fillna(0).astype('int8')
+    if 'thumbsUpCount' in df.columns:
+        df['thumbsUpCount'] = pd.to_numeric(df['thumbsUpCount'], errors='coerce').fillna(0).astype('int64')
+    if 'weight' in df.columns:
+        df['weight'] = pd.to_numeric(df['weight'], errors='coerce').fillna(1).astype('int32')
+    if 'polarity' in df.columns:
+        df['polarity'] = df['polarity'].astype('float32')
+    if 'sentiment' in df.columns:
+        df['sentiment'] = pd.Categorical(df['sentiment'], categories=SENTIMENT_LABELS)
+    return df
+
+def _parquet_files(path):
+    if not os.path.isdir(path):
+        return []
+    return [os.path.join(root, f) for root, _, files in os.walk(path) for f in files if f.endswith('.parquet')]
+
+def dataset_exists(path):
+    return bool(_parquet_files(path)) or os.path.exists(path + ".csv")
+
+def dataset_files(path):
+    """Fichiers Parquet d'un jeu de données (triés), pour repérer ceux ajoutés depuis la dernière lecture."""
+    return sorted(_parquet_files(path))
+
+def dataset_columns(path):
+    """Noms des colonnes d'un jeu de données (sans le lire), liste vide s'il n'existe pas."""
+    if _parquet_files(path):
+        return [name for name in _open_dataset(path).schema.names if name not in PARTITION_FORMATS]
+    if os.path.exists(path + ".csv"):
+        return list(pd.read_csv(path + ".csv", nrows=0).columns)
+    return []
+
+def dataset_fingerprint(path):
+    """
+    Empreinte bon marché d'un jeu de données (nombre, taille et date de modification
+    des fichiers) : change dès qu'un fichier est ajouté ou réécrit. Sert de clé de cache.
+    """
+    files = _parquet_files(path) or [f for f in [path + ".csv"] if os.path.exists(f)]
+    stats = [os.stat(f) for f in files]
+    return (len(stats), sum(st.st_size for st in stats), max((st.st_mtime_ns for st in stats), default=0))
+
+def _new_stamp():
+    # Unique suffix: several scraping threads may append to the same partition concurrently
+    return f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{uuid.uuid4().hex[:8]}"
+
+def _write_files(df, target, partition, date_column):
+    df = normalize_types(df.copy())
+    df[partition] = df[date_column].dt.strftime(PARTITION_FORMATS[partition]).fillna('unknown')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    ds.write_dataset(
+        table,
+        target,
+        format='parquet',
+        partitioning=[partition],
+        partitioning_flavor='hive',
+        basename_template=f"part-{_new_stamp()}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+    )
+    return len(df)
+
+def _swap_in(tmp_path, path):
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+def migrate_legacy_csv(path, partition='month', date_column='at'):
+    """
+    Convertit `<path>.csv` en partitions Parquet si le jeu n'a encore aucun fichier
+    Parquet (écriture dans un dossier temporaire puis bascule, puis le CSV est renommé).
+    Retourne le nombre de lignes migrées.
+    """
+    legacy_path = path + ".csv"
+    with _migration_lock:
+        if _parquet_files(path) or not os.path.exists(legacy_path):
+            return 0
+        print(f"Migration de {legacy_path} vers {path} (Parquet)...")
+        tmp_path = f"{path}.tmp-{_new_stamp()}"
+        count = 0
+        for chunk in pd.read_csv(legacy_path, chunksize=MIGRATION_CHUNK_SIZE):
+            count += _write_files(chunk, tmp_path, partition, date_column)
+        if count:
+            _swap_in(tmp_path, path)
+        # Un arrêt entre les deux étapes n'est pas grave : le Parquet est lu en priorité
+        os.replace(legacy_path, legacy_path + ".migrated")
+        return count
+
+def write_dataset(df, path, mode='overwrite', partition='month', date_column='at'):
+    """
+    Écrit un DataFrame en Parquet partitionné par jour ('date') ou par mois ('month').
+
+    mode='overwrite' remplace le jeu de données (écriture dans un dossier temporaire
+    puis bascule), mode='append' ajoute de nouveaux fichiers sans toucher aux autres.
+    """
+    if df is None or df.empty:
+        return 0
+
+    if mode == 'append':
+        # Premier fichier Parquet : l'ancien export CSV est d'abord converti (sinon il serait masqué)
+        migrate_legacy_csv(path, partition, date_column)
+        return _write_files(df, path, partition, date_column)
+
+    tmp_path = f"{path}.tmp-{_new_stamp()}"
+    count = _write_files(df, tmp_path, partition, date_column)
+    _swap_in(tmp_path, path)
+    return count
+
+def write_chunks(chunks, path, partition='month', date_column='at'):
+    """
+    Remplace le jeu de données par une suite de DataFrames (générateur) écrits
+    au fil de l'eau : la mémoire utilisée reste celle d'un seul morceau.
+    """
+    tmp_path = f"{path}.tmp-{_new_stamp()}"
+    count = 0
+    for chunk in chunks:
+        if chunk is not None and not chunk.empty:
+            count += _write_files(chunk, tmp_path, partition, date_column)
+
+    if count:
+        _swap_in(tmp_path, path)
+    return count
+
+def _open_dataset(path):
+    dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    # Le schéma peut évoluer entre deux ajouts (ex : colonnes app_id/lang/country)
+    schemas = [fragment.physical_schema for fragment in dataset.get_fragments()] + [dataset.schema]
+    schema = pa.unify_schemas(schemas, promote_options='permissive')
+    return ds.dataset(path, schema=schema, format='parquet', partitioning='hive')
+
+def _drop_partition_columns(df, columns):
+    # Les colonnes de partition (date/month) ne sont rendues que si elles sont demandées
+    extra = [p for p in PARTITION_FORMATS if p in df.columns and (columns is None or p not in columns)]
+    return df.drop(columns=extra) if extra else df
+
+def _apply_filters(df, filters):
+    """Équivalent pandas des filtres pyarrow [(colonne, op, valeur), ...] (repli CSV)."""
+    ops = {
+        '=': lambda s, v: s == v, '==': lambda s, v: s == v, '!=': lambda s, v: s != v,
+        '<': lambda s, v: s < v, '<=': lambda s, v: s <= v,
+        '>': lambda s, v: s > v, '>=': lambda s, v: s >= v,
+        'in': lambda s, v: s.isin(v), 'not in': lambda s, v: ~s.isin(v),
+    }
+    for col, op, value in filters:
+        df = df[ops[op](df[col], value)]
+    return df
+
+def read_dataset(path, columns=None, filters=None):
+    """
+    Lit un jeu de données en ne chargeant que `columns` et les lignes qui
+    satisfont `filters` (liste de tuples (colonne, op, valeur), syntaxe pyarrow).
+    Retourne None si le jeu de données n'existe pas.
+    """
+    if _parquet_files(path):
+        dataset = _open_dataset(path)
+        expression = pq.filters_to_expression(filters) if filters else None
+        df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        return normalize_types(_drop_partition_columns(df, columns))
+
+    legacy_path = path + ".csv"
+    if os.path.exists(legacy_path):
+        filter_columns = [col for col, _, _ in filters or []]
+        usecols = list(dict.fromkeys(columns + filter_columns)) if columns else None
+        df = normalize_types(pd.read_csv(legacy_path, usecols=usecols))
+        if filters:
+            df = _apply_filters(df, filters)
+        if columns:
+            df = df[columns]
+        return df.reset_index(drop=True)
+
+    return None
+
+def read_files(files, columns=None):
+    """Lit seulement les fichiers Parquet donnés (ex : nouvelles partitions). None si la liste est vide."""
+    if not files:
+        return None
+    tables = [pq.read_table(f, columns=columns, partitioning=None) for f in files]
+    table = pa.concat_tables(tables, promote_options='permissive')
+    return normalize_types(_drop_partition_columns(table.to_pandas(), columns))
+
+def iter_dataset(path, columns=None, filters=None, batch_size=50_000):
+    """Comme read_dataset, mais par morceaux d'au plus `batch_size` lignes (générateur)."""
+    if _parquet_files(path):
+        dataset = _open_dataset(path)
+        expression = pq.filters_to_expression(filters) if filters else None
+        # Les petits lots (un par fichier/partition) sont regroupés jusqu'à batch_size lignes
+        pending, pending_rows = [], 0
+        for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+            if batch.num_rows == 0:
+                continue
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= batch_size:
+                yield normalize_types(_drop_partition_columns(pa.Table.from_batches(pending).to_pandas(), columns))
+                pending, pending_rows = [], 0
+        if pending:
+            yield normalize_types(_drop_partition_columns(pa.Table.from_batches(pending).to_pandas(), columns))
+        return
+
+    legacy_path = path + ".csv"
+    if os.path.exists(legacy_path):
+        filter_columns = [col for col, _, _ in filters or []]
+        usecols = list(dict.fromkeys(columns + filter_columns)) if columns else None
+        for df in pd.read_csv(legacy_path, usecols=usecols, chunksize=batch_size):
+            df = normalize_types(df)
+            if filters:
+                df = _apply_filters(df, filters)
+            if columns:
+                df = df[columns]
+            yield df.reset_index(drop=True)
+
+def append_partitions(df, base_dir=RAW_PARTITIONS_DIR, date_column='at'):
+    """Ajoute les lignes dans des fichiers partitionnés par jour (jamais de réécriture)."""
+    return write_dataset(df, base_dir, mode='append', partition='date', date_column=date_column)
+
+def read_partitions(base_dir=RAW_PARTITIONS_DIR, key='reviewId', columns=None, filters=None):
+    """Relit le stockage brut et supprime les doublons (reprise après interruption)."""
+    df = read_dataset(base_dir, columns=columns, filters=filters)
+    if df is None or df.empty:
+        return None
+
+    if key in df.columns:
+        df = df.drop_duplicates(subset=key, keep='last').reset_index(drop=True)
+    return df
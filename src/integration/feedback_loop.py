@@ -10,79 +10,186 @@ Ce script :
 """
 
 import os
-import pandas as pd
+import sys
 from collections import Counter
+from itertools import repeat
 import re
 
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import SENTIMENT_DATASET, read_dataset, iter_dataset, dataset_exists, dataset_columns
+from src.chatbot.journeys import strip_journey_tags
+
 # Configuration
-SENTIMENT_FILE = os.path.join("data", "processed", "reviews_with_sentiment.csv")
+SENTIMENT_FILE = SENTIMENT_DATASET
 FAQ_FILE = os.path.join("data", "faq_orange.txt")
 OUTPUT_SUGGESTIONS = os.path.join("data", "processed", "faq_suggestions.txt")
+TOP_K = 15           # Mots-clés retenus
+TOP_PHRASES = 10     # Expressions (2 et 3 mots) retenues
+CHUNK_SIZE = 50_000  # Avis lus par morceau
+NEGATIVE_FILTER = [('sentiment', '=', 'Négatif')]
+
+# Mots vides à exclure (génériques + adjectifs négatifs)
+STOPWORDS = {'le', 'la', 'les', 'de', 'du', 'des', 'un', 'une', 'et', 'est',
+             'il', 'elle', 'avec', 'pour', 'dans', 'sur', 'pas', 'que', 'qui',
+             'se', 'ne', 'ce', 'cette', 'mon', 'ma', 'mes', 'ca', 'ça',
+             # Adjectifs négatifs à exclure
+             'nul', 'nulle', 'mauvais', 'mauvaise', 'très', 'plus', 'tout',
+             'mais', 'être', 'avoir', 'faire', 'rien', 'jamais', 'toujours',
+             'vraiment', 'trop', 'encore', 'depuis', 'après', 'aucun'}
+
+# Mots de 3 caractères minimum
+MIN_KEYWORD_LENGTH = 3
+WORD_PATTERN = re.compile(r'\b[a-zàâéèêëîïôùûüç]{3,}\b')
+LETTERS_PATTERN = re.compile(r'[a-zàâéèêëîïôùûüç]+')
+
+def tokenize_runs(text):
+    """
+    Découpe un texte (en minuscules) en suites de mots consécutifs : deux mots ne
+    sont voisins que s'ils ne sont séparés que par des espaces (un n-gramme ne
+    traverse ni la ponctuation ni un mot trop court).
+    """
+    runs, run, previous_end = [], [], None
+    for match in WORD_PATTERN.finditer(text):
+        if previous_end is not None and not text[previous_end:match.start()].isspace():
+            runs.append(run)
+            run = []
+        run.append(match.group())
+        previous_end = match.end()
+    if run:
+        runs.append(run)
+    return runs
+
+class NgramCounter:
+    """
+    Compte en un seul passage les uni-, bi- et tri-grammes d'un flux de textes.
+    Les compteurs de plusieurs morceaux/partitions se fusionnent avec merge().
+    """
+
+    def __init__(self, max_n=3, stopwords=STOPWORDS):
+        self.max_n = max_n
+        self.stopwords = stopwords
+        self.counts = {n: Counter() for n in range(1, max_n + 1)}
+
+    def update(self, texts, weights=None):
+        """`weights` : nombre d'avis que représente chaque texte (quasi-doublons regroupés), 1 par défaut."""
+        for text, weight in zip(texts, weights if weights is not None else repeat(1)):
+            if not isinstance(text, str):
+                continue
+            for run in tokenize_runs(text.lower()):
+                # Un n-gramme ne contient aucun mot vide
+                keep = [word not in self.stopwords for word in run]
+                for n, counter in self.counts.items():
+                    for i in range(len(run) - n + 1):
+                        if all(keep[i:i + n]):
+                            counter[" ".join(run[i:i + n])] += weight
+        return self
+
+    def merge(self, other):
+        for n, counter in other.counts.items():
+            self.counts[n].update(counter)
+        return self
+
+    def most_common(self, n, k):
+        return self.counts[n].most_common(k)
+
+class FaqIndex:
+    """
+    Index de la FAQ pour mesurer la couverture d'un mot-clé : même résultat que
+    faq_content.count(mot) (le mot compte aussi à l'intérieur d'un mot plus long,
+    ex : "recharge" dans "rechargement"), mais en temps constant.
+
+    Un mot-clé n'a que des lettres : chaque occurrence tient dans une suite de lettres
+    de la FAQ. L'index associe donc à chaque sous-chaîne (MIN_KEYWORD_LENGTH lettres
+    au moins) des mots de la FAQ son nombre d'occurrences.
+    """
+
+    def __init__(self, faq_content, min_length=MIN_KEYWORD_LENGTH):
+        self.text = faq_content
+        self.min_length = min_length
+        self.counts = Counter()
+        for token, frequency in Counter(LETTERS_PATTERN.findall(faq_content)).items():
+            substrings = {token[i:j] for i in range(len(token))
+                          for j in range(i + min_length, len(token) + 1)}
+            for substring in substrings:
+                self.counts[substring] += frequency * token.count(substring)
+
+    def count(self, phrase):
+        """Occurrences d'un mot ou d'une expression (déjà en minuscules) dans la FAQ."""
+        if len(phrase) >= self.min_length and LETTERS_PATTERN.fullmatch(phrase):
+            return self.counts[phrase]
+        # Expression de plusieurs mots : recherche directe dans le texte
+        return self.text.count(phrase)
+
+def iter_negative_reviews(chunk_size=CHUNK_SIZE):
+    """Avis négatifs par morceaux (texte et poids uniquement) : mémoire bornée quel que soit le volume."""
+    columns = ['content'] + (['weight'] if 'weight' in dataset_columns(SENTIMENT_FILE) else [])
+    return iter_dataset(SENTIMENT_FILE, columns=columns, filters=NEGATIVE_FILTER, batch_size=chunk_size)
 
 def load_negative_reviews():
     """Charge les avis négatifs"""
-    if not os.path.exists(SENTIMENT_FILE):
+    if not dataset_exists(SENTIMENT_FILE):
         print(f"Erreur : Fichier {SENTIMENT_FILE} introuvable.")
         return None
     
-    df = pd.read_csv(SENTIMENT_FILE)
-    # Filtre les avis négatifs uniquement
-    negative = df[df['sentiment'] == 'Négatif']
+    # Filtre les avis négatifs uniquement (seules la colonne texte et les lignes négatives sont lues)
+    columns = ['content'] + (['weight'] if 'weight' in dataset_columns(SENTIMENT_FILE) else [])
+    negative = read_dataset(SENTIMENT_FILE, columns=columns, filters=NEGATIVE_FILTER)
     print(f"✓ {len(negative)} avis négatifs chargés.")
     return negative
 
-def extract_keywords(reviews, top_n=15):
-    """Extrait les mots-clés les plus fréquents des avis négatifs"""
-    # Mots vides à exclure (génériques + adjectifs négatifs)
-    stopwords = ['le', 'la', 'les', 'de', 'du', 'des', 'un', 'une', 'et', 'est', 
-                 'il', 'elle', 'avec', 'pour', 'dans', 'sur', 'pas', 'que', 'qui',
-                 'se', 'ne', 'ce', 'cette', 'mon', 'ma', 'mes', 'ca', 'ça',
-                 # Adjectifs négatifs à exclure
-                 'nul', 'nulle', 'mauvais', 'mauvaise', 'très', 'plus', 'tout',
-                 'mais', 'être', 'avoir', 'faire', 'rien', 'jamais', 'toujours',
-                 'vraiment', 'trop', 'encore', 'depuis', 'après', 'aucun']
-    
-    # Combine tous les avis en un seul texte
-    all_text = " ".join(reviews['content'].dropna().astype(str))
-    
-    # 1. Extraction de bi-grammes (2 mots consécutifs)
-    bigrams = re.findall(r'\b([a-zàâéèêëîïôùûüç]{3,})\s+([a-zàâéèêëîïôùûüç]{3,})\b', all_text.lower())
-    bigram_phrases = [f"{w1} {w2}" for w1, w2 in bigrams if w1 not in stopwords and w2 not in stopwords]
-    bigram_counts = Counter(bigram_phrases).most_common(10)
-    
-    # 2. Extraction des mots simples (3 caractères minimum)
-    words = re.findall(r'\b[a-zàâéèêëîïôùûüç]{3,}\b', all_text.lower())
-    
-    # Filtrage et comptage
-    filtered_words = [w for w in words if w not in stopwords]
-    word_counts = Counter(filtered_words).most_common(top_n)
+def count_ngrams(chunks):
+    """Un compteur par morceau, fusionnés ensuite (les morceaux pourraient être traités en parallèle)."""
+    total = NgramCounter()
+    reviews_count = 0
+    for chunk in chunks:
+        # Un avis canonique compte pour tous ses quasi-doublons
+        weights = chunk['weight'].tolist() if 'weight' in chunk.columns else None
+        total.merge(NgramCounter().update(chunk['content'], weights))
+        reviews_count += int(chunk['weight'].sum()) if weights is not None else len(chunk)
+    return total, reviews_count
+
+def extract_keywords(reviews, top_n=TOP_K, top_phrases=TOP_PHRASES):
+    """Extrait les mots-clés les plus fréquents des avis négatifs (DataFrame ou NgramCounter)"""
+    if isinstance(reviews, NgramCounter):
+        counter = reviews
+    else:
+        weights = reviews['weight'].tolist() if 'weight' in reviews.columns else None
+        counter = NgramCounter().update(reviews['content'], weights)
     
     print("\n📌 Expressions fréquentes (2 mots) :")
-    for phrase, count in bigram_counts:
+    for phrase, count in counter.most_common(2, top_phrases):
+        print(f"  • {phrase} : {count} fois")
+
+    print("\n📌 Expressions fréquentes (3 mots) :")
+    for phrase, count in counter.most_common(3, top_phrases):
         print(f"  • {phrase} : {count} fois")
     
-    return word_counts
+    return counter.most_common(1, top_n)
+
 def load_faq():
     """Charge la FAQ existante"""
     if not os.path.exists(FAQ_FILE):
-        print(f"Erreur : FAQ {FAQ_FILE} introuvable.")
-        return ""
+        raise FileNotFoundError(f"FAQ {FAQ_FILE} introuvable.")
     
     with open(FAQ_FILE, 'r', encoding='utf-8') as f:
-        faq_content = f.read()
+        # Les étiquettes "[parcours: x]" ne sont pas du contenu (elles fausseraient la couverture)
+        faq_content = strip_journey_tags(f.read())
     
     print(f"✓ FAQ chargée ({len(faq_content)} caractères).")
     return faq_content.lower()
 
 def generate_suggestions(keywords, faq_content):
-    """Génère des suggestions de nouvelles questions FAQ"""
+    """Génère des suggestions de nouvelles questions FAQ (faq_content : texte ou FaqIndex)"""
     suggestions = []
+    faq_index = faq_content if isinstance(faq_content, FaqIndex) else FaqIndex(faq_content)
     
     print("\n🔍 Analyse des problèmes récurrents vs FAQ existante...")
     
     for word, count in keywords:
         # Si le mot n'est PAS dans la FAQ (ou très peu présent)
-        if faq_content.count(word) < 2:
+        if faq_index.count(word) < 2:
             suggestions.append({
                 "keyword": word,
                 "occurrences": count,
@@ -115,22 +222,25 @@ def save_suggestions(suggestions):
     
     print(f"\n✓ {len(suggestions)} suggestions sauvegardées dans : {OUTPUT_SUGGESTIONS}")
 
-def main():
+def main(top_n=TOP_K):
     print("\n" + "="*70)
     print("SCRIPT DE VALORISATION CROISÉE (AXE 4)")
     print("="*70 + "\n")
     
-    # 1. Charger les avis négatifs
-    negative_reviews = load_negative_reviews()
-    if negative_reviews is None or len(negative_reviews) == 0:
+    # 1. Charger les avis négatifs (par morceaux) et compter mots et expressions en un passage
+    if not dataset_exists(SENTIMENT_FILE):
+        raise FileNotFoundError(f"Fichier {SENTIMENT_FILE} introuvable.")
+    counter, negative_count = count_ngrams(iter_negative_reviews())
+    if negative_count == 0:
         print("Aucun avis négatif trouvé. Arrêt.")
         return
+    print(f"✓ {negative_count} avis négatifs chargés.")
     
     # 2. Extraire les mots-clés récurrents
     print("\n📊 Extraction des problèmes récurrents...")
-    keywords = extract_keywords(negative_reviews, top_n=15)
+    keywords = extract_keywords(counter, top_n=top_n)
     
-    print("\nTop 15 des mots les plus fréquents dans les avis négatifs :")
+    print(f"\nTop {top_n} des mots les plus fréquents dans les avis négatifs :")
     for word, count in keywords:
         print(f"  • {word} : {count} fois")
     
@@ -139,8 +249,8 @@ def main():
     if not faq_content:
         return
     
-    # 4. Générer les suggestions
-    suggestions = generate_suggestions(keywords, faq_content)
+    # 4. Générer les suggestions (index construit une fois, recherches en temps constant)
+    suggestions = generate_suggestions(keywords, FaqIndex(faq_content))
     
     # 5. Sauvegarder
     save_suggestions(suggestions)
@@ -150,4 +260,5 @@ def main():
     print("="*70 + "\n")
 
 if __name__ == "__main__":
-    main()
+    # Usage : python src/integration/feedback_loop.py [top_k]
+    main(top_n=int(sys.argv[1]) if len(sys.argv) > 1 else TOP_K)
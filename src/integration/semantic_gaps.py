@@ -0,0 +1,168 @@
+"""
+Détection sémantique des manques de la FAQ (Axe 4).
+
+Complète feedback_loop.py : au lieu de chercher les mots-clés tels quels dans la
+FAQ, on compare le sens des avis négatifs aux morceaux de FAQ déjà indexés dans
+ChromaDB ("recharge" et "rechargement", ou une plainte en darija, tombent ainsi
+sur la même entrée).
+
+Ce script :
+1. Calcule (par lots, avec le cache d'embeddings partagé) l'embedding des avis négatifs
+2. Mesure leur similarité maximale avec les morceaux de FAQ de data/chroma_db
+3. Regroupe les avis non couverts par similarité
+4. Propose des entrées FAQ classées par volume, avec des exemples représentatifs
+"""
+
+import os
+import sys
+import numpy as np
+from sklearn.cluster import AgglomerativeClustering, MiniBatchKMeans
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import SENTIMENT_DATASET, read_dataset, dataset_exists, dataset_columns
+from src.chatbot.embedding_cache import get_embedding_function
+from src.integration.feedback_loop import NgramCounter, NEGATIVE_FILTER
+
+# Configuration
+DB_DIR = os.path.join("data", "chroma_db")
+OUTPUT_GAPS = os.path.join("data", "processed", "faq_gap_suggestions.txt")
+BATCH_SIZE = 64
+COVERAGE_THRESHOLD = 0.55   # Similarité cosinus au-dessus de laquelle un avis est couvert par la FAQ
+CLUSTER_DISTANCE = 0.45     # Distance cosinus maximale à l'intérieur d'un groupe
+MAX_AGGLOMERATIVE = 5_000   # Au-delà, KMeans (le clustering hiérarchique est quadratique)
+MIN_CLUSTER_SIZE = 2
+TOP_SUGGESTIONS = 10
+EXAMPLES_PER_SUGGESTION = 3
+
+def normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+def embed_texts(texts, embedding_function):
+    """Embeddings par lots ; le cache partagé évite de repasser les avis déjà vus par le modèle."""
+    vectors = []
+    for i in range(0, len(texts), BATCH_SIZE):
+        vectors.extend(embedding_function.embed_documents(texts[i:i + BATCH_SIZE]))
+    return np.asarray(vectors, dtype=np.float32)
+
+def load_faq_embeddings(embedding_function):
+    """Embeddings et textes des morceaux de FAQ déjà stockés dans ChromaDB (aucun recalcul)."""
+    from langchain_community.vectorstores import Chroma
+
+    if not os.path.exists(DB_DIR):
+        print(f"Erreur : La base de données {DB_DIR} n'existe pas. Lancez d'abord ingest_knowledge.py")
+        return None, None
+    db = Chroma(persist_directory=DB_DIR, embedding_function=embedding_function)
+    stored = db.get(include=['embeddings', 'documents'])
+    if stored['embeddings'] is None or len(stored['embeddings']) == 0:
+        return None, None
+    return np.asarray(stored['embeddings'], dtype=np.float32), stored['documents']
+
+def cluster_reviews(vectors):
+    """Regroupe des embeddings normalisés ; retourne un numéro de groupe par avis."""
+    if len(vectors) < 2:
+        return np.zeros(len(vectors), dtype=int)
+    if len(vectors) <= MAX_AGGLOMERATIVE:
+        model = AgglomerativeClustering(n_clusters=None, distance_threshold=CLUSTER_DISTANCE,
+                                        metric='cosine', linkage='average')
+        return model.fit_predict(vectors)
+    n_clusters = max(1, len(vectors) // 50)
+    return MiniBatchKMeans(n_clusters=n_clusters, random_state=1, n_init=3).fit_predict(vectors)
+
+def find_gaps(texts, vectors, faq_vectors, faq_documents, weights=None):
+    """
+    Retourne les suggestions classées par nombre d'avis non couverts.
+    `weights` : nombre d'avis que représente chaque texte (quasi-doublons regroupés), 1 par défaut.
+    """
+    weights = np.ones(len(texts), dtype=np.int64) if weights is None else np.asarray(weights)
+    vectors = normalize(vectors)
+    similarities = vectors @ normalize(faq_vectors).T
+    best_scores = similarities.max(axis=1)
+    uncovered = np.flatnonzero(best_scores < COVERAGE_THRESHOLD)
+    print(f"✓ {len(texts) - len(uncovered)} avis couverts par la FAQ, {len(uncovered)} non couverts.")
+
+    if len(uncovered) == 0:
+        return []
+
+    labels = cluster_reviews(vectors[uncovered])
+    suggestions = []
+    for label in np.unique(labels):
+        members = uncovered[labels == label]
+        occurrences = int(weights[members].sum())
+        if occurrences < MIN_CLUSTER_SIZE:
+            continue
+
+        centroid = normalize(vectors[members].mean(axis=0, keepdims=True))[0]
+        # Exemples représentatifs : les avis (distincts) les plus proches du centre du groupe
+        ranked = members[np.argsort(-(vectors[members] @ centroid))]
+        examples = list(dict.fromkeys(texts[i] for i in ranked))[:EXAMPLES_PER_SUGGESTION]
+        phrases = NgramCounter().update([texts[i] for i in members], weights[members].tolist())
+        top_phrase = (phrases.most_common(2, 1) or phrases.most_common(1, 1) or [("?", 0)])[0][0]
+        nearest_faq = faq_documents[int(similarities[members].mean(axis=0).argmax())]
+
+        suggestions.append({
+            "keyword": top_phrase,
+            "occurrences": occurrences,
+            "coverage": float(best_scores[members].mean()),
+            "examples": examples,
+            "nearest_faq": nearest_faq.split("\n")[0],
+        })
+
+    suggestions.sort(key=lambda s: s["occurrences"], reverse=True)
+    return suggestions[:TOP_SUGGESTIONS]
+
+def save_gap_suggestions(suggestions, path=OUTPUT_GAPS):
+    if not suggestions:
+        print("\n✓ Aucun manque détecté. La FAQ couvre déjà les avis négatifs !")
+        return
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("=" * 70 + "\n")
+        f.write("MANQUES SÉMANTIQUES DE LA FAQ (Valorisation Croisée)\n")
+        f.write("=" * 70 + "\n\n")
+        for i, sugg in enumerate(suggestions, 1):
+            f.write(f"{i}. Sujet : '{sugg['keyword']}' ({sugg['occurrences']} avis non couverts, "
+                    f"similarité moyenne {sugg['coverage']:.2f})\n")
+            f.write(f"   Entrée FAQ la plus proche : {sugg['nearest_faq']}\n")
+            for example in sugg['examples']:
+                f.write(f"   - « {example} »\n")
+            f.write("\n")
+        f.write("=" * 70 + "\n")
+        f.write("ACTIONS RECOMMANDÉES :\n")
+        f.write("- Créer des réponses pour ces sujets dans faq_orange.txt\n")
+        f.write("- Relancer ingest_knowledge.py pour mettre à jour le chatbot\n")
+        f.write("=" * 70 + "\n")
+
+    print(f"\n✓ {len(suggestions)} suggestions sauvegardées dans : {path}")
+
+def main():
+    if not dataset_exists(SENTIMENT_DATASET):
+        print(f"Erreur : Fichier {SENTIMENT_DATASET} introuvable.")
+        return
+
+    columns = ['cleaned_content'] + (['weight'] if 'weight' in dataset_columns(SENTIMENT_DATASET) else [])
+    negative = read_dataset(SENTIMENT_DATASET, columns=columns, filters=NEGATIVE_FILTER).dropna(subset=['cleaned_content'])
+    texts = negative['cleaned_content'].astype(str).tolist()
+    weights = negative['weight'].to_numpy() if 'weight' in negative.columns else None
+    if not texts:
+        print("Aucun avis négatif trouvé. Arrêt.")
+        return
+    print(f"✓ {len(texts)} avis négatifs chargés.")
+
+    # Même modèle (et même cache) que l'ingestion de la FAQ
+    embedding_function = get_embedding_function()
+    faq_vectors, faq_documents = load_faq_embeddings(embedding_function)
+    if faq_vectors is None:
+        return
+
+    vectors = embed_texts(texts, embedding_function)
+
+    suggestions = find_gaps(texts, vectors, faq_vectors, faq_documents, weights)
+    for i, sugg in enumerate(suggestions, 1):
+        print(f"  {i}. {sugg['keyword']} : {sugg['occurrences']} avis")
+    save_gap_suggestions(suggestions)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Point d'entrée unique du pipeline : collecte → nettoyage → quasi-doublons → sentiments → sujets / FAQ.
+
+Chaque étape déclare ses entrées (fichiers, dossiers, code du script) et ses
+sorties. L'ordre d'exécution (DAG) en est déduit : une étape dépend de celles qui
+produisent ses entrées. Avant de lancer une étape, on calcule l'empreinte de ses
+entrées (hash du contenu) et de ses paramètres : si elle n'a pas changé depuis la
+dernière exécution réussie et que les sorties existent, l'étape est sautée.
+Les branches indépendantes (ingestion de la FAQ pendant l'analyse des avis,
+sujets en même temps que la boucle de valorisation) tournent en parallèle.
+
+Usage :
+    python src/pipeline/run_pipeline.py
+    python src/pipeline/run_pipeline.py --no-scrape          (hors ligne)
+    python src/pipeline/run_pipeline.py --force sentiment    (relance une étape ; la suite seulement si sa sortie change)
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Ajout du dossier racine au path pour les imports
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.append(ROOT)
+
+from src.data_collection.storage import (RAW_PARTITIONS_DIR, CLEANED_DATASET, DEDUPED_DATASET,
+                                         SENTIMENT_DATASET, TOPICS_DATASET, AGGREGATES_DATASET)
+
+# Configuration
+STATE_FILE = os.path.join("data", "pipeline_state.json")
+FAQ_FILE = os.path.join("data", "faq_orange.txt")
+DB_DIR = os.path.join("data", "chroma_db")
+SUGGESTIONS_FILE = os.path.join("data", "processed", "faq_suggestions.txt")
+TOPIC_MODEL_DIR = os.path.join("data", "models", "topics")
+MAX_WORKERS = 3
+HASH_BLOCK_SIZE = 1 << 20
+
+def source(relative_path):
+    # Le code d'une étape fait partie de ses entrées : le modifier relance l'étape
+    return os.path.join(ROOT, "src", relative_path)
+
+# --- ÉTAPES ---
+# Les modules sont importés dans chaque étape : seules les dépendances des étapes lancées sont chargées
+
+def run_scrape():
+    from src.data_collection.playstore_scraper import scrape_reviews_incremental, APP_ID, LANG, COUNTRY
+    scrape_reviews_incremental(APP_ID, LANG, COUNTRY)
+
+def run_clean():
+    from src.data_collection.cleaner import process_reviews
+    process_reviews(RAW_PARTITIONS_DIR, CLEANED_DATASET)
+
+def run_dedup():
+    from src.data_collection.near_dedup import deduplicate_reviews
+    deduplicate_reviews(CLEANED_DATASET, DEDUPED_DATASET)
+
+def run_sentiment():
+    from src.analysis.sentiment_analysis import run_analysis
+    # Les étapes tournent dans des threads : pas de fork pour les workers (verrous copiés)
+    run_analysis(mp_context="spawn")
+
+def run_topics():
+    from src.analysis.topic_modeling import run_topic_modeling
+    run_topic_modeling()
+
+def run_feedback():
+    from src.integration.feedback_loop import main
+    main()
+
+def run_ingest():
+    from src.chatbot.ingest_knowledge import ingest_data
+    ingest_data()
+
+def sentiment_params():
+    """
+    Identité des scores, comme sentiment_analysis.cache_key (sans charger TextBlob) :
+    changer de backend, de modèle ou de quantification relance l'étape.
+    """
+    backend = os.getenv("SENTIMENT_BACKEND", "textblob")
+    if backend != "transformer":
+        return {"backend": backend}
+    from src.analysis.transformer_sentiment import MODEL_NAME, QUANTIZE
+    return {"backend": backend, "model": MODEL_NAME, "quantize": QUANTIZE}
+
+class Stage:
+    def __init__(self, name, run, inputs=(), outputs=(), params=None, always=False):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = params or {}
+        self.always = always  # Jamais sautée (ex : collecte, dont l'entrée est le Play Store)
+
+def default_stages(scrape=True):
+    stages = [
+        Stage("clean", run_clean,
+              inputs=[RAW_PARTITIONS_DIR, source("data_collection/cleaner.py")],
+              outputs=[CLEANED_DATASET]),
+        Stage("dedup", run_dedup,
+              inputs=[CLEANED_DATASET, source("data_collection/near_dedup.py")],
+              outputs=[DEDUPED_DATASET]),
+        Stage("sentiment", run_sentiment,
+              inputs=[DEDUPED_DATASET, source("analysis/sentiment_analysis.py"), source("analysis/sentiment_cache.py"),
+                      source("analysis/transformer_sentiment.py"), source("data_collection/storage.py")],
+              outputs=[SENTIMENT_DATASET],
+              params=sentiment_params()),
+        Stage("topics", run_topics,
+              inputs=[SENTIMENT_DATASET, source("analysis/topic_modeling.py"), source("analysis/aggregates.py")],
+              outputs=[TOPICS_DATASET, AGGREGATES_DATASET, TOPIC_MODEL_DIR]),
+        Stage("feedback", run_feedback,
+              inputs=[SENTIMENT_DATASET, FAQ_FILE, source("integration/feedback_loop.py"), source("chatbot/journeys.py")],
+              outputs=[SUGGESTIONS_FILE]),
+        Stage("ingest", run_ingest,
+              inputs=[FAQ_FILE, source("chatbot/ingest_knowledge.py"), source("chatbot/journeys.py"),
+                      source("chatbot/embedding_cache.py")],
+              outputs=[DB_DIR]),
+    ]
+    if scrape:
+        # Pas d'entrée : toujours lancée (elle-même incrémentale), la suite n'est relancée que si elle a ramené des avis
+        stages.insert(0, Stage("scrape", run_scrape, outputs=[RAW_PARTITIONS_DIR], always=True))
+    return stages
+
+# --- EMPREINTES ---
+
+class Fingerprinter:
+    """
+    Hash du contenu des entrées. Le hash de chaque fichier est mémorisé avec sa taille
+    et sa date de modification : un fichier inchangé n'est pas relu d'une exécution à l'autre.
+    Seuls les fichiers vus pendant l'exécution sont conservés (les noms horodatés des
+    partitions changent à chaque réécriture : la mémoire ne grossit pas indéfiniment).
+    """
+    def __init__(self, memo=None):
+        self.memo = memo or {}
+        self.used = set()
+        self.lock = threading.Lock()
+
+    def file_digest(self, path):
+        stat = os.stat(path)
+        with self.lock:
+            self.used.add(path)
+            cached = self.memo.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                digest.update(block)
+        with self.lock:
+            self.memo[path] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def path_digest(self, path):
+        """Hash d'un fichier, ou d'un dossier (partitions + contenu des fichiers, pas leurs noms horodatés)."""
+        if os.path.isfile(path):
+            return self.file_digest(path)
+        if os.path.isdir(path):
+            entries = []
+            for root, _, files in os.walk(path):
+                partition = os.path.relpath(root, path)
+                entries.extend(f"{partition}:{self.file_digest(os.path.join(root, f))}" for f in files)
+            return hashlib.sha256("\n".join(sorted(entries)).encode('utf-8')).hexdigest()
+        if os.path.exists(path + ".csv"):
+            # Ancien export CSV d'un jeu de données
+            return self.file_digest(path + ".csv")
+        return "absent"
+
+    def stage_fingerprint(self, stage):
+        payload = {
+            "inputs": {path: self.path_digest(path) for path in stage.inputs},
+            "params": stage.params,
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def current_memo(self):
+        """Hashes des fichiers vus pendant cette exécution (à sauvegarder)."""
+        with self.lock:
+            return {path: self.memo[path] for path in self.used if path in self.memo}
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp_path, path)
+
+# --- EXÉCUTION ---
+
+def dependencies(stages):
+    """Étape -> étapes qui produisent l'une de ses entrées."""
+    return {
+        stage.name: {other.name for other in stages
+                     if other is not stage and set(other.outputs) & set(stage.inputs)}
+        for stage in stages
+    }
+
+def outputs_exist(stage):
+    return all(os.path.exists(path) or os.path.exists(path + ".csv") for path in stage.outputs)
+
+def run_pipeline(stages, force=(), max_workers=MAX_WORKERS, state_path=STATE_FILE):
+    """
+    Lance les étapes dans l'ordre du DAG, en parallèle quand c'est possible.
+    Retourne {étape: (statut, durée en secondes)}.
+    """
+    deps = dependencies(stages)
+    state = load_state(state_path)
+    fingerprinter = Fingerprinter(state.get("files"))
+    state_lock = threading.Lock()
+    forced = {stage.name for stage in stages} if "all" in force else set(force)
+
+    def execute(stage):
+        start = time.perf_counter()
+        fingerprint = fingerprinter.stage_fingerprint(stage)
+        if (stage.name not in forced and not stage.always and outputs_exist(stage)
+                and state["stages"].get(stage.name) == fingerprint):
+            return "à jour", time.perf_counter() - start
+
+        print(f"\n▶ [{stage.name}] démarrage")
+        try:
+            stage.run()
+        except Exception as e:
+            print(f"Erreur dans l'étape {stage.name} : {e}")
+            return "échec", time.perf_counter() - start
+        with state_lock:
+            state["stages"][stage.name] = fingerprint
+            state["files"] = fingerprinter.current_memo()
+            save_state(state, state_path)
+        return "exécutée", time.perf_counter() - start
+
+    results = {}
+    remaining = {stage.name: stage for stage in stages}
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="stage") as executor:
+        while remaining or running:
+            progress = False
+            for name, stage in list(remaining.items()):
+                if not deps[name] <= set(results):
+                    continue
+                del remaining[name]
+                progress = True
+                failed = [dep for dep in deps[name] if results[dep][0] in ("échec", "bloquée")]
+                if failed:
+                    results[name] = ("bloquée", 0.0)
+                    continue
+                running[executor.submit(execute, stage)] = name
+
+            if not running:
+                if remaining and not progress:
+                    raise ValueError(f"Dépendances circulaires entre les étapes : {sorted(remaining)}")
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    # Hashes des entrées des étapes sautées compris (rien n'est à relire au prochain passage)
+    state["files"] = fingerprinter.current_memo()
+    save_state(state, state_path)
+    return results
+
+def print_summary(results, elapsed):
+    print("\n" + "=" * 50)
+    print(f"{'Étape':<12}{'Statut':<12}{'Durée':>10}")
+    print("-" * 50)
+    for name, (status, seconds) in results.items():
+        print(f"{name:<12}{status:<12}{seconds:>9.1f}s")
+    print("-" * 50)
+    total = sum(seconds for _, seconds in results.values())
+    print(f"Total {elapsed:.1f}s (somme des étapes {total:.1f}s, gain du parallélisme {total - elapsed:.1f}s)")
+    print("=" * 50)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pipeline complet (étapes inchangées sautées)")
+    parser.add_argument("--no-scrape", action="store_true", help="Ne collecte pas de nouveaux avis (hors ligne)")
+    parser.add_argument("--force", nargs="*", default=[], help="Étapes à relancer même si rien n'a changé ('all' pour toutes)")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="Étapes lancées en parallèle au plus")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    results = run_pipeline(default_stages(scrape=not args.no_scrape), force=args.force, max_workers=args.workers)
+    print_summary(results, time.perf_counter() - start)
@@ -0,0 +1,264 @@
+"""
+Mode veille : les nouveaux avis arrivent dans le tableau de bord en quelques minutes.
+
+Processus de longue durée qui interroge régulièrement le stockage brut (et le Play
+Store, sauf --no-scrape) et fait passer chaque nouvel avis, par micro-lots, dans une
+chaîne de générateurs : nettoyage (cleaner.clean_chunks) → sentiments
+(sentiment_analysis.score_chunks, avec son cache) → sujets (modèle déjà appris).
+Chaque lot est ajouté aux jeux de sentiments et de sujets et aux agrégats du
+tableau de bord : coût proportionnel aux nouveaux avis, sans relire l'historique.
+
+Les avis du flux sont écrits avec un poids de 1 : la prochaine exécution complète
+du pipeline (run_pipeline.py) les regroupe avec leurs quasi-doublons.
+
+Un pic d'avis négatifs (fenêtre glissante comparée à la moyenne des jours
+précédents) est signalé, avec les expressions qui reviennent le plus, dans
+data/processed/negative_spikes.jsonl (affiché par le tableau de bord).
+
+Usage :
+    python src/pipeline/watch.py                      (toutes les 5 minutes)
+    python src/pipeline/watch.py --no-scrape --interval 30
+    python src/pipeline/watch.py --once               (un seul passage, ex : cron)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from collections import deque
+from datetime import datetime
+
+import pandas as pd
+
+# Ajout du dossier racine au path pour les imports
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from src.data_collection.storage import (RAW_PARTITIONS_DIR, SENTIMENT_DATASET, TOPICS_DATASET,
+                                         dataset_files, read_files, write_dataset)
+from src.analysis.aggregates import read_aggregates, update_aggregates
+
+# Configuration
+STATE_FILE = os.path.join("data", "watch_state.json")
+ALERTS_FILE = os.path.join("data", "processed", "negative_spikes.jsonl")
+POLL_INTERVAL = 300            # Secondes entre deux passages
+MICRO_BATCH = 500              # Avis par micro-lot
+SPIKE_WINDOW_MINUTES = 60      # Fenêtre glissante des avis négatifs
+SPIKE_FACTOR = 3.0             # Pic : au moins 3 fois le nombre attendu sur la fenêtre...
+SPIKE_MIN_REVIEWS = 10         # ...et au moins 10 avis négatifs
+BASELINE_DAYS = 7              # Nombre attendu : moyenne des 7 jours précédents (agrégats)
+TOP_IRRITANTS = 5
+SEEN_REVIEWS = 100_000         # Doublons exacts (même avis relu) cherchés parmi les N derniers avis du flux
+
+# --- SOURCE : NOUVEAUX AVIS ---
+
+def load_state(path=STATE_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_state(state, path=STATE_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def scrape_new_reviews():
+    from src.data_collection.playstore_scraper import scrape_reviews_incremental, APP_ID, LANG, COUNTRY
+    try:
+        scrape_reviews_incremental(APP_ID, LANG, COUNTRY)
+    except Exception as e:
+        # Play Store injoignable : on traite quand même ce qui est déjà arrivé
+        print(f"Erreur de collecte : {e}")
+
+def poll_batches(interval=POLL_INTERVAL, scrape=True, once=False, from_start=False,
+                 raw_path=RAW_PARTITIONS_DIR, state_path=STATE_FILE, batch_size=MICRO_BATCH):
+    """
+    Générateur sans fin de micro-lots d'avis bruts : ceux des fichiers apparus dans
+    le stockage brut depuis le dernier passage. Un fichier n'est marqué comme lu
+    qu'une fois ses lots traités par toute la chaîne (reprise sans perte après un arrêt).
+    """
+    state = load_state(state_path)
+    if state is None:
+        # Premier lancement : l'historique est traité par le pipeline complet, on part de maintenant
+        state = {"files": [] if from_start else dataset_files(raw_path)}
+        save_state(state, state_path)
+    seen = set(state["files"])
+
+    while True:
+        if scrape:
+            scrape_new_reviews()
+
+        new_files = [f for f in dataset_files(raw_path) if f not in seen]
+        if new_files:
+            reviews = read_files(new_files).sort_values('at', kind='stable')
+            for start in range(0, len(reviews), batch_size):
+                yield reviews.iloc[start:start + batch_size]
+            seen.update(new_files)
+            state["files"] = sorted(seen)
+            save_state(state, state_path)
+
+        if once:
+            return
+        time.sleep(interval)
+
+# --- ÉTAPES ---
+
+def with_weights(chunks):
+    # Un avis du flux ne représente que lui-même (quasi-doublons regroupés au prochain passage complet)
+    for chunk in chunks:
+        yield chunk.assign(weight=1)
+
+def label_topics(chunks, topic_model):
+    """Ajoute topic_id/topic_weight avec le modèle déjà appris (pas de ré-apprentissage dans le flux)."""
+    from src.analysis.topic_modeling import assign_topics
+    for chunk in chunks:
+        if topic_model is not None and not chunk.empty:
+            topic_ids, topic_weights = assign_topics(chunk['cleaned_content'], *topic_model)
+            chunk = chunk.assign(topic_id=topic_ids, topic_weight=topic_weights)
+        yield chunk
+
+def store_batch(batch, topics=True):
+    """Ajoute le lot aux jeux de données (nouveaux fichiers, rien n'est réécrit) et aux agrégats."""
+    sentiment_columns = [col for col in batch.columns if col not in ('topic_id', 'topic_weight')]
+    write_dataset(batch[sentiment_columns], SENTIMENT_DATASET, mode='append')
+    if topics and 'topic_id' in batch.columns:
+        write_dataset(batch, TOPICS_DATASET, mode='append')
+    update_aggregates(batch)
+
+# --- PICS D'AVIS NÉGATIFS ---
+
+class SpikeDetector:
+    """
+    Avis négatifs des SPIKE_WINDOW_MINUTES dernières minutes (date de publication),
+    comparés au nombre attendu sur une fenêtre de même durée les jours précédents.
+    """
+
+    def __init__(self, window_minutes=SPIKE_WINDOW_MINUTES, factor=SPIKE_FACTOR,
+                 min_reviews=SPIKE_MIN_REVIEWS, baseline_days=BASELINE_DAYS):
+        self.window = pd.Timedelta(minutes=window_minutes)
+        self.factor = factor
+        self.min_reviews = min_reviews
+        self.baseline_days = baseline_days
+        self.negatives = deque()  # (date, texte) des avis négatifs de la fenêtre
+        self.baseline = None
+        self.baseline_day = None
+        self.last_alert = None
+
+    def expected(self, now):
+        """Avis négatifs attendus sur une fenêtre (moyenne des jours précédents), recalculé une fois par jour."""
+        today = now.normalize()
+        if self.baseline_day != today:
+            counts = read_aggregates(start=today - pd.Timedelta(days=self.baseline_days),
+                                     end=today - pd.Timedelta(days=1))
+            negatives = 0 if counts is None else int(counts.loc[counts['sentiment'] == 'Négatif', 'count'].sum())
+            self.baseline = negatives / (self.baseline_days * 24 * 60) * (self.window / pd.Timedelta(minutes=1))
+            self.baseline_day = today
+        return self.baseline
+
+    def observe(self, batch, now=None):
+        """Ajoute les avis négatifs du lot ; retourne l'alerte (dict) si un pic est détecté."""
+        now = now or pd.Timestamp.now()
+        # Un avis ancien arrivé en retard (reprise de la collecte) n'entre pas dans la fenêtre
+        negative = batch[(batch['sentiment'] == 'Négatif') & (batch['at'] >= now - self.window)]
+        self.negatives.extend(zip(negative['at'], negative['content']))
+        while self.negatives and self.negatives[0][0] < now - self.window:
+            self.negatives.popleft()
+
+        count = len(self.negatives)
+        expected = self.expected(now)
+        threshold = max(self.min_reviews, self.factor * expected)
+        # Une seule alerte par fenêtre, sauf si le pic continue de grossir
+        if count < threshold or (self.last_alert is not None and now - self.last_alert[0] < self.window
+                                 and count < 2 * self.last_alert[1]):
+            return None
+        self.last_alert = (now, count)
+        return {
+            "ts": now.isoformat(timespec='seconds'),
+            "window_minutes": int(self.window / pd.Timedelta(minutes=1)),
+            "negatives": count,
+            "expected": round(expected, 2),
+            "irritants": self.irritants(),
+        }
+
+    def irritants(self, top_n=TOP_IRRITANTS):
+        """Expressions (2-3 mots, sinon mots) les plus fréquentes des avis négatifs de la fenêtre."""
+        from src.integration.feedback_loop import NgramCounter
+        counter = NgramCounter().update(text for _, text in self.negatives)
+        # Une expression de 2 mots déjà contenue dans une expression retenue de 3 mots est sautée
+        phrases = counter.most_common(3, top_n)
+        phrases += [(phrase, count) for phrase, count in counter.most_common(2, top_n)
+                    if not any(phrase in longer for longer, _ in phrases)]
+        phrases = sorted(phrases, key=lambda item: item[1], reverse=True)[:top_n]
+        return phrases or counter.most_common(1, top_n)
+
+def save_alert(alert, path=ALERTS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(alert, ensure_ascii=False) + "\n")
+
+def read_alerts(path=ALERTS_FILE, since=None):
+    """Alertes de pics enregistrées (les plus récentes en premier), depuis `since` (Timestamp optionnel)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        alerts = [json.loads(line) for line in f if line.strip()]
+    if since is not None:
+        alerts = [alert for alert in alerts if pd.Timestamp(alert["ts"]) >= since]
+    return alerts[::-1]
+
+# --- BOUCLE ---
+
+def watch(interval=POLL_INTERVAL, scrape=True, once=False, from_start=False, backend=None):
+    from src.data_collection.cleaner import clean_chunks
+    from src.analysis.sentiment_analysis import score_chunks, cache_key, SENTIMENT_BACKEND
+    from src.analysis.sentiment_cache import SentimentCache
+    from src.analysis.topic_modeling import load_topic_model
+
+    backend = backend or SENTIMENT_BACKEND
+    topic_model = load_topic_model()
+    if topic_model is None:
+        print("Aucun modèle de sujets : lancez d'abord topic_modeling.py (avis écrits sans sujet).")
+    cache = SentimentCache(backend=cache_key(backend))
+    detector = SpikeDetector()
+
+    print(f"Veille des nouveaux avis (toutes les {interval}s, lots de {MICRO_BATCH})...")
+    # Chaîne de générateurs : chaque étape ne traite que le lot en cours
+    batches = poll_batches(interval, scrape, once, from_start)
+    # Mémoire des doublons bornée : le processus tourne indéfiniment
+    cleaned = clean_chunks(batches, max_seen=SEEN_REVIEWS)
+    labelled = label_topics(score_chunks(with_weights(cleaned), cache, backend=backend), topic_model)
+    try:
+        for batch in labelled:
+            if batch.empty:
+                continue
+            start = time.perf_counter()
+            store_batch(batch, topics=topic_model is not None)
+            now = pd.Timestamp.now()
+            delay = (now - batch['at']).median().total_seconds() / 60
+            negatives = int((batch['sentiment'] == 'Négatif').sum())
+            print(f"[{datetime.now():%H:%M:%S}] {len(batch)} nouveaux avis ({negatives} négatifs), "
+                  f"écrits en {(time.perf_counter() - start) * 1000:.0f} ms, publiés il y a {delay:.0f} min (médiane).")
+
+            alert = detector.observe(batch, now)
+            if alert:
+                save_alert(alert)
+                irritants = ", ".join(f"{phrase} ({count})" for phrase, count in alert["irritants"])
+                print(f"⚠️ Pic d'avis négatifs : {alert['negatives']} en {alert['window_minutes']} min "
+                      f"(attendu : {alert['expected']:.1f}). Irritants : {irritants}")
+    except KeyboardInterrupt:
+        print("\nVeille arrêtée.")
+    finally:
+        cache.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Traitement continu des nouveaux avis (micro-lots)")
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL, help="Secondes entre deux passages")
+    parser.add_argument("--no-scrape", action="store_true", help="Ne collecte pas : traite les fichiers bruts ajoutés par ailleurs")
+    parser.add_argument("--once", action="store_true", help="Un seul passage puis arrêt")
+    parser.add_argument("--from-start", action="store_true", help="Premier lancement : traite aussi les fichiers bruts déjà présents")
+    parser.add_argument("--backend", choices=["textblob", "transformer"], help="Backend de sentiments")
+    args = parser.parse_args()
+    watch(args.interval, scrape=not args.no_scrape, once=args.once, from_start=args.from_start, backend=args.backend)